@@ -15,11 +15,45 @@ class Settings(BaseSettings):
     SMTP_PORT: int = 587
     SMTP_USER: str
     SMTP_PASSWORD: str
+    SMTP_TIMEOUT_SECONDS: int = 30
+    SMTP_POOL_MAX_PER_HOST: int = 4
+    SMTP_POOL_IDLE_TIMEOUT_SECONDS: int = 60
+    SMTP_POOL_MAX_MESSAGES_PER_CONNECTION: int = 100
+    EMAIL_ASYNC_CONCURRENCY_PER_HOST: int = 8  # batch (reminder) delivery
+    EMAIL_ASYNC_MAX_CONCURRENCY: int = 32  # batch sends in flight across all SMTP accounts
+    EMAIL_SEND_TIMEOUT_SECONDS: float = 30
+
+    # Per-workspace integration (SMTP / Telegram chat) cache
+    CHANNEL_CONFIG_CACHE_SIZE: int = 4096
+    CHANNEL_CONFIG_CACHE_TTL_SECONDS: int = 60
+
+    # Notification templates
+    TEMPLATE_CACHE_SIZE: int = 1024  # compiled (workspace, template) sets kept in memory
+    TEMPLATE_CACHE_TTL_SECONDS: int = 60  # how long other processes may serve a stale override
 
     # SMS/Telegram
     TELEGRAM_BOT_TOKEN: str = ""
     # Added this line to fix the validation error:
     TELEGRAM_CHAT_ID: Optional[str] = None
+    TELEGRAM_API_BASE_URL: str = "https://api.telegram.org"  # point at tests/fake_telegram_api.py for load tests
+    TELEGRAM_HTTP_POOL_SIZE: int = 16  # keep-alive connections to the Bot API
+    TELEGRAM_HTTP_CONNECT_TIMEOUT: float = 5
+    TELEGRAM_HTTP_TIMEOUT: float = 10  # read timeout per Bot API call
+    TELEGRAM_GLOBAL_RATE_PER_SECOND: float = 30  # Bot API limit across all chats
+    TELEGRAM_PER_CHAT_RATE_PER_SECOND: float = 1  # Bot API limit per chat
+    TELEGRAM_DISPATCH_WORKERS: int = 8
+    TELEGRAM_MAX_RETRIES: int = 5  # 429 requeues before giving up
+    TELEGRAM_SEND_WAIT_SECONDS: float = 300  # how long a caller waits for a queued send
+    TELEGRAM_WEBHOOK_QUEUE_SIZE: int = 1000  # updates beyond this get a 503 and are redelivered
+    TELEGRAM_WEBHOOK_WORKERS: int = 4
+    TELEGRAM_UPDATE_DEDUP_WINDOW: int = 10000  # recent update_ids remembered; keep above the queue size
+    TELEGRAM_UPDATE_MARK_PERSIST_SECONDS: float = 1.0  # how often the high-water mark is saved
+    TELEGRAM_INBOX_BATCH_SIZE: int = 200  # inbound messages stored per INSERT
+    TELEGRAM_INBOX_FLUSH_INTERVAL_SECONDS: float = 0.5
+    TELEGRAM_INBOX_MAX_BUFFER: int = 10000
+    TELEGRAM_POLL_TIMEOUT_SECONDS: int = 30  # getUpdates long-poll timeout (python -m app.telegram_poller)
+    TELEGRAM_POLL_LIMIT: int = 100  # updates per getUpdates call (Bot API maximum)
+    TELEGRAM_POLL_MAX_ATTEMPTS: int = 5  # an update that keeps failing is skipped after this many tries
     
     # SMS (Optional)
     TWILIO_ACCOUNT_SID: Optional[str] = None
@@ -34,8 +68,72 @@ class Settings(BaseSettings):
     # Frontend
     FRONTEND_URL: str = "http://localhost:3000"
     
+    # Notification outbox
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_CONCURRENCY: int = 8
+    OUTBOX_MAX_ATTEMPTS: int = 6
+    OUTBOX_RETRY_BASE_SECONDS: int = 30
+    OUTBOX_LEASE_SECONDS: int = 300  # renewed while a batch runs; rows of a dead dispatcher are retried after this
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 2.0
+    OUTBOX_DISPATCH_IN_SCHEDULER: bool = True  # also drain from the in-app scheduler
+    
+    # Background worker (python -m app.worker); once one runs, turn the
+    # scheduler off in the API processes
+    RUN_SCHEDULER_IN_API: bool = True
+    WORKER_HEARTBEAT_SECONDS: int = 15
+    WORKER_HEARTBEAT_STALE_SECONDS: int = 60  # /health stops counting a worker after this
+    
+    # Scheduler leader election: only the process holding a Postgres advisory
+    # lock runs the reminder and inventory jobs (the outbox drains everywhere)
+    SCHEDULER_LEADER_ELECTION: bool = True
+    SCHEDULER_LEADER_CHECK_SECONDS: int = 15  # how often followers try to take over
+    
+    # Booking reminders are loaded, sent and marked this many at a time
+    REMINDER_BATCH_SIZE: int = 500
+    
+    # Notifications to the same recipient and channel within this many seconds
+    # go out as one Telegram message / email (0 disables coalescing)
+    NOTIFICATION_COALESCE_WINDOW_SECONDS: float = 0.5
+    
+    # Circuit breakers around Telegram and each SMTP account
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5  # share of failed calls in the window that opens a breaker
+    CIRCUIT_BREAKER_MIN_CALLS: int = 5  # calls in the window before the rate is judged
+    CIRCUIT_BREAKER_WINDOW_SECONDS: int = 60
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 30  # fail fast this long, then let a trial call through
+    CIRCUIT_BREAKER_HALF_OPEN_CALLS: int = 1  # trial calls that must succeed to close again
+    
+    # Suppression list (opt-outs), kept in memory per workspace
+    SUPPRESSION_CACHE_SIZE: int = 4096
+    SUPPRESSION_CACHE_TTL_SECONDS: int = 30  # how long other processes may miss a new opt-out
+    
+    # Delivery log (written behind the send path in batches)
+    DELIVERY_LOG_ENABLED: bool = True
+    DELIVERY_LOG_BATCH_SIZE: int = 500
+    DELIVERY_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    DELIVERY_LOG_MAX_BUFFER: int = 50000  # oldest records are dropped beyond this
+    
     # Environment
     ENVIRONMENT: str = "development"
+    INTERNAL_API_TOKEN: Optional[str] = None  # X-Internal-Token for /api/internal/* (unset = disabled)
+    
+    # Idempotency-Key handling for public POST endpoints
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # 24 hours
+    IDEMPOTENCY_MAX_KEYS: int = 10000
+    
+    # HTTP caching for public catalog endpoints (seconds)
+    PUBLIC_WORKSPACE_S_MAXAGE: int = 300
+    PUBLIC_WORKSPACE_STALE_WHILE_REVALIDATE: int = 3600
+    PUBLIC_SERVICES_S_MAXAGE: int = 60
+    PUBLIC_SERVICES_STALE_WHILE_REVALIDATE: int = 600
+    
+    # Rate limiting for public endpoints (per client IP and workspace slug)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # or "package.module:BackendClass" for a shared store
+    RATE_LIMIT_TRUSTED_PROXY_HOPS: int = 0  # proxies in front of the app that append X-Forwarded-For
+    RATE_LIMIT_PUBLIC_BOOKING_REQUESTS: int = 10
+    RATE_LIMIT_PUBLIC_BOOKING_WINDOW_SECONDS: int = 60
+    RATE_LIMIT_PUBLIC_CONTACT_REQUESTS: int = 5
+    RATE_LIMIT_PUBLIC_CONTACT_WINDOW_SECONDS: int = 60
     
     class Config:
         env_file = ".env"
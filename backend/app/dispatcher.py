@@ -0,0 +1,39 @@
+"""
+Standalone Outbox Dispatcher for CareOps
+Run with: python -m app.dispatcher
+"""
+
+import signal
+import threading
+
+from app.database import Base, engine
+from app.services.outbox_service import get_outbox_dispatcher
+from app.services.smtp_pool import smtp_pool
+from app.services.delivery_log import delivery_log
+from app.services.telegram_dispatcher import telegram_dispatcher
+from app.services.telegram_http import telegram_http
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        print(f"🛑 Received signal {signum}, finishing current batch...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    try:
+        get_outbox_dispatcher().run_forever(stop_event)
+    finally:
+        smtp_pool.close_all()
+        telegram_dispatcher.close()
+        telegram_http.close()
+        delivery_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Header, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -10,11 +10,27 @@ import atexit
 from app.database import get_db, Base, engine
 from app.config import settings
 from app import models, schemas
-from app.routes import sms_routes
+from app.routes import sms_routes, internal_routes
 from app.utils.security import verify_password, get_password_hash, create_access_token, decode_access_token
-from app.services.email_service import get_email_service
+from app.utils.idempotency import idempotency_store, request_fingerprint
+from app.utils.http_cache import bump_catalog_version, cached_catalog_response
+from app.utils.rate_limit import rate_limit
+from app.services.smtp_pool import smtp_pool
+from app.services.delivery_log import delivery_log
+from app.services.telegram_dispatcher import telegram_dispatcher
+from app.services.telegram_http import telegram_http
+from app.services.telegram_updates import telegram_update_queue, update_dedup
+from app.services.telegram_inbox import telegram_inbox
+from app.services.channel_identity import backfill_channel_identities
 from app.services.automation_service import get_automation_service
-from app.services.sms_service import get_sms_service
+from app.services.channel_config import channel_config_cache
+from app.services.booking_service import reserve_booking, update_booking_slot, BookingConflictError
+from app.services.outbox_service import enqueue_notification
+from app.services.template_service import (
+    template_registry, validate_template, TemplateError, TEMPLATE_VARIABLES, PARTS
+)
+from app.services.suppression import suppress, unsuppress, CHANNELS as SUPPRESSION_CHANNELS
+from app.services.worker_heartbeat import worker_health
 from app.scheduler import start_scheduler, stop_scheduler
 
 # Create all tables
@@ -28,6 +44,7 @@ app = FastAPI(
 
 # Include SMS routes
 app.include_router(sms_routes.router)
+app.include_router(internal_routes.router)
 
 # CORS middleware
 app.add_middleware(
@@ -44,14 +61,24 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 # ============== STARTUP/SHUTDOWN ==============
 @app.on_event("startup")
 async def startup_event():
-    """Start background scheduler on app startup"""
-    start_scheduler()
+    """Start background scheduler (unless a worker process runs it) and Telegram webhook workers on app startup"""
+    backfill_channel_identities()
+    if settings.RUN_SCHEDULER_IN_API:
+        start_scheduler()
+    update_dedup.load()
+    telegram_update_queue.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Stop background scheduler on app shutdown"""
+    """Finish queued webhook updates, stop background scheduler and close pooled connections on app shutdown"""
+    await telegram_update_queue.stop()
+    telegram_inbox.close()
     stop_scheduler()
+    smtp_pool.close_all()
+    telegram_dispatcher.close()
+    telegram_http.close()
+    delivery_log.close()
 
 
 # Ensure scheduler stops on exit
@@ -250,9 +277,10 @@ def update_workspace(
 ):
     """Update workspace settings"""
     for key, value in update_data.items():
-        if hasattr(workspace, key) and key not in ['id', 'slug', 'owner_id', 'created_at']:
+        if hasattr(workspace, key) and key not in ['id', 'slug', 'owner_id', 'created_at', 'catalog_version']:
             setattr(workspace, key, value)
     
+    bump_catalog_version(workspace)
     db.commit()
     db.refresh(workspace)
     return workspace
@@ -267,6 +295,7 @@ def activate_workspace(
     """Activate workspace after onboarding"""
     workspace.is_active = True
     workspace.onboarding_step = 8  # Completed
+    bump_catalog_version(workspace)
     db.commit()
     db.refresh(workspace)
     return {"message": "Workspace activated successfully", "workspace": workspace}
@@ -447,6 +476,7 @@ def create_integration(
     db.add(db_integration)
     db.commit()
     db.refresh(db_integration)
+    channel_config_cache.invalidate(workspace_id)
     return db_integration
 
 
@@ -463,6 +493,138 @@ def list_integrations(
     return integrations
 
 
+# ============== NOTIFICATION TEMPLATE ROUTES ==============
+def _template_view(workspace_id: str, name: str, db: Session) -> dict:
+    overrides = {
+        row.part: row.body
+        for row in db.query(models.NotificationTemplate).filter(
+            models.NotificationTemplate.workspace_id == workspace_id,
+            models.NotificationTemplate.name == name
+        ).all()
+    }
+    return {
+        "name": name,
+        "variables": sorted(TEMPLATE_VARIABLES[name]),
+        "parts": {
+            part: {
+                "source": overrides.get(part, template_registry.default_source(name, part)),
+                "overridden": part in overrides
+            }
+            for part in PARTS
+        }
+    }
+
+
+@app.get("/api/workspaces/{workspace_id}/templates/{name}")
+def get_notification_template(
+    workspace_id: str,
+    name: str,
+    workspace: models.Workspace = Depends(get_current_workspace),
+    db: Session = Depends(get_db)
+):
+    """Get the effective email/Telegram template for a workspace"""
+    if name not in TEMPLATE_VARIABLES:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return _template_view(workspace_id, name, db)
+
+
+@app.put("/api/workspaces/{workspace_id}/templates/{name}")
+def update_notification_template(
+    workspace_id: str,
+    name: str,
+    template: schemas.NotificationTemplateUpdate,
+    workspace: models.Workspace = Depends(get_current_workspace),
+    db: Session = Depends(get_db)
+):
+    """Override (or reset) parts of a notification template for a workspace"""
+    if name not in TEMPLATE_VARIABLES:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    for part, source in template.dict(exclude_unset=True).items():
+        existing = db.query(models.NotificationTemplate).filter(
+            models.NotificationTemplate.workspace_id == workspace_id,
+            models.NotificationTemplate.name == name,
+            models.NotificationTemplate.part == part
+        ).first()
+
+        if not source or not source.strip():
+            if existing:
+                db.delete(existing)
+            continue
+
+        try:
+            validate_template(name, part, source)
+        except TemplateError as e:
+            raise HTTPException(status_code=400, detail=f"{part}: {str(e)}")
+
+        if existing:
+            existing.body = source
+        else:
+            db.add(models.NotificationTemplate(
+                workspace_id=workspace_id,
+                name=name,
+                part=part,
+                body=source
+            ))
+
+    db.commit()
+    template_registry.invalidate(workspace_id, name)
+    return _template_view(workspace_id, name, db)
+
+
+# ============== SUPPRESSION ROUTES ==============
+@app.get("/api/workspaces/{workspace_id}/suppressions", response_model=List[schemas.SuppressionResponse])
+def list_suppressions(
+    workspace_id: str,
+    channel: Optional[str] = None,
+    workspace: models.Workspace = Depends(get_current_workspace),
+    db: Session = Depends(get_db)
+):
+    """List opted-out recipients: this workspace's plus global ones (STOP to the bot)"""
+    query = db.query(models.Suppression).filter(
+        (models.Suppression.workspace_id == workspace_id) | (models.Suppression.workspace_id == None)
+    )
+    if channel:
+        query = query.filter(models.Suppression.channel == channel)
+    return query.order_by(models.Suppression.created_at.desc()).all()
+
+
+@app.post("/api/workspaces/{workspace_id}/suppressions", response_model=schemas.SuppressionResponse)
+def create_suppression(
+    workspace_id: str,
+    suppression: schemas.SuppressionCreate,
+    workspace: models.Workspace = Depends(get_current_workspace),
+    db: Session = Depends(get_db)
+):
+    """Stop all email or Telegram messages from this workspace to a recipient"""
+    if suppression.channel not in SUPPRESSION_CHANNELS:
+        raise HTTPException(status_code=400, detail="channel must be 'email' or 'sms'")
+    if not suppression.address.strip():
+        raise HTTPException(status_code=400, detail="address is required")
+    
+    return suppress(db, workspace.id, suppression.channel, suppression.address, suppression.reason)
+
+
+@app.delete("/api/workspaces/{workspace_id}/suppressions/{channel}/{address}")
+def delete_suppression(
+    workspace_id: str,
+    channel: str,
+    address: str,
+    workspace: models.Workspace = Depends(get_current_workspace),
+    db: Session = Depends(get_db)
+):
+    """
+    Allow messages to a recipient again
+    
+    Only this workspace's entries can be removed; a STOP sent to the bot
+    is lifted by the recipient sending START.
+    """
+    if not unsuppress(db, workspace.id, channel, address):
+        raise HTTPException(status_code=404, detail="Suppression not found")
+    
+    return {"message": "Suppression removed"}
+
+
 # ============== CONTACT ROUTES ==============
 @app.post("/api/workspaces/{workspace_id}/contacts", response_model=schemas.ContactResponse)
 def create_contact(
@@ -484,16 +646,12 @@ def create_contact(
     )
     db.add(conversation)
     
+    # Queue welcome email (delivered by the outbox dispatcher)
+    enqueue_notification(db, workspace_id, "email", "welcome", contact_id=db_contact.id)
+    
     db.commit()
     db.refresh(db_contact)
     
-    # Send welcome email via automation
-    try:
-        email_service = get_email_service(workspace_id, db)
-        email_service.send_welcome_email(db_contact)
-    except Exception as e:
-        print(f"⚠️ Failed to send welcome email: {str(e)}")
-    
     return db_contact
 
 
@@ -567,6 +725,7 @@ def create_service(
         color=service.color
     )
     db.add(db_service)
+    bump_catalog_version(workspace)
     db.commit()
     db.refresh(db_service)
     return db_service
@@ -630,8 +789,6 @@ def create_booking(
     db: Session = Depends(get_db)
 ):
     """Create new booking"""
-    from datetime import timedelta
-    
     # Get or create contact
     contact = db.query(models.Contact).filter(
         models.Contact.workspace_id == workspace_id,
@@ -657,37 +814,27 @@ def create_booking(
     if not service:
         raise HTTPException(status_code=404, detail="Service type not found")
     
-    # Calculate end time
-    end_time = booking.scheduled_at + timedelta(minutes=service.duration_minutes)
+    # Reserve the slot (rejects overlapping bookings for this service)
+    try:
+        db_booking = reserve_booking(
+            db,
+            workspace_id=workspace_id,
+            contact_id=contact.id,
+            service=service,
+            scheduled_at=booking.scheduled_at,
+            notes=booking.notes
+        )
+    except BookingConflictError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    # Queue confirmation email and SMS
+    enqueue_notification(db, workspace_id, "email", "booking_confirmation", booking_id=db_booking.id)
+    enqueue_notification(db, workspace_id, "sms", "booking_confirmation", booking_id=db_booking.id)
     
-    db_booking = models.Booking(
-        workspace_id=workspace_id,
-        contact_id=contact.id,
-        service_type_id=booking.service_type_id,
-        scheduled_at=booking.scheduled_at,
-        end_time=end_time,
-        notes=booking.notes,
-        location=service.location,
-        status="pending"
-    )
-    db.add(db_booking)
     db.commit()
     db.refresh(db_booking)
     
-    # Send confirmation email
-    try:
-        email_service = get_email_service(workspace_id, db)
-        email_service.send_booking_confirmation(db_booking)
-    except Exception as e:
-        print(f"⚠️ Failed to send booking confirmation: {str(e)}")
-
-    # Send confirmation SMS
-    try:
-        sms_service = get_sms_service(workspace_id, db)
-        sms_service.send_booking_confirmation(db_booking)
-    except Exception as e:
-        print(f"⚠️ Failed to send SMS confirmation: {str(e)}")
-    
     return db_booking
 
 
@@ -721,6 +868,19 @@ def update_booking(
         raise HTTPException(status_code=404, detail="Booking not found")
     
     update_data = update.dict(exclude_unset=True)
+    
+    # Rescheduling or reactivating takes a slot (rejects overlapping bookings for this service)
+    try:
+        update_booking_slot(
+            db,
+            booking,
+            scheduled_at=update_data.pop("scheduled_at", None),
+            status=update_data.pop("status", None)
+        )
+    except BookingConflictError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    
     for field, value in update_data.items():
         setattr(booking, field, value)
     
@@ -1018,12 +1178,8 @@ def record_usage(
             )
             db.add(alert)
             
-            # Send email alert
-            try:
-                email_service = get_email_service(item.workspace_id, db)
-                email_service.send_low_stock_alert(item)
-            except Exception as e:
-                print(f"⚠️ Failed to send low stock email: {str(e)}")
+            # Queue email alert
+            enqueue_notification(db, item.workspace_id, "email", "low_stock_alert", item_id=item.id)
     
     db.commit()
     db.refresh(db_usage)
@@ -1135,7 +1291,7 @@ def get_dashboard_stats(
 
 # ============== PUBLIC ROUTES (No Auth) ==============
 @app.get("/api/public/workspaces/{slug}")
-def get_public_workspace(slug: str, db: Session = Depends(get_db)):
+def get_public_workspace(slug: str, request: Request, db: Session = Depends(get_db)):
     """Get public workspace info"""
     workspace = db.query(models.Workspace).filter(
         models.Workspace.slug == slug,
@@ -1145,15 +1301,22 @@ def get_public_workspace(slug: str, db: Session = Depends(get_db)):
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
     
-    return {
-        "business_name": workspace.business_name,
-        "address": workspace.address,
-        "timezone": workspace.timezone
-    }
+    return cached_catalog_response(
+        request,
+        workspace,
+        route="workspace",
+        s_maxage=settings.PUBLIC_WORKSPACE_S_MAXAGE,
+        stale_while_revalidate=settings.PUBLIC_WORKSPACE_STALE_WHILE_REVALIDATE,
+        build=lambda: {
+            "business_name": workspace.business_name,
+            "address": workspace.address,
+            "timezone": workspace.timezone
+        }
+    )
 
 
 @app.get("/api/public/workspaces/{slug}/services")
-def get_public_services(slug: str, db: Session = Depends(get_db)):
+def get_public_services(slug: str, request: Request, db: Session = Depends(get_db)):
     """Get public service types"""
     workspace = db.query(models.Workspace).filter(
         models.Workspace.slug == slug,
@@ -1163,12 +1326,18 @@ def get_public_services(slug: str, db: Session = Depends(get_db)):
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
     
-    services = db.query(models.ServiceType).filter(
-        models.ServiceType.workspace_id == workspace.id,
-        models.ServiceType.is_active == True
-    ).all()
-    
-    return services
+    # Only hit service_types when the client's copy is out of date
+    return cached_catalog_response(
+        request,
+        workspace,
+        route="services",
+        s_maxage=settings.PUBLIC_SERVICES_S_MAXAGE,
+        stale_while_revalidate=settings.PUBLIC_SERVICES_STALE_WHILE_REVALIDATE,
+        build=lambda: db.query(models.ServiceType).filter(
+            models.ServiceType.workspace_id == workspace.id,
+            models.ServiceType.is_active == True
+        ).all()
+    )
 
 @app.get("/api/public/workspaces/{slug}/services/{service_id}/availability")
 def get_public_availability(slug: str, service_id: str, db: Session = Depends(get_db)):
@@ -1196,13 +1365,29 @@ def get_public_availability(slug: str, service_id: str, db: Session = Depends(ge
     
     return slots
 
-@app.post("/api/public/workspaces/{slug}/bookings")
+@app.post(
+    "/api/public/workspaces/{slug}/bookings",
+    dependencies=[Depends(rate_limit(
+        "public_booking",
+        settings.RATE_LIMIT_PUBLIC_BOOKING_REQUESTS,
+        settings.RATE_LIMIT_PUBLIC_BOOKING_WINDOW_SECONDS
+    ))]
+)
 def create_public_booking(
     slug: str,
     booking: schemas.BookingCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
     """Create booking from public booking page"""
+    return idempotency_store.run(
+        f"booking:{slug}:{idempotency_key}" if idempotency_key else None,
+        request_fingerprint(booking.dict()),
+        lambda: _create_public_booking(slug, booking, db)
+    )
+
+
+def _create_public_booking(slug: str, booking: schemas.BookingCreate, db: Session):
     workspace = db.query(models.Workspace).filter(
         models.Workspace.slug == slug,
         models.Workspace.is_active == True
@@ -1244,41 +1429,51 @@ def create_public_booking(
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
     
-    from datetime import timedelta
-    end_time = booking.scheduled_at + timedelta(minutes=service.duration_minutes)
-    
-    # Create booking
-    db_booking = models.Booking(
-        workspace_id=workspace.id,
-        contact_id=contact.id,
-        service_type_id=service.id,
-        scheduled_at=booking.scheduled_at,
-        end_time=end_time,
-        notes=booking.notes,
-        location=service.location,
-        status="pending"
-    )
-    db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
-    
-    # Send confirmation email
+    # Create booking (rejects overlapping bookings for this service)
     try:
-        email_service = get_email_service(workspace.id, db)
-        email_service.send_booking_confirmation(db_booking)
-    except Exception as e:
-        print(f"⚠️ Failed to send booking confirmation: {str(e)}")
+        db_booking = reserve_booking(
+            db,
+            workspace_id=workspace.id,
+            contact_id=contact.id,
+            service=service,
+            scheduled_at=booking.scheduled_at,
+            notes=booking.notes
+        )
+    except BookingConflictError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    # Queue confirmation email
+    enqueue_notification(db, workspace.id, "email", "booking_confirmation", booking_id=db_booking.id)
+    
+    db.commit()
     
     return {"message": "Booking created successfully", "booking_id": str(db_booking.id)}
 
 
-@app.post("/api/public/workspaces/{slug}/contact")
+@app.post(
+    "/api/public/workspaces/{slug}/contact",
+    dependencies=[Depends(rate_limit(
+        "public_contact",
+        settings.RATE_LIMIT_PUBLIC_CONTACT_REQUESTS,
+        settings.RATE_LIMIT_PUBLIC_CONTACT_WINDOW_SECONDS
+    ))]
+)
 def submit_public_contact_form(
     slug: str,
     form_data: dict,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
     """Submit contact form from public page"""
+    return idempotency_store.run(
+        f"contact:{slug}:{idempotency_key}" if idempotency_key else None,
+        request_fingerprint(form_data),
+        lambda: _submit_public_contact_form(slug, form_data, db)
+    )
+
+
+def _submit_public_contact_form(slug: str, form_data: dict, db: Session):
     workspace = db.query(models.Workspace).filter(
         models.Workspace.slug == slug,
         models.Workspace.is_active == True
@@ -1340,14 +1535,10 @@ def submit_public_contact_form(
         db.add(db_message)
         conversation.last_message_at = datetime.now()
     
-    db.commit()
+    # Queue welcome email
+    enqueue_notification(db, workspace.id, "email", "welcome", contact_id=contact.id)
     
-    # Send welcome email
-    try:
-        email_service = get_email_service(workspace.id, db)
-        email_service.send_welcome_email(contact)
-    except Exception as e:
-        print(f"⚠️ Failed to send welcome email: {str(e)}")
+    db.commit()
     
     return {"message": "Thank you! We'll be in touch soon.", "contact_id": str(contact.id)}
 
@@ -1359,8 +1550,23 @@ def root():
 
 
 @app.get("/health")
-def health_check():
-    return {"status": "healthy", "scheduler": "active"}
+def health_check(db: Session = Depends(get_db)):
+    """
+    Liveness plus where scheduled jobs run: in this process, or in
+    `python -m app.worker` processes reported through their heartbeats
+    (degraded when the API leaves the scheduler to workers and none is alive)
+    """
+    try:
+        workers = worker_health(db)
+    except Exception as e:
+        workers = {"error": str(e)}
+    
+    healthy = settings.RUN_SCHEDULER_IN_API or workers.get("alive", 0) > 0
+    return {
+        "status": "healthy" if healthy else "degraded",
+        "scheduler": "api" if settings.RUN_SCHEDULER_IN_API else "worker",
+        "workers": workers,
+    }
 
 
 if __name__ == "__main__":
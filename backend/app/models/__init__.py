@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Integer, DateTime, ForeignKey, Text, Time, JSON, CheckConstraint
+from sqlalchemy import Column, String, Boolean, Integer, BigInteger, DateTime, ForeignKey, Text, Time, JSON, CheckConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -44,6 +44,7 @@ class Workspace(Base):
     contact_phone = Column(String(50))
     is_active = Column(Boolean, default=False)
     onboarding_step = Column(Integer, default=1)
+    catalog_version = Column(Integer, nullable=False, default=1, server_default="1")  # bumped when public catalog changes
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -141,6 +142,7 @@ class Conversation(Base):
     
     __table_args__ = (
         CheckConstraint("status IN ('open', 'closed')", name="check_conversation_status"),
+        Index("ix_conversations_contact", "contact_id"),
     )
 
 
@@ -379,3 +381,138 @@ class ActivityLog(Base):
     
     # Relationships
     workspace = relationship("Workspace", back_populates="activity_logs")
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False)
+    channel = Column(String(20), nullable=False)  # 'email', 'sms'
+    kind = Column(String(50), nullable=False)  # 'welcome', 'booking_confirmation', 'low_stock_alert'
+    payload = Column(JSON, nullable=False)  # ids of the rows to render from
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+    sent_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        CheckConstraint("status IN ('pending', 'processing', 'sent', 'skipped', 'dead')",
+                       name="check_outbox_status"),
+        CheckConstraint("channel IN ('email', 'sms')", name="check_outbox_channel"),
+        Index("ix_notification_outbox_due", "status", "next_attempt_at"),
+    )
+
+
+class NotificationTemplate(Base):
+    __tablename__ = "notification_templates"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String(50), nullable=False)  # 'booking_reminder', 'welcome', ...
+    part = Column(String(20), nullable=False)  # 'subject', 'email', 'telegram'
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        CheckConstraint("part IN ('subject', 'email', 'telegram')", name="check_template_part"),
+        Index("ix_notification_templates_lookup", "workspace_id", "name", "part", unique=True),
+    )
+
+
+class DeliveryLog(Base):
+    __tablename__ = "delivery_log"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False)
+    channel = Column(String(20), nullable=False)  # 'email', 'sms'
+    recipient = Column(String(255), nullable=False)  # email address or Telegram chat id
+    status = Column(String(20), nullable=False)  # 'sent', 'failed', 'demo'
+    latency_ms = Column(Integer)  # hand-off to provider answer, including time queued
+    provider_message_id = Column(String(255))  # Telegram message_id / SMTP Message-ID
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        CheckConstraint("status IN ('sent', 'failed', 'demo')", name="check_delivery_log_status"),
+        CheckConstraint("channel IN ('email', 'sms')", name="check_delivery_log_channel"),
+        # Keyset pagination: newest first, optionally narrowed to one status
+        Index("ix_delivery_log_workspace_time", "workspace_id", "channel", "created_at", "id"),
+        Index("ix_delivery_log_workspace_status_time", "workspace_id", "channel", "status", "created_at", "id"),
+    )
+
+
+class Suppression(Base):
+    __tablename__ = "suppressions"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # NULL = every workspace (e.g. STOP sent to the shared Telegram bot)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"))
+    channel = Column(String(20), nullable=False)  # 'email', 'sms'
+    address = Column(String(255), nullable=False)  # lower-cased email or Telegram chat id
+    reason = Column(String(50), nullable=False, default="manual")  # 'stop', 'manual', 'bounce'
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        CheckConstraint("channel IN ('email', 'sms')", name="check_suppression_channel"),
+        Index("ix_suppressions_workspace", "workspace_id", "channel", "address", unique=True),
+        Index("ix_suppressions_global", "channel", "address", unique=True,
+              postgresql_where=workspace_id.is_(None)),
+    )
+
+
+class ChannelIdentity(Base):
+    __tablename__ = "channel_identities"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False)
+    contact_id = Column(UUID(as_uuid=True), ForeignKey("contacts.id", ondelete="CASCADE"), nullable=False)
+    channel = Column(String(20), nullable=False)  # 'telegram'
+    external_id = Column(String(255), nullable=False)  # Telegram chat id
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        CheckConstraint("channel IN ('telegram')", name="check_channel_identity_channel"),
+        # Leads with (channel, external_id) so an inbound chat resolves across workspaces in one lookup
+        Index("ix_channel_identities_external", "channel", "external_id", "workspace_id", unique=True),
+        Index("ix_channel_identities_contact", "contact_id", "channel"),
+    )
+
+
+class TelegramBotState(Base):
+    __tablename__ = "telegram_bot_state"
+    
+    bot_id = Column(String(64), primary_key=True)  # numeric prefix of the bot token
+    last_update_id = Column(BigInteger, nullable=False, default=0)  # high-water mark of accepted updates
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class TelegramUpdateClaim(Base):
+    __tablename__ = "telegram_update_claims"
+    
+    bot_id = Column(String(64), primary_key=True)
+    update_id = Column(BigInteger, primary_key=True)  # one row per update a webhook worker took on
+    claimed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_telegram_update_claims_claimed_at", "claimed_at"),
+    )
+
+
+class WorkerHeartbeat(Base):
+    __tablename__ = "worker_heartbeats"
+    
+    id = Column(String(255), primary_key=True)  # hostname:pid
+    status = Column(String(20), nullable=False, default="running")  # 'running', 'draining', 'stopped'
+    is_leader = Column(Boolean, nullable=False, default=False)  # holds scheduler leadership
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    last_seen_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    stats = Column(JSON)
+    
+    __table_args__ = (
+        CheckConstraint("status IN ('running', 'draining', 'stopped')", name="check_worker_heartbeat_status"),
+    )
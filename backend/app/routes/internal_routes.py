@@ -0,0 +1,71 @@
+"""
+Internal API Routes for CareOps
+Operational status: provider circuit breakers, send queues, batch runs and the notification backlog
+"""
+
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import get_db
+from app import models
+from app.services.delivery_progress import delivery_runs
+from app.services.leader_election import scheduler_leader
+from app.services.smtp_pool import smtp_pool
+from app.services.telegram_dispatcher import TELEGRAM_BREAKER, telegram_dispatcher
+from app.services.worker_heartbeat import worker_health
+from app.utils.circuit_breaker import circuit_breakers
+
+
+router = APIRouter(prefix="/api/internal", tags=["Internal"])
+
+
+def require_internal_token(x_internal_token: Optional[str] = Header(None, alias="X-Internal-Token")):
+    """
+    Internal routes span every workspace (SMTP hosts and users appear in
+    breaker names), so they take the operator's INTERNAL_API_TOKEN rather
+    than a user login; without one configured they are not served at all
+    """
+    if not settings.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_internal_token or not hmac.compare_digest(x_internal_token, settings.INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid internal token")
+
+
+@router.get("/status", dependencies=[Depends(require_internal_token)])
+def get_internal_status(db: Session = Depends(get_db)):
+    """
+    Circuit breaker state per provider (Telegram, each SMTP account), the SMS
+    provider in use, send queues, whether this process leads the scheduler,
+    per-workspace progress of the latest reminder runs and outbox rows
+    waiting to go out
+
+    Breakers, queues, the SMTP pool and batch runs are per process and the
+    top-level fields describe only the API process serving the request.
+    Sends mostly happen in `python -m app.worker` processes, whose own
+    breakers, pools and queues are under `workers`, as of their last
+    heartbeat. The standalone `python -m app.dispatcher` does not report.
+    """
+    backlog = dict(
+        db.query(models.NotificationOutbox.status, func.count())
+        .filter(models.NotificationOutbox.status.in_(["pending", "processing", "dead"]))
+        .group_by(models.NotificationOutbox.status)
+        .all()
+    )
+    telegram = telegram_dispatcher.stats(top=0)
+    telegram.pop("deepest_chats")
+
+    return {
+        "circuit_breakers": circuit_breakers.stats(),
+        "sms_provider": "telegram" if circuit_breakers.get(TELEGRAM_BREAKER).available() else "fallback",
+        "telegram": telegram,
+        "smtp_pool": smtp_pool.stats(),
+        "scheduler_leader": scheduler_leader.stats(),
+        "batch_runs": delivery_runs.stats(),
+        "outbox": {status: backlog.get(status, 0) for status in ("pending", "processing", "dead")},
+        "workers": worker_health(db)["workers"],
+    }
@@ -7,10 +7,16 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+from datetime import datetime
+import uuid
 
 from app.database import get_db
 from app import models
 from app.services.sms_service import get_sms_service, TelegramSMSService
+from app.services.channel_config import channel_config_cache
+from app.services.delivery_log import query_delivery_logs
+from app.services.telegram_dispatcher import telegram_dispatcher
+from app.services.telegram_updates import telegram_update_queue
 
 
 router = APIRouter(prefix="/api/sms", tags=["SMS"])
@@ -34,7 +40,7 @@ class TelegramWebhook(BaseModel):
     callback_query: Optional[Dict[str, Any]] = None
 
 
-async def get_current_user(db: Session = Depends(get_db)):
+def get_current_user(db: Session = Depends(get_db)):
     """Simplified user authentication for demo"""
     # In production, implement proper JWT token validation
     # For now, return first user
@@ -45,7 +51,7 @@ async def get_current_user(db: Session = Depends(get_db)):
 
 
 @router.get("/status")
-async def get_sms_status(
+def get_sms_status(
     workspace_id: str,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
@@ -83,8 +89,20 @@ async def get_sms_status(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/queue")
+async def get_sms_queue(
+    top: int = 10,
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Telegram send queue: pending messages, deepest per-chat queues, 429 counts and
+    sends saved by coalescing, plus the incoming webhook update queue
+    """
+    return {**telegram_dispatcher.stats(top=top), "webhook": telegram_update_queue.stats()}
+
+
 @router.post("/test")
-async def test_sms(
+def test_sms(
     workspace_id: str,
     request: SMSTestRequest,
     db: Session = Depends(get_db),
@@ -92,9 +110,13 @@ async def test_sms(
 ):
     """
     Test SMS sending to a specific chat ID
+
+    A plain def: the send waits in the rate-limited Telegram queue (up to
+    TELEGRAM_SEND_WAIT_SECONDS), so it runs on the threadpool, not the event loop
     """
     try:
-        sms_service = get_sms_service(workspace_id, db)
+        # A test must really send, not fall back to logging
+        sms_service = get_sms_service(workspace_id, db, fallback=False)
         
         success = sms_service.send_custom_sms(
             request.phone_or_chat_id,
@@ -119,7 +141,7 @@ async def test_sms(
 
 
 @router.post("/configure/telegram")
-async def configure_telegram(
+def configure_telegram(
     workspace_id: str,
     config: TelegramConfigRequest,
     db: Session = Depends(get_db),
@@ -154,6 +176,7 @@ async def configure_telegram(
         
         db.commit()
         db.refresh(integration)
+        channel_config_cache.invalidate(workspace_id)
         
         return {
             "success": True,
@@ -201,80 +224,75 @@ async def chat_id_helper():
 
 
 @router.post("/webhook/telegram")
-async def telegram_webhook(
-    update: Dict[str, Any],
-    db: Session = Depends(get_db)
-):
+async def telegram_webhook(update: Dict[str, Any]):
     """
     Telegram webhook endpoint for receiving updates
     This allows bidirectional communication
     
+    The update is only queued here; webhook workers process it and send
+    any reply, so Telegram is acknowledged without waiting on the Bot API.
+    
     To set webhook: 
     POST https://api.telegram.org/bot<TOKEN>/setWebhook
     Body: {"url": "https://your-domain.com/api/sms/webhook/telegram"}
     """
-    try:
-        print(f"📱 Received Telegram webhook update: {update}")
-        
-        # Extract message
-        message = update.get("message", {})
-        chat_id = message.get("chat", {}).get("id")
-        text = message.get("text", "")
-        
-        if not chat_id or not text:
-            return {"ok": True, "message": "No action needed"}
-        
-        # Handle commands
-        if text.lower() == "/start":
-            # User is starting conversation with bot
-            response_text = (
-                "👋 Welcome to CareOps SMS Bot!\n\n"
-                f"Your Chat ID is: {chat_id}\n\n"
-                "Use this ID in your workspace settings to receive notifications."
-            )
-            
-            # Send response back
-            sms_service = TelegramSMSService(workspace_id="demo", db=db)
-            sms_service._send_telegram_message(str(chat_id), response_text)
-        
-        elif text.lower() == "/help":
-            response_text = (
-                "🤖 CareOps SMS Bot Commands:\n\n"
-                "/start - Get your Chat ID\n"
-                "/help - Show this help message\n"
-                "STOP - Unsubscribe from notifications"
-            )
-            
-            sms_service = TelegramSMSService(workspace_id="demo", db=db)
-            sms_service._send_telegram_message(str(chat_id), response_text)
-        
-        elif text.upper() == "STOP":
-            # Handle unsubscribe
-            response_text = "✅ You've been unsubscribed from notifications."
-            
-            sms_service = TelegramSMSService(workspace_id="demo", db=db)
-            sms_service._send_telegram_message(str(chat_id), response_text)
-        
-        return {"ok": True}
+    if not telegram_update_queue.offer(update):
+        # Telegram retries non-2xx responses, so nothing is lost
+        raise HTTPException(status_code=503, detail="Webhook queue is full, retry later")
     
-    except Exception as e:
-        print(f"❌ Webhook error: {str(e)}")
-        return {"ok": False, "error": str(e)}
+    return {"ok": True}
 
 
 @router.get("/logs/{workspace_id}")
-async def get_sms_logs(
+def get_sms_logs(
     workspace_id: str,
     limit: int = 50,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    channel: str = "sms",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """
-    Get SMS sending logs for a workspace
-    (Would require additional SMS log table in production)
+    Get SMS sending logs for a workspace, newest first
+    
+    Filter by status ('sent', 'failed', 'demo') and a [since, until) time
+    range; pass next_cursor back as `cursor` for the following page.
+    channel=email returns the email log instead.
     """
-    # Placeholder - would query SMS logs table
+    if channel not in ("sms", "email"):
+        raise HTTPException(status_code=400, detail="channel must be 'sms' or 'email'")
+    if status and status not in ("sent", "failed", "demo"):
+        raise HTTPException(status_code=400, detail="status must be 'sent', 'failed' or 'demo'")
+    try:
+        workspace_uuid = uuid.UUID(workspace_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid workspace id")
+    
+    try:
+        rows, next_cursor = query_delivery_logs(
+            db, workspace_uuid, channel,
+            status=status, since=since, until=until, cursor=cursor,
+            limit=max(1, min(limit, 200))
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     return {
-        "logs": [],
-        "message": "SMS logging not yet implemented in database"
-    }
\ No newline at end of file
+        "logs": [
+            {
+                "id": str(row.id),
+                "channel": row.channel,
+                "recipient": row.recipient,
+                "status": row.status,
+                "latency_ms": row.latency_ms,
+                "provider_message_id": row.provider_message_id,
+                "error": row.error,
+                "created_at": row.created_at.isoformat()
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor
+    }
@@ -3,15 +3,40 @@ Background Job Scheduler for CareOps
 Runs periodic automation tasks
 """
 
+import functools
+
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from app.config import settings
 from app.database import SessionLocal
 from app.services.automation_service import get_automation_service
+from app.services.outbox_service import get_outbox_dispatcher
+from app.services.delivery_log import delivery_log
+from app.services.leader_election import scheduler_leader
+from app.services.telegram_dispatcher import telegram_dispatcher
+from app.services.telegram_http import telegram_http
 
 
 scheduler = BackgroundScheduler()
 
 
+def leader_only(job):
+    """
+    Run a job only in the process holding scheduler leadership.
+
+    Every API worker and instance starts this scheduler; without this
+    each of them would send the same reminders.
+    """
+    @functools.wraps(job)
+    def run():
+        if not scheduler_leader.refresh():
+            print(f"⏭️ Skipping {job.__name__}: another process is the scheduler leader")
+            return
+        job()
+    return run
+
+
 def run_booking_reminders():
     """Job: Send booking reminders"""
     db = SessionLocal()
@@ -48,12 +73,40 @@ def run_inventory_checks():
         db.close()
 
 
-def start_scheduler():
+_outbox_dispatcher = None
+
+
+def run_outbox_dispatch():
+    """Job: Deliver queued notifications"""
+    global _outbox_dispatcher
+    try:
+        if _outbox_dispatcher is None:
+            _outbox_dispatcher = get_outbox_dispatcher()
+        # Keep draining while batches come back full
+        while _outbox_dispatcher.drain_once() >= settings.OUTBOX_BATCH_SIZE:
+            pass
+    except Exception as e:
+        print(f"❌ Error in outbox dispatch job: {str(e)}")
+
+
+def start_scheduler(dispatch_outbox: bool = settings.OUTBOX_DISPATCH_IN_SCHEDULER):
     """Start the background scheduler"""
     
+    # Take (or keep) scheduler leadership ahead of the jobs below
+    scheduler.add_job(
+        scheduler_leader.refresh,
+        trigger=IntervalTrigger(seconds=settings.SCHEDULER_LEADER_CHECK_SECONDS),
+        id='leader_election',
+        name='Refresh scheduler leadership',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+    scheduler_leader.refresh()
+    
     # Send booking reminders daily at 10 AM
     scheduler.add_job(
-        run_booking_reminders,
+        leader_only(run_booking_reminders),
         trigger=CronTrigger(hour=10, minute=0),
         id='booking_reminders',
         name='Send booking reminders',
@@ -62,7 +115,7 @@ def start_scheduler():
     
     # Send form reminders daily at 2 PM
     scheduler.add_job(
-        run_form_reminders,
+        leader_only(run_form_reminders),
         trigger=CronTrigger(hour=14, minute=0),
         id='form_reminders',
         name='Send form completion reminders',
@@ -71,18 +124,38 @@ def start_scheduler():
     
     # Check inventory every 6 hours
     scheduler.add_job(
-        run_inventory_checks,
+        leader_only(run_inventory_checks),
         trigger=CronTrigger(hour='*/6'),
         id='inventory_checks',
         name='Check inventory levels',
         replace_existing=True
     )
     
+    # Drain the notification outbox (a standalone `python -m app.dispatcher`
+    # can run alongside; rows are claimed with SKIP LOCKED)
+    if dispatch_outbox:
+        scheduler.add_job(
+            run_outbox_dispatch,
+            trigger=IntervalTrigger(seconds=settings.OUTBOX_POLL_INTERVAL_SECONDS),
+            id='outbox_dispatch',
+            name='Deliver queued notifications',
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+    
     scheduler.start()
     print("✅ Background scheduler started")
 
 
 def stop_scheduler():
-    """Stop the background scheduler"""
-    scheduler.shutdown()
-    print("🛑 Background scheduler stopped")
\ No newline at end of file
+    """Stop the background scheduler, hand over leadership, drain queued Telegram sends, close the Bot API connections and flush the delivery log"""
+    try:
+        if scheduler.running:
+            scheduler.shutdown()  # waits for running jobs
+            print("🛑 Background scheduler stopped")
+    finally:
+        scheduler_leader.release()
+        telegram_dispatcher.close()
+        telegram_http.close()
+        delivery_log.close()
\ No newline at end of file
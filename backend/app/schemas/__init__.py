@@ -350,6 +350,33 @@ class IntegrationResponse(BaseModel):
         from_attributes = True
 
 
+# ============== NOTIFICATION TEMPLATE SCHEMAS ==============
+class NotificationTemplateUpdate(BaseModel):
+    # Omitted parts are left alone; an empty string resets a part to the default
+    subject: Optional[str] = None
+    email: Optional[str] = None
+    telegram: Optional[str] = None
+
+
+# ============== SUPPRESSION SCHEMAS ==============
+class SuppressionCreate(BaseModel):
+    channel: str  # 'email' or 'sms'
+    address: str  # email address or Telegram chat id
+    reason: str = "manual"
+
+
+class SuppressionResponse(BaseModel):
+    id: UUID
+    workspace_id: Optional[UUID] = None  # None = applies to every workspace
+    channel: str
+    address: str
+    reason: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 # ============== ALERT SCHEMAS ==============
 class AlertCreate(BaseModel):
     workspace_id: UUID
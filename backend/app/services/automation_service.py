@@ -4,12 +4,24 @@ Handles background jobs and automation triggers
 """
 
 from datetime import datetime, timedelta
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
-from typing import List
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
 
 from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.services.channel_identity import telegram_chat_ids
+from app.services.delivery_progress import DeliveryProgress, delivery_runs
 from app.services.email_service import get_email_service
-from app.services.sms_service import get_sms_service
+from app.services.email_delivery import EmailJob, get_email_delivery
+from app.services.sms_service import get_sms_service, send_outcome, wait_for_telegram
+from app.services.notification_context import NotificationContext, load_submission_contexts
+from app.services.outbox_service import enqueue_notification
+from app.services.telegram_dispatcher import TELEGRAM_BREAKER
+from app.services.template_service import booking_context
+from app.utils.circuit_breaker import circuit_breakers
 
 
 class AutomationService:
@@ -17,37 +29,178 @@ class AutomationService:
     
     def __init__(self, db: Session):
         self.db = db
+        # One service per workspace for the length of a run
+        self._email_services = {}
+        self._sms_services = {}
     
-    def send_booking_reminders(self):
-        """Send reminders for bookings happening in next 24 hours"""
+    def _email_service(self, workspace_id):
+        if workspace_id not in self._email_services:
+            self._email_services[workspace_id] = get_email_service(workspace_id, self.db)
+        return self._email_services[workspace_id]
+    
+    def _sms_service(self, workspace_id):
+        # Always Telegram, never the logging fallback: while Telegram is down,
+        # reminders go to the outbox instead (see _queue_sms_reminder)
+        if workspace_id not in self._sms_services:
+            self._sms_services[workspace_id] = get_sms_service(workspace_id, self.db, fallback=False)
+        return self._sms_services[workspace_id]
+    
+    def _queue_sms_reminder(
+        self,
+        progress: DeliveryProgress,
+        workspace_id,
+        kind: str,
+        queue: Callable[[], Optional[Future]],
+        **payload
+    ) -> Optional[Future]:
+        """
+        Queue a Telegram reminder, or hand it to the outbox while Telegram's
+        circuit breaker is open; the outbox row commits with the run's
+        reminded marks and is sent once Telegram recovers
+        """
+        if not circuit_breakers.get(TELEGRAM_BREAKER).available():
+            enqueue_notification(self.db, workspace_id, "sms", kind, **payload)
+            return None
+        future = queue()
+        if future is not None:
+            future.outbox = (workspace_id, kind, payload)
+            self._track_sms(progress, workspace_id, future)
+        return future
+    
+    def _wait_for_sms(self, futures):
+        """
+        Wait for queued Telegram reminders (sent while the emails went out);
+        the ones turned away because the breaker opened meanwhile go to the outbox
+        """
+        for future in futures:
+            if future is None:
+                continue
+            result = wait_for_telegram(future)
+            if result.get("circuit_open"):
+                workspace_id, kind, payload = future.outbox
+                enqueue_notification(self.db, workspace_id, "sms", kind, **payload)
+    
+    def _track_sms(self, progress: DeliveryProgress, workspace_id, future: Future):
+        """Count a queued Telegram reminder in the run's progress once it is sent"""
+        progress.queued(workspace_id)
+        
+        def done(f):
+            failed = f.cancelled() or f.exception() is not None
+            progress.done(workspace_id, False if failed else send_outcome(f.result()))
+        
+        future.add_done_callback(done)
+    
+    def send_booking_reminders(self, chunk_size: int = settings.REMINDER_BATCH_SIZE) -> int:
+        """
+        Send reminders for bookings happening in next 24 hours; returns how many were reminded
+        
+        Due bookings come with their contact, service and workspace from one
+        joined query, streamed `chunk_size` rows at a time on a session of
+        their own (so committing a chunk doesn't close the cursor). Each
+        chunk costs one more query for the contacts' Telegram chats; it is
+        delivered, then marked with one UPDATE ... WHERE id IN (...) and
+        committed, so a crash mid-run only repeats the chunk in flight.
+        The services (SMTP config, templates) are built once per workspace.
+        
+        Rows come round-robin across workspaces (every workspace's first
+        booking, then every second one, ...), so a workspace with thousands
+        of bookings fills the later chunks instead of holding up everyone
+        else's reminders; progress per workspace is kept in delivery_runs.
+        """
         tomorrow = datetime.now() + timedelta(days=1)
         day_after = tomorrow + timedelta(days=1)
+        progress = delivery_runs.start("booking_reminders")
+        turn = func.row_number().over(
+            partition_by=models.Booking.workspace_id, order_by=models.Booking.id
+        )
         
-        # Find bookings scheduled for tomorrow that haven't been reminded
-        upcoming_bookings = self.db.query(models.Booking).filter(
-            models.Booking.scheduled_at >= tomorrow,
-            models.Booking.scheduled_at < day_after,
-            models.Booking.status == "pending",
-            models.Booking.reminder_sent == False
-        ).all()
+        stream = SessionLocal()
+        try:
+            # Bookings scheduled for tomorrow that haven't been reminded
+            rows = stream.query(
+                models.Booking, models.Contact, models.ServiceType, models.Workspace
+            ).join(
+                models.Contact, models.Contact.id == models.Booking.contact_id
+            ).join(
+                models.Workspace, models.Workspace.id == models.Booking.workspace_id
+            ).outerjoin(
+                models.ServiceType, models.ServiceType.id == models.Booking.service_type_id
+            ).filter(
+                models.Booking.scheduled_at >= tomorrow,
+                models.Booking.scheduled_at < day_after,
+                models.Booking.status == "pending",
+                models.Booking.reminder_sent == False
+            ).order_by(
+                turn, models.Booking.workspace_id
+            ).yield_per(chunk_size)
+            
+            reminded = 0
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == chunk_size:
+                    reminded += self._send_booking_reminder_chunk(chunk, progress)
+                    chunk = []
+            if chunk:
+                reminded += self._send_booking_reminder_chunk(chunk, progress)
+        finally:
+            stream.close()
+            progress.finish()
         
-        print(f"📧 Sending reminders for {len(upcoming_bookings)} bookings...")
+        print(f"📧 Sent reminders for {reminded} bookings")
+        return reminded
+    
+    def _send_booking_reminder_chunk(
+        self,
+        rows: List[Tuple[models.Booking, models.Contact, models.ServiceType, models.Workspace]],
+        progress: DeliveryProgress
+    ) -> int:
+        """Remind one chunk of (booking, contact, service, workspace) rows and mark them sent"""
+        chat_ids = telegram_chat_ids(self.db, (contact for _, contact, _, _ in rows))
+        email_jobs = []
+        sms_futures = []
+        reminded = []
         
-        for booking in upcoming_bookings:
+        for booking, contact, service, workspace in rows:
             try:
-                email_service = get_email_service(booking.workspace_id, self.db)
-                email_service.send_booking_reminder(booking)
-
-                # Send SMS reminder
-                sms_service = get_sms_service(booking.workspace_id, self.db)
-                sms_service.send_booking_reminder(booking)
+                context = NotificationContext(
+                    workspace, contact, booking_context(workspace, contact, service, booking),
+                    chat_ids.get(contact.id)
+                )
                 
-                booking.reminder_sent = True
-                self.db.commit()
+                # Queue SMS reminder; the dispatcher paces it to Telegram's limits
+                sms_service = self._sms_service(workspace.id)
+                sms_futures.append(self._queue_sms_reminder(
+                    progress, workspace.id, "booking_reminder",
+                    lambda: sms_service.queue_booking_reminder(booking, context),
+                    booking_id=booking.id
+                ))
+                
+                # Render now, deliver the chunk's emails concurrently below
+                email_service = self._email_service(workspace.id)
+                email = email_service.build_booking_reminder(booking, context)
+                if email:
+                    email_jobs.append(EmailJob(email_service.config, email, email_service.workspace_id))
+                    progress.queued(workspace.id)
+                
+                reminded.append(booking.id)
                 
             except Exception as e:
                 print(f"❌ Failed to send reminder for booking {booking.id}: {str(e)}")
                 continue
+        
+        get_email_delivery().deliver_batch(email_jobs, progress)
+        self._wait_for_sms(sms_futures)
+        
+        if reminded:
+            self.db.execute(
+                update(models.Booking)
+                .where(models.Booking.id.in_(reminded))
+                .values(reminder_sent=True)
+                .execution_options(synchronize_session=False)
+            )
+        self.db.commit()
+        return len(reminded)
     
     def send_form_reminders(self):
         """Send reminders for pending forms"""
@@ -62,26 +215,50 @@ class AutomationService:
         
         print(f"📋 Sending form reminders for {len(pending_submissions)} submissions...")
         
+        # Bookings, workspaces, contacts and forms for every submission in four queries
+        contexts = load_submission_contexts(self.db, pending_submissions)
+        progress = delivery_runs.start("form_reminders")
+        email_jobs = []
+        sms_futures = []
+        reminded = []
+        
         for submission in pending_submissions:
+            context = contexts.get(submission.id)
+            if context is None:
+                continue
+            
             try:
-                booking = self.db.query(models.Booking).filter(
-                    models.Booking.id == submission.booking_id
-                ).first()
+                workspace_id = context.workspace.id
                 
-                if booking:
-                    email_service = get_email_service(booking.workspace_id, self.db)
-                    email_service.send_form_reminder(submission)
+                # Render now, deliver all emails concurrently below
+                email_service = self._email_service(workspace_id)
+                email = email_service.build_form_reminder(submission, context)
+                if email:
+                    email_jobs.append(EmailJob(email_service.config, email, email_service.workspace_id))
+                    progress.queued(workspace_id)
 
-                    # Send SMS reminder
-                    sms_service = get_sms_service(booking.workspace_id, self.db)
-                    sms_service.send_form_reminder(submission)
-                    
-                    submission.reminder_sent_at = datetime.now()
-                    self.db.commit()
+                # Queue SMS reminder; the dispatcher paces it to Telegram's limits
+                sms_service = self._sms_service(workspace_id)
+                sms_futures.append(self._queue_sms_reminder(
+                    progress, workspace_id, "form_reminder",
+                    lambda: sms_service.queue_form_reminder(submission, context),
+                    submission_id=submission.id
+                ))
+                
+                reminded.append(submission)
                 
             except Exception as e:
                 print(f"❌ Failed to send form reminder for submission {submission.id}: {str(e)}")
                 continue
+        
+        get_email_delivery().deliver_batch(email_jobs, progress)
+        self._wait_for_sms(sms_futures)
+        progress.finish()
+        
+        sent_at = datetime.now()
+        for submission in reminded:
+            submission.reminder_sent_at = sent_at
+        self.db.commit()
     
     def check_low_stock_items(self):
         """Check for low stock items and send alerts"""
@@ -117,11 +294,12 @@ class AutomationService:
                 
                 # Send email if vendor configured
                 if item.vendor_email:
-                    email_service = get_email_service(item.workspace_id, self.db)
+                    email_service = self._email_service(item.workspace_id)
                     email_service.send_low_stock_alert(item)
 
                 # Send SMS alert to workspace admin
                 try:
+                    # Provider chosen per send: the logging fallback only while Telegram is down
                     sms_service = get_sms_service(item.workspace_id, self.db)
                     sms_service.send_low_stock_alert(item)
                 except Exception as e:
@@ -153,7 +331,7 @@ class AutomationService:
     
     def _execute_email_action(self, rule: models.AutomationRule, entity_id: str):
         """Execute email automation action"""
-        email_service = get_email_service(rule.workspace_id, self.db)
+        email_service = self._email_service(rule.workspace_id)
         
         if rule.trigger == "new_contact":
             contact = self.db.query(models.Contact).filter(
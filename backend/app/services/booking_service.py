@@ -0,0 +1,138 @@
+"""
+Booking Service for CareOps
+Reserves booking slots without double-booking under concurrent requests
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import models
+
+
+# Statuses that no longer hold their slot
+RELEASED_STATUSES = ("cancelled",)
+
+
+class BookingConflictError(Exception):
+    """Raised when the requested slot overlaps an existing booking"""
+
+    def __init__(self, conflicting_booking: models.Booking):
+        self.conflicting_booking = conflicting_booking
+        super().__init__(
+            f"Slot already booked until {conflicting_booking.end_time.isoformat()}"
+        )
+
+
+def lock_service_schedule(db: Session, service_type_id) -> None:
+    """
+    Serialize bookings for one service type.
+
+    Takes a transaction-scoped Postgres advisory lock, so concurrent
+    reservations for the same service queue up here and the lock is
+    released automatically on commit or rollback.
+    """
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+        {"key": f"booking:{service_type_id}"}
+    )
+
+
+def find_overlapping_booking(
+    db: Session,
+    service_type_id,
+    start: datetime,
+    end: datetime,
+    exclude_id=None
+) -> Optional[models.Booking]:
+    """Return an active booking of the service that overlaps [start, end), other than `exclude_id`"""
+    query = db.query(models.Booking).filter(
+        models.Booking.service_type_id == service_type_id,
+        models.Booking.status.notin_(RELEASED_STATUSES),
+        models.Booking.scheduled_at < end,
+        models.Booking.end_time > start
+    )
+    if exclude_id is not None:
+        query = query.filter(models.Booking.id != exclude_id)
+    return query.first()
+
+
+def reserve_booking(
+    db: Session,
+    workspace_id,
+    contact_id,
+    service: models.ServiceType,
+    scheduled_at: datetime,
+    notes: Optional[str] = None
+) -> models.Booking:
+    """
+    Add a pending booking for the slot, or raise BookingConflictError.
+
+    The caller owns the transaction and must commit (or roll back) right
+    after this returns, since the schedule lock is held until then.
+    """
+    end_time = scheduled_at + timedelta(minutes=service.duration_minutes)
+
+    lock_service_schedule(db, service.id)
+
+    conflict = find_overlapping_booking(db, service.id, scheduled_at, end_time)
+    if conflict:
+        raise BookingConflictError(conflict)
+
+    db_booking = models.Booking(
+        workspace_id=workspace_id,
+        contact_id=contact_id,
+        service_type_id=service.id,
+        scheduled_at=scheduled_at,
+        end_time=end_time,
+        notes=notes,
+        location=service.location,
+        status="pending"
+    )
+    db.add(db_booking)
+    db.flush()
+
+    return db_booking
+
+
+def update_booking_slot(
+    db: Session,
+    booking: models.Booking,
+    scheduled_at: Optional[datetime] = None,
+    status: Optional[str] = None
+) -> models.Booking:
+    """
+    Move a booking and/or change its status, or raise BookingConflictError.
+
+    A booking that takes a slot again, because it moved or was reactivated
+    from a released status, is checked against the service's schedule
+    under the same lock as a new reservation. A moved booking keeps the
+    service's duration and gets its reminder again. The caller owns the
+    transaction, as with reserve_booking().
+    """
+    moved = scheduled_at is not None and scheduled_at != booking.scheduled_at
+    new_status = status or booking.status
+    reactivated = booking.status in RELEASED_STATUSES and new_status not in RELEASED_STATUSES
+
+    if moved:
+        service = booking.service_type
+        duration = (
+            timedelta(minutes=service.duration_minutes) if service
+            else booking.end_time - booking.scheduled_at
+        )
+        booking.scheduled_at = scheduled_at
+        booking.end_time = scheduled_at + duration
+        booking.reminder_sent = False
+
+    if (moved or reactivated) and new_status not in RELEASED_STATUSES and booking.service_type_id:
+        lock_service_schedule(db, booking.service_type_id)
+        conflict = find_overlapping_booking(
+            db, booking.service_type_id, booking.scheduled_at, booking.end_time, exclude_id=booking.id
+        )
+        if conflict:
+            raise BookingConflictError(conflict)
+
+    booking.status = new_status
+    db.flush()
+    return booking
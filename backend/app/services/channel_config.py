@@ -0,0 +1,105 @@
+"""
+Channel Config Cache for CareOps
+Resolves each workspace's email/Telegram integration settings once per process
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+
+
+class ChannelConfig(NamedTuple):
+    """Resolved delivery settings for one workspace"""
+    email: dict  # SMTP config, falling back to the global SMTP settings
+    telegram_chat_id: Optional[str]  # workspace admin chat for alerts
+
+
+def default_email_config() -> dict:
+    return {
+        "smtp_host": settings.SMTP_HOST,
+        "smtp_port": settings.SMTP_PORT,
+        "smtp_user": settings.SMTP_USER,
+        "smtp_password": settings.SMTP_PASSWORD
+    }
+
+
+class ChannelConfigCache:
+    """
+    Process-wide LRU of ChannelConfig keyed by workspace.
+
+    A miss loads every active integration of the workspace in one query.
+    Routes that change integrations call invalidate(); entries also expire
+    after `ttl_seconds` so changes made in another process (API vs worker)
+    are picked up.
+    """
+
+    def __init__(
+        self,
+        max_size: int = settings.CHANNEL_CONFIG_CACHE_SIZE,
+        ttl_seconds: int = settings.CHANNEL_CONFIG_CACHE_TTL_SECONDS
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, workspace_id) -> ChannelConfig:
+        integrations = db.query(models.Integration.type, models.Integration.config).filter(
+            models.Integration.workspace_id == workspace_id,
+            models.Integration.type.in_(("email", "sms")),
+            models.Integration.is_active == True
+        ).order_by(models.Integration.created_at).all()
+
+        email = None
+        telegram_chat_id = None
+        for type_, config in integrations:
+            if type_ == "email" and email is None:
+                email = dict(config or {})
+            elif type_ == "sms" and telegram_chat_id is None and config:
+                telegram_chat_id = config.get("telegram_chat_id")
+
+        return ChannelConfig(email or default_email_config(), telegram_chat_id)
+
+    def get(self, db: Session, workspace_id) -> ChannelConfig:
+        key = str(workspace_id)
+        try:
+            uuid.UUID(key)
+        except ValueError:
+            # e.g. the webhook's "demo" service: no integrations to look up
+            return ChannelConfig(default_email_config(), None)
+
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        config = self._load(db, workspace_id)
+
+        with self._lock:
+            self._entries[key] = (now, config)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return config
+
+    def invalidate(self, workspace_id):
+        with self._lock:
+            self._entries.pop(str(workspace_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+channel_config_cache = ChannelConfigCache()
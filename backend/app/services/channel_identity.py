@@ -0,0 +1,193 @@
+"""
+Channel Identities for CareOps
+Maps external chat ids to contacts through one indexed table, in both directions
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, event, inspect, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import SessionLocal
+
+TELEGRAM = "telegram"
+
+
+def parse_telegram_chat_id(contact) -> Optional[str]:
+    """
+    The Telegram chat id a contact was created with, if any.
+
+    It can be in contact metadata ('telegram_chat_id') or in the phone
+    field, as telegram:123456789 or a bare 9+ digit id. Fills
+    channel_identities, and stands in for it for contacts not mapped yet.
+    """
+    if not contact:
+        return None
+
+    if contact.custom_custom_metadata:
+        telegram_id = contact.custom_custom_metadata.get('telegram_chat_id')
+        if telegram_id:
+            return str(telegram_id).strip() or None
+
+    if contact.phone:
+        phone = contact.phone.strip()
+        if phone.startswith('telegram:'):
+            return phone.replace('telegram:', '').strip() or None
+        # Telegram user ids are typically 9-10 digits
+        elif phone.isdigit() and len(phone) >= 9:
+            return phone
+
+    return None
+
+
+def _identity_rows(contacts: Iterable) -> List[dict]:
+    rows = []
+    for contact in contacts:
+        chat_id = parse_telegram_chat_id(contact)
+        if chat_id:
+            rows.append({
+                "workspace_id": contact.workspace_id,
+                "contact_id": contact.id,
+                "channel": TELEGRAM,
+                "external_id": chat_id,
+            })
+    return rows
+
+
+def _insert_identities(db: Session, rows: List[dict]) -> int:
+    if not rows:
+        return 0
+    # A chat already mapped in the workspace keeps its first contact
+    result = db.execute(insert(models.ChannelIdentity).values(rows).on_conflict_do_nothing())
+    return result.rowcount
+
+
+def _chat_id_changed(contact: models.Contact) -> bool:
+    state = inspect(contact)
+    return state.attrs.phone.history.has_changes() or state.attrs.custom_custom_metadata.history.has_changes()
+
+
+@event.listens_for(models.Contact, "after_insert")
+def _map_new_contact(mapper, connection, contact: models.Contact):
+    """
+    Record a contact's chat id whenever it is written through the ORM, in
+    the same flush: create and edit routes, inbound Telegram, scripts.
+    """
+    rows = _identity_rows([contact])
+    if rows:
+        connection.execute(insert(models.ChannelIdentity).values(rows).on_conflict_do_nothing())
+
+
+@event.listens_for(models.Contact, "after_update")
+def _remap_contact(mapper, connection, contact: models.Contact):
+    """
+    Move a contact's mapping when its chat id changes or is removed: the
+    old chat must stop routing to the contact in either direction, since
+    it may now belong to someone else.
+    """
+    if not _chat_id_changed(contact):
+        return
+    identity = models.ChannelIdentity
+    stale = delete(identity).where(identity.contact_id == contact.id, identity.channel == TELEGRAM)
+    chat_id = parse_telegram_chat_id(contact)
+    if chat_id:
+        stale = stale.where(identity.external_id != chat_id)
+    connection.execute(stale)
+    _map_new_contact(mapper, connection, contact)
+
+
+def backfill_channel_identities(batch_size: int = 1000) -> int:
+    """
+    Map contacts that have a chat id but no channel_identities row
+    (created before the table existed, or written with raw SQL).
+
+    Idempotent and incremental: only unmapped contacts whose phone or
+    metadata can hold a chat id are read, so it is cheap to run on every
+    startup.
+    """
+    db = SessionLocal()
+    try:
+        added = 0
+        batch = []
+        contact = models.Contact
+        identity = models.ChannelIdentity
+        contacts = db.query(
+            contact.id, contact.workspace_id, contact.phone, contact.custom_custom_metadata
+        ).outerjoin(
+            identity, (identity.contact_id == contact.id) & (identity.channel == TELEGRAM)
+        ).filter(
+            identity.id == None,
+            or_(
+                contact.phone.op("~")(r"^\s*(telegram:|[0-9]{9,}\s*$)"),
+                contact.custom_custom_metadata.op("->>")("telegram_chat_id") != None
+            )
+        ).yield_per(batch_size)
+        for row in contacts:
+            batch.append(row)
+            if len(batch) == batch_size:
+                added += _insert_identities(db, _identity_rows(batch))
+                batch = []
+        added += _insert_identities(db, _identity_rows(batch))
+        db.commit()
+
+        if added:
+            print(f"🔗 Mapped {added} contacts to Telegram chats")
+        return added
+    finally:
+        db.close()
+
+
+def telegram_chat_ids(db: Session, contacts: Iterable[models.Contact]) -> Dict[object, str]:
+    """
+    Chat id per contact for a batch of contacts, in one query.
+
+    channel_identities decides; a contact it has no row for (not backfilled
+    yet, or its chat is mapped to another contact in the workspace) falls
+    back to the chat id in its own phone or metadata.
+    """
+    by_id = {c.id: c for c in contacts if c is not None and c.id is not None}
+    if not by_id:
+        return {}
+    identity = models.ChannelIdentity
+    rows = db.query(identity.contact_id, identity.external_id).filter(
+        identity.contact_id.in_(by_id),
+        identity.channel == TELEGRAM
+    ).order_by(identity.created_at).all()
+    # Latest mapping wins if a contact somehow has several
+    chat_ids = {contact_id: external_id for contact_id, external_id in rows}
+
+    for contact_id, contact in by_id.items():
+        if contact_id not in chat_ids:
+            chat_id = parse_telegram_chat_id(contact)
+            if chat_id:
+                chat_ids[contact_id] = chat_id
+    return chat_ids
+
+
+def resolve_external_ids(
+    db: Session,
+    channel: str,
+    external_ids: Iterable[str]
+) -> Dict[str, List[Tuple[object, object]]]:
+    """
+    (workspace_id, contact_id) pairs per external id, in one indexed query.
+
+    A chat can belong to contacts in several workspaces, since the
+    Telegram bot is shared.
+    """
+    ids = {str(i) for i in external_ids}
+    if not ids:
+        return {}
+    identity = models.ChannelIdentity
+    rows = db.query(identity.external_id, identity.workspace_id, identity.contact_id).filter(
+        identity.channel == channel,
+        identity.external_id.in_(ids)
+    ).all()
+
+    matches = defaultdict(list)
+    for external_id, workspace_id, contact_id in rows:
+        matches[external_id].append((workspace_id, contact_id))
+    return matches
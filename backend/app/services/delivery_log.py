@@ -0,0 +1,137 @@
+"""
+Delivery Log for CareOps
+Records every email/Telegram send off the send path and pages through them by keyset
+"""
+
+import base64
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert, tuple_
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import engine
+from app.utils.batch_writer import BatchWriter
+
+
+class DeliveryLogWriter(BatchWriter):
+    """
+    Write-behind buffer for delivery_log rows.
+
+    Each batch is one multi-row INSERT, so senders never wait on the
+    database. If the database is unavailable the batch is dropped (and
+    counted) rather than blocking delivery.
+    """
+
+    name = "delivery-log"
+    label = "delivery log records"
+
+    def __init__(
+        self,
+        batch_size: int = settings.DELIVERY_LOG_BATCH_SIZE,
+        flush_interval: float = settings.DELIVERY_LOG_FLUSH_INTERVAL_SECONDS,
+        max_buffer: int = settings.DELIVERY_LOG_MAX_BUFFER,
+        enabled: bool = settings.DELIVERY_LOG_ENABLED
+    ):
+        super().__init__(batch_size, flush_interval, max_buffer)
+        self.enabled = enabled
+
+    def record(
+        self,
+        workspace_id,
+        channel: str,
+        recipient: str,
+        status: str,
+        latency_ms: Optional[float] = None,
+        provider_message_id: Optional[str] = None,
+        error: Optional[str] = None
+    ):
+        """Queue one delivery record; never blocks on the database"""
+        if not self.enabled:
+            return
+        try:
+            workspace_id = uuid.UUID(str(workspace_id))
+        except ValueError:
+            # e.g. the webhook's "demo" service: not a workspace to log against
+            return
+
+        self.add({
+            "id": uuid.uuid4(),
+            "workspace_id": workspace_id,
+            "channel": channel,
+            "recipient": str(recipient)[:255],
+            "status": status,
+            "latency_ms": int(latency_ms) if latency_ms is not None else None,
+            "provider_message_id": str(provider_message_id)[:255] if provider_message_id is not None else None,
+            "error": error,
+            "created_at": datetime.now(timezone.utc),
+        })
+
+    def write_batch(self, batch: List[dict]):
+        with engine.begin() as conn:
+            conn.execute(insert(models.DeliveryLog), batch)
+
+
+delivery_log = DeliveryLogWriter()
+
+
+def elapsed_ms(started: float) -> float:
+    """Milliseconds since a time.monotonic() reading"""
+    return (time.monotonic() - started) * 1000
+
+
+# ============== QUERYING ==============
+
+def encode_cursor(row: models.DeliveryLog) -> str:
+    raw = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverse of encode_cursor; raises ValueError for anything else"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def query_delivery_logs(
+    db: Session,
+    workspace_id,
+    channel: str,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50
+) -> Tuple[List[models.DeliveryLog], Optional[str]]:
+    """
+    One page of a workspace's delivery log, newest first.
+
+    Pages continue from `cursor` (the last row of the previous page) with
+    a (created_at, id) range condition rather than OFFSET, so every page
+    is an index range scan however deep the caller has paged. Returns the
+    rows and the cursor for the next page (None on the last page).
+    """
+    log = models.DeliveryLog
+    query = db.query(log).filter(log.workspace_id == workspace_id, log.channel == channel)
+
+    if status:
+        query = query.filter(log.status == status)
+    if since:
+        query = query.filter(log.created_at >= since)
+    if until:
+        query = query.filter(log.created_at < until)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(log.created_at, log.id) < tuple_(created_at, row_id))
+
+    rows = query.order_by(log.created_at.desc(), log.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,98 @@
+"""
+Delivery Progress for CareOps
+Per-workspace counts and timings for batch runs (booking and form reminders)
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+
+OUTCOMES = {True: "sent", False: "failed", None: "skipped"}
+
+
+class DeliveryProgress:
+    """
+    Progress of one batch run, broken down by workspace and channel.
+
+    Each notification is counted as queued when the run takes it on and
+    as sent / failed / skipped (opted out) when its send finishes;
+    `finished_after` is how long into the run the workspace's last send
+    finished, which shows whether small workspaces wait on large ones.
+    Updated from the email engine and the Telegram dispatcher threads.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now()
+        self._started = time.monotonic()
+        self._finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._workspaces: Dict[str, dict] = {}
+
+    def _workspace(self, workspace_id) -> dict:
+        key = str(workspace_id)
+        if key not in self._workspaces:
+            self._workspaces[key] = {"queued": 0, "sent": 0, "failed": 0, "skipped": 0, "finished_after": None}
+        return self._workspaces[key]
+
+    def queued(self, workspace_id, count: int = 1):
+        with self._lock:
+            self._workspace(workspace_id)["queued"] += count
+
+    def done(self, workspace_id, outcome: Optional[bool]):
+        """Record a finished send: True sent, False failed, None skipped"""
+        with self._lock:
+            workspace = self._workspace(workspace_id)
+            workspace[OUTCOMES[outcome]] += 1
+            workspace["finished_after"] = round(time.monotonic() - self._started, 3)
+
+    def finish(self):
+        with self._lock:
+            self._finished = time.monotonic()
+
+    @property
+    def running(self) -> bool:
+        return self._finished is None
+
+    def stats(self) -> dict:
+        with self._lock:
+            elapsed = (self._finished or time.monotonic()) - self._started
+            workspaces = {key: dict(counts) for key, counts in self._workspaces.items()}
+        totals = {
+            field: sum(counts[field] for counts in workspaces.values())
+            for field in ("queued", "sent", "failed", "skipped")
+        }
+        return {
+            "started_at": self.started_at.isoformat(),
+            "running": self.running,
+            "elapsed_seconds": round(elapsed, 3),
+            **totals,
+            "workspaces": workspaces,
+        }
+
+
+class DeliveryProgressRegistry:
+    """The latest run of each batch job, for the internal status endpoint"""
+
+    def __init__(self):
+        self._runs: Dict[str, DeliveryProgress] = {}
+        self._lock = threading.Lock()
+
+    def start(self, name: str) -> DeliveryProgress:
+        progress = DeliveryProgress(name)
+        with self._lock:
+            self._runs[name] = progress
+        return progress
+
+    def get(self, name: str) -> Optional[DeliveryProgress]:
+        return self._runs.get(name)
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            runs = sorted(self._runs.items())
+        return {name: progress.stats() for name, progress in runs}
+
+
+delivery_runs = DeliveryProgressRegistry()
@@ -0,0 +1,219 @@
+"""
+Async Email Delivery Engine for CareOps
+Sends batches of rendered emails concurrently with aiosmtplib
+"""
+
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import aiosmtplib
+
+from app.config import settings
+from app.services.email_service import OutgoingEmail, build_mime_message, is_demo_config
+from app.services.smtp_pool import SMTPConnectionPool
+from app.utils.circuit_breaker import circuit_breakers
+from app.services.delivery_log import delivery_log, elapsed_ms
+from app.services.delivery_progress import DeliveryProgress
+from app.services.suppression import suppression_list
+
+
+# Failures of the SMTP account rather than of one message (they count against its breaker)
+PROVIDER_ERRORS = (
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPTimeoutError,
+    aiosmtplib.SMTPAuthenticationError,
+    asyncio.TimeoutError,
+    OSError,
+)
+
+
+class EmailJob(NamedTuple):
+    """One email to deliver with the SMTP config it should go through"""
+    config: dict
+    email: OutgoingEmail
+    workspace_id: Optional[str] = None  # for the delivery log
+
+
+def round_robin(jobs: List[Tuple[int, EmailJob]]) -> List[Tuple[int, EmailJob]]:
+    """(index, job) pairs reordered to take one job per workspace in turn"""
+    by_workspace: Dict[Optional[str], Deque[Tuple[int, EmailJob]]] = defaultdict(deque)
+    for item in jobs:
+        by_workspace[item[1].workspace_id].append(item)
+
+    turns = deque(by_workspace.values())
+    ordered = []
+    while turns:
+        pending = turns.popleft()
+        ordered.append(pending.popleft())
+        if pending:
+            turns.append(pending)
+    return ordered
+
+
+class AsyncEmailDelivery:
+    """
+    Concurrent delivery for batch runs (reminders, digests).
+
+    Jobs are grouped by SMTP account (host, port, user). Each account gets
+    up to `per_host_limit` worker coroutines, and each worker keeps a
+    single aiosmtplib connection open for every message it sends. That
+    caps concurrency per host and avoids a handshake per email. Every
+    send is bounded by `timeout`; a failed send reconnects before the next
+    message on that worker. Sends go through the account's circuit breaker
+    (the same one smtp_pool uses), so once a host is found to be down the
+    rest of the batch for it fails at once.
+
+    Each account's queue takes one job per workspace in turn, so a
+    workspace with thousands of reminders doesn't hold back the others
+    sharing its account, and at most `max_concurrency` sends are in
+    flight across all accounts at once.
+    """
+
+    def __init__(
+        self,
+        per_host_limit: int = settings.EMAIL_ASYNC_CONCURRENCY_PER_HOST,
+        timeout: float = settings.EMAIL_SEND_TIMEOUT_SECONDS,
+        max_concurrency: int = settings.EMAIL_ASYNC_MAX_CONCURRENCY
+    ):
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+
+    async def _connect(self, config: dict) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=config["smtp_host"],
+            port=int(config["smtp_port"]),
+            timeout=self.timeout,
+            start_tls=bool(config.get("smtp_starttls", True))
+        )
+        await smtp.connect()
+        if config.get("smtp_password"):
+            await smtp.login(config["smtp_user"], config["smtp_password"])
+        return smtp
+
+    @staticmethod
+    async def _close(smtp):
+        if smtp is None:
+            return
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def _worker(
+        self,
+        config: dict,
+        queue: asyncio.Queue,
+        results: List[bool],
+        started: float,
+        slots: asyncio.Semaphore,
+        progress: Optional[DeliveryProgress]
+    ):
+        smtp = None
+        breaker = circuit_breakers.get(SMTPConnectionPool.breaker_name(config))
+        try:
+            while True:
+                try:
+                    index, job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                email = job.email
+                msg = build_mime_message(config["smtp_user"], email)
+                if not breaker.allow():
+                    delivery_log.record(
+                        job.workspace_id, "email", email.to_email, "failed",
+                        error=f"{breaker.name} is unavailable (circuit open)"
+                    )
+                    if progress:
+                        progress.done(job.workspace_id, False)
+                    continue
+                try:
+                    async with slots:
+                        if smtp is None or not smtp.is_connected:
+                            smtp = await asyncio.wait_for(self._connect(config), self.timeout)
+                        await asyncio.wait_for(smtp.send_message(msg), self.timeout)
+                    breaker.record_success()
+                    results[index] = True
+                    delivery_log.record(
+                        job.workspace_id, "email", email.to_email, "sent",
+                        latency_ms=elapsed_ms(started), provider_message_id=msg["Message-ID"]
+                    )
+                except Exception as e:
+                    breaker.record(not isinstance(e, PROVIDER_ERRORS))
+                    print(f"❌ Email failed to {email.to_email}: {str(e)}")
+                    delivery_log.record(
+                        job.workspace_id, "email", email.to_email, "failed",
+                        latency_ms=elapsed_ms(started), provider_message_id=msg["Message-ID"], error=str(e)
+                    )
+                    await self._close(smtp)
+                    smtp = None
+                if progress:
+                    progress.done(job.workspace_id, results[index])
+        finally:
+            await self._close(smtp)
+
+    async def deliver(self, jobs: List[EmailJob], progress: Optional[DeliveryProgress] = None) -> List[bool]:
+        """
+        Send every job; returns a success flag per job, in order (False for
+        opted-out recipients). Each finished send is also counted in
+        `progress` under its workspace, if given.
+        """
+        results = [False] * len(jobs)
+        started = time.monotonic()  # latency is measured from the start of the batch
+        accounts: Dict[Tuple[str, int, str], List[Tuple[int, EmailJob]]] = {}
+        configs: Dict[Tuple[str, int, str], dict] = {}
+
+        for index, job in enumerate(jobs):
+            if suppression_list.is_suppressed(job.workspace_id, "email", job.email.to_email):
+                if progress:
+                    progress.done(job.workspace_id, None)
+                continue
+
+            if is_demo_config(job.config):
+                print(f"📧 [DEMO MODE] Email would be sent to {job.email.to_email}")
+                print(f"   Subject: {job.email.subject}")
+                delivery_log.record(job.workspace_id, "email", job.email.to_email, "demo")
+                results[index] = True
+                if progress:
+                    progress.done(job.workspace_id, True)
+                continue
+
+            key = SMTPConnectionPool.pool_key(job.config)
+            if key not in accounts:
+                accounts[key] = []
+                configs[key] = job.config
+            accounts[key].append((index, job))
+
+        queues: Dict[Tuple[str, int, str], asyncio.Queue] = {}
+        for key, account_jobs in accounts.items():
+            queues[key] = asyncio.Queue()
+            for item in round_robin(account_jobs):
+                queues[key].put_nowait(item)
+
+        slots = asyncio.Semaphore(self.max_concurrency)
+        workers = [
+            self._worker(configs[key], queue, results, started, slots, progress)
+            for key, queue in queues.items()
+            for _ in range(min(self.per_host_limit, queue.qsize()))
+        ]
+        await asyncio.gather(*workers)
+
+        sent = sum(results)
+        if jobs:
+            print(f"📧 Delivered {sent}/{len(jobs)} emails across {len(queues)} SMTP account(s)")
+        return results
+
+    def deliver_batch(self, jobs: List[EmailJob], progress: Optional[DeliveryProgress] = None) -> List[bool]:
+        """Blocking wrapper for callers without an event loop (scheduler jobs)"""
+        if not jobs:
+            return []
+        return asyncio.run(self.deliver(jobs, progress))
+
+
+def get_email_delivery() -> AsyncEmailDelivery:
+    """Factory function to get async email delivery instance"""
+    return AsyncEmailDelivery()
@@ -3,15 +3,59 @@ Email Service for CareOps
 Handles all email sending with automation triggers
 """
 
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.utils import make_msgid
+import time
 from datetime import datetime
-from typing import Optional
+from typing import List, NamedTuple, Optional
 from sqlalchemy.orm import Session
 
-from app.config import settings
 from app import models
+from app.services.channel_config import channel_config_cache
+from app.services.smtp_pool import smtp_pool
+from app.services.delivery_log import delivery_log, elapsed_ms
+from app.services.suppression import suppression_list
+from app.services.notification_context import (
+    NotificationContext, booking_notification_context, submission_notification_context
+)
+from app.services.template_service import template_registry, contact_context, item_context
+
+
+class OutgoingEmail(NamedTuple):
+    """A rendered email, ready for any transport"""
+    to_email: str
+    subject: str
+    body: str
+    html: bool = True
+
+
+def build_mime_message(from_email: str, email: OutgoingEmail) -> MIMEMultipart:
+    """Build the MIME message shared by the sync and async transports"""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = from_email
+    msg['To'] = email.to_email
+    msg['Subject'] = email.subject
+    # Our own id, so the delivery log can be matched against the provider's logs
+    msg['Message-ID'] = make_msgid(domain=from_email.rpartition("@")[2] or None)
+    msg.attach(MIMEText(email.body, 'html' if email.html else 'plain'))
+    return msg
+
+
+def combine_emails(emails: List[OutgoingEmail]) -> OutgoingEmail:
+    """Merge rendered emails to one recipient (all HTML or all text) into one, bodies in order"""
+    if len(emails) == 1:
+        return emails[0]
+    first = emails[0]
+    subjects = {email.subject for email in emails}
+    subject = first.subject if len(subjects) == 1 else f"{first.subject} (+{len(emails) - 1} more)"
+    separator = '\n<hr style="border:none;border-top:1px solid #ddd;margin:24px 0">\n' if first.html else "\n\n---\n\n"
+    return OutgoingEmail(first.to_email, subject, separator.join(email.body for email in emails), first.html)
+
+
+def is_demo_config(config: Optional[dict]) -> bool:
+    """No SMTP credentials: emails are printed instead of sent"""
+    return not config or not config.get("smtp_user")
 
 
 class EmailService:
@@ -23,327 +67,162 @@ class EmailService:
         self.config = self._get_email_config()
     
     def _get_email_config(self) -> Optional[dict]:
-        """Get email integration config for workspace"""
-        integration = self.db.query(models.Integration).filter(
-            models.Integration.workspace_id == self.workspace_id,
-            models.Integration.type == "email",
-            models.Integration.is_active == True
-        ).first()
-        
-        if integration:
-            return integration.config
-        
-        # Fallback to default config
-        return {
-            "smtp_host": settings.SMTP_HOST,
-            "smtp_port": settings.SMTP_PORT,
-            "smtp_user": settings.SMTP_USER,
-            "smtp_password": settings.SMTP_PASSWORD
-        }
+        """Get email integration config for workspace (falls back to default SMTP settings)"""
+        return channel_config_cache.get(self.db, self.workspace_id).email
     
     def _send_email(self, to_email: str, subject: str, body: str, html: bool = True):
-        """Send email via SMTP"""
-        if not self.config or not self.config.get("smtp_user"):
+        """Send email via SMTP; None if the recipient opted out (nothing sent)"""
+        if suppression_list.is_suppressed(self.workspace_id, "email", to_email, self.db):
+            return None
+        
+        if is_demo_config(self.config):
             print(f"📧 [DEMO MODE] Email would be sent to {to_email}")
             print(f"   Subject: {subject}")
             print(f"   Body: {body[:100]}...")
+            delivery_log.record(self.workspace_id, "email", to_email, "demo")
             return True
         
+        started = time.monotonic()
+        msg = build_mime_message(
+            self.config['smtp_user'],
+            OutgoingEmail(to_email, subject, body, html)
+        )
+        
         try:
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.config['smtp_user']
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            if html:
-                msg.attach(MIMEText(body, 'html'))
-            else:
-                msg.attach(MIMEText(body, 'plain'))
-            
-            with smtplib.SMTP(self.config['smtp_host'], self.config['smtp_port']) as server:
-                server.starttls()
-                server.login(self.config['smtp_user'], self.config['smtp_password'])
-                server.send_message(msg)
+            smtp_pool.send_message(self.config, msg)
             
             print(f"✅ Email sent to {to_email}")
+            delivery_log.record(
+                self.workspace_id, "email", to_email, "sent",
+                latency_ms=elapsed_ms(started), provider_message_id=msg['Message-ID']
+            )
             return True
             
         except Exception as e:
             print(f"❌ Email failed to {to_email}: {str(e)}")
             print(f"📧 [DEMO MODE] Would have sent: {subject}")
+            delivery_log.record(
+                self.workspace_id, "email", to_email, "failed",
+                latency_ms=elapsed_ms(started), provider_message_id=msg['Message-ID'], error=str(e)
+            )
             return False
     
-    def send_welcome_email(self, contact: models.Contact):
-        """Send welcome email to new contact"""
-        workspace = self.db.query(models.Workspace).filter(
+    def send_combined(self, emails: List[OutgoingEmail]):
+        """Send rendered emails to one recipient as a single email (see combine_emails)"""
+        return self._send_email(*combine_emails(emails))
+    
+    def _get_workspace(self) -> models.Workspace:
+        return self.db.query(models.Workspace).filter(
             models.Workspace.id == self.workspace_id
         ).first()
-        
-        subject = f"Welcome! Thanks for contacting {workspace.business_name}"
-        
-        body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2563eb;">Hi {contact.name}! 👋</h2>
-                <p>Thank you for reaching out to <strong>{workspace.business_name}</strong>.</p>
-                <p>We've received your inquiry and one of our team members will get back to you shortly.</p>
-                
-                <div style="background: #f3f4f6; padding: 15px; border-radius: 8px; margin: 20px 0;">
-                    <p style="margin: 0;"><strong>Your Contact Information:</strong></p>
-                    <p style="margin: 5px 0;">📧 Email: {contact.email}</p>
-                    {f'<p style="margin: 5px 0;">📱 Phone: {contact.phone}</p>' if contact.phone else ''}
-                </div>
-                
-                <p>In the meantime, feel free to:</p>
-                <ul>
-                    <li>Book an appointment online</li>
-                    <li>Reply to this email with any questions</li>
-                    <li>Visit our website for more information</li>
-                </ul>
-                
-                <p style="color: #6b7280; font-size: 14px; margin-top: 30px;">
-                    Best regards,<br>
-                    <strong>{workspace.business_name} Team</strong>
-                </p>
-                
-                <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 20px 0;">
-                <p style="color: #9ca3af; font-size: 12px; text-align: center;">
-                    This is an automated message. Please do not reply directly to this email.
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return self._send_email(contact.email, subject, body)
     
-    def send_booking_confirmation(self, booking: models.Booking):
+    def _render(self, name: str, to_email: str, context: dict) -> OutgoingEmail:
+        """Render the subject and email parts of a template"""
+        templates = template_registry.get(self.db, self.workspace_id, name)
+        return OutgoingEmail(
+            to_email,
+            templates["subject"].render(context),
+            templates["email"].render(context)
+        )
+    
+    def send_welcome_email(self, contact: models.Contact):
+        """Send welcome email to new contact"""
+        email = self.build_welcome_email(contact)
+        if email is None:
+            return False
+        return self._send_email(*email)
+    
+    def build_welcome_email(self, contact: models.Contact) -> Optional[OutgoingEmail]:
+        """Render welcome email to new contact"""
+        workspace = self._get_workspace()
+        return self._render("welcome", contact.email, contact_context(workspace, contact))
+    
+    def send_booking_confirmation(
+        self,
+        booking: models.Booking,
+        context: Optional[NotificationContext] = None
+    ):
         """Send booking confirmation email"""
-        workspace = self.db.query(models.Workspace).filter(
-            models.Workspace.id == self.workspace_id
-        ).first()
-        
-        contact = self.db.query(models.Contact).filter(
-            models.Contact.id == booking.contact_id
-        ).first()
-        
-        service = self.db.query(models.ServiceType).filter(
-            models.ServiceType.id == booking.service_type_id
-        ).first()
-        
-        subject = f"Booking Confirmed - {service.name} on {booking.scheduled_at.strftime('%B %d, %Y')}"
-        
-        body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: #10b981; color: white; padding: 20px; border-radius: 8px; text-align: center;">
-                    <h1 style="margin: 0; font-size: 24px;">✅ Booking Confirmed!</h1>
-                </div>
-                
-                <div style="margin: 30px 0;">
-                    <h2 style="color: #2563eb;">Hi {contact.name}!</h2>
-                    <p>Your appointment has been confirmed. Here are the details:</p>
-                </div>
-                
-                <div style="background: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <table style="width: 100%; border-collapse: collapse;">
-                        <tr>
-                            <td style="padding: 10px 0; border-bottom: 1px solid #e5e7eb;">
-                                <strong>Service:</strong>
-                            </td>
-                            <td style="padding: 10px 0; border-bottom: 1px solid #e5e7eb; text-align: right;">
-                                {service.name}
-                            </td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 10px 0; border-bottom: 1px solid #e5e7eb;">
-                                <strong>Date:</strong>
-                            </td>
-                            <td style="padding: 10px 0; border-bottom: 1px solid #e5e7eb; text-align: right;">
-                                {booking.scheduled_at.strftime('%A, %B %d, %Y')}
-                            </td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 10px 0; border-bottom: 1px solid #e5e7eb;">
-                                <strong>Time:</strong>
-                            </td>
-                            <td style="padding: 10px 0; border-bottom: 1px solid #e5e7eb; text-align: right;">
-                                {booking.scheduled_at.strftime('%I:%M %p')}
-                            </td>
-                        </tr>
-                        <tr>
-                            <td style="padding: 10px 0; border-bottom: 1px solid #e5e7eb;">
-                                <strong>Duration:</strong>
-                            </td>
-                            <td style="padding: 10px 0; border-bottom: 1px solid #e5e7eb; text-align: right;">
-                                {service.duration_minutes} minutes
-                            </td>
-                        </tr>
-                        {f'''<tr>
-                            <td style="padding: 10px 0;">
-                                <strong>Location:</strong>
-                            </td>
-                            <td style="padding: 10px 0; text-align: right;">
-                                {booking.location}
-                            </td>
-                        </tr>''' if booking.location else ''}
-                    </table>
-                </div>
-                
-                <div style="background: #fef3c7; border-left: 4px solid #f59e0b; padding: 15px; margin: 20px 0;">
-                    <p style="margin: 0; color: #92400e;">
-                        <strong>📍 Important:</strong> Please arrive 10 minutes early for check-in.
-                    </p>
-                </div>
-                
-                {f'<p><strong>Additional Notes:</strong><br>{booking.notes}</p>' if booking.notes else ''}
-                
-                <p style="margin-top: 30px;">If you need to reschedule or cancel, please contact us as soon as possible.</p>
-                
-                <p style="color: #6b7280; font-size: 14px; margin-top: 30px;">
-                    Looking forward to seeing you!<br>
-                    <strong>{workspace.business_name}</strong><br>
-                    {workspace.contact_email or ''}<br>
-                    {workspace.contact_phone or ''}
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return self._send_email(contact.email, subject, body)
+        email = self.build_booking_confirmation(booking, context)
+        if email is None:
+            return False
+        return self._send_email(*email)
     
-    def send_booking_reminder(self, booking: models.Booking):
+    def build_booking_confirmation(
+        self,
+        booking: models.Booking,
+        context: Optional[NotificationContext] = None
+    ) -> Optional[OutgoingEmail]:
+        """Render booking confirmation email (pass a preloaded context to skip the lookups)"""
+        context = context or booking_notification_context(self.db, booking)
+        if context is None:
+            return None
+        return self._render("booking_confirmation", context.contact.email, context.variables)
+    
+    def send_booking_reminder(
+        self,
+        booking: models.Booking,
+        context: Optional[NotificationContext] = None
+    ):
         """Send reminder before booking"""
-        workspace = self.db.query(models.Workspace).filter(
-            models.Workspace.id == self.workspace_id
-        ).first()
-        
-        contact = self.db.query(models.Contact).filter(
-            models.Contact.id == booking.contact_id
-        ).first()
-        
-        service = self.db.query(models.ServiceType).filter(
-            models.ServiceType.id == booking.service_type_id
-        ).first()
-        
-        subject = f"Reminder: Appointment Tomorrow - {service.name}"
-        
-        body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2563eb;">🔔 Appointment Reminder</h2>
-                <p>Hi {contact.name},</p>
-                <p>This is a friendly reminder about your upcoming appointment:</p>
-                
-                <div style="background: #eff6ff; border-left: 4px solid #2563eb; padding: 15px; margin: 20px 0;">
-                    <p style="margin: 5px 0;"><strong>{service.name}</strong></p>
-                    <p style="margin: 5px 0;">📅 {booking.scheduled_at.strftime('%A, %B %d at %I:%M %p')}</p>
-                    {f'<p style="margin: 5px 0;">📍 {booking.location}</p>' if booking.location else ''}
-                </div>
-                
-                <p>See you soon!</p>
-                <p style="color: #6b7280; font-size: 14px;">
-                    <strong>{workspace.business_name}</strong>
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return self._send_email(contact.email, subject, body)
+        email = self.build_booking_reminder(booking, context)
+        if email is None:
+            return False
+        return self._send_email(*email)
+    
+    def build_booking_reminder(
+        self,
+        booking: models.Booking,
+        context: Optional[NotificationContext] = None
+    ) -> Optional[OutgoingEmail]:
+        """Render reminder before booking (pass a preloaded context to skip the lookups)"""
+        context = context or booking_notification_context(self.db, booking)
+        if context is None:
+            return None
+        return self._render("booking_reminder", context.contact.email, context.variables)
     
-    def send_form_reminder(self, submission: models.FormSubmission):
+    def send_form_reminder(
+        self,
+        submission: models.FormSubmission,
+        context: Optional[NotificationContext] = None
+    ):
         """Send reminder to complete pending form"""
-        workspace = self.db.query(models.Workspace).filter(
-            models.Workspace.id == self.workspace_id
-        ).first()
-        
-        contact = self.db.query(models.Contact).filter(
-            models.Contact.id == submission.contact_id
-        ).first()
-        
-        form = self.db.query(models.PostBookingForm).filter(
-            models.PostBookingForm.id == submission.form_id
-        ).first()
-        
-        subject = f"Action Needed: Please Complete Your {form.name}"
-        
-        body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #f59e0b;">📋 Form Completion Required</h2>
-                <p>Hi {contact.name},</p>
-                <p>We noticed you haven't completed your <strong>{form.name}</strong> yet.</p>
-                
-                <p>Please take a moment to fill it out so we can better prepare for your visit.</p>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="#" style="background: #2563eb; color: white; padding: 12px 30px; text-decoration: none; border-radius: 6px; display: inline-block;">
-                        Complete Form
-                    </a>
-                </div>
-                
-                <p style="color: #6b7280; font-size: 14px;">
-                    Thank you,<br>
-                    <strong>{workspace.business_name}</strong>
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return self._send_email(contact.email, subject, body)
+        email = self.build_form_reminder(submission, context)
+        if email is None:
+            return False
+        return self._send_email(*email)
+    
+    def build_form_reminder(
+        self,
+        submission: models.FormSubmission,
+        context: Optional[NotificationContext] = None
+    ) -> Optional[OutgoingEmail]:
+        """Render reminder to complete pending form (pass a preloaded context to skip the lookups)"""
+        context = context or submission_notification_context(self.db, submission)
+        if context is None:
+            return None
+        return self._render("form_reminder", context.contact.email, context.variables)
     
     def send_low_stock_alert(self, item: models.InventoryItem):
         """Send low stock alert to vendor"""
-        workspace = self.db.query(models.Workspace).filter(
-            models.Workspace.id == self.workspace_id
-        ).first()
+        email = self.build_low_stock_alert(item)
+        if email is None:
+            return False
+        return self._send_email(*email)
+    
+    def build_low_stock_alert(self, item: models.InventoryItem) -> Optional[OutgoingEmail]:
+        """Render low stock alert to vendor"""
+        workspace = self._get_workspace()
         
         to_email = item.vendor_email or workspace.contact_email
         
         if not to_email:
             print(f"⚠️ No email configured for low stock alert: {item.name}")
-            return False
-        
-        subject = f"⚠️ Low Stock Alert: {item.name}"
-        
-        body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: #fef3c7; border-left: 4px solid #f59e0b; padding: 15px; margin-bottom: 20px;">
-                    <h2 style="margin: 0; color: #92400e;">⚠️ Low Stock Alert</h2>
-                </div>
-                
-                <p>The following item is running low in inventory:</p>
-                
-                <div style="background: #f3f4f6; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                    <h3 style="margin-top: 0; color: #2563eb;">{item.name}</h3>
-                    <p style="margin: 5px 0;"><strong>Current Stock:</strong> {item.quantity} {item.unit}</p>
-                    <p style="margin: 5px 0;"><strong>Threshold:</strong> {item.low_stock_threshold} {item.unit}</p>
-                    {f'<p style="margin: 5px 0;"><strong>Description:</strong> {item.description}</p>' if item.description else ''}
-                </div>
-                
-                <p>Please reorder this item to avoid running out of stock.</p>
-                
-                <p style="color: #6b7280; font-size: 14px; margin-top: 30px;">
-                    <strong>{workspace.business_name}</strong><br>
-                    Automated Inventory Alert
-                </p>
-            </div>
-        </body>
-        </html>
-        """
+            return None
         
-        return self._send_email(to_email, subject, body)
+        return self._render("low_stock_alert", to_email, item_context(workspace, item))
 
 
 def get_email_service(workspace_id: str, db: Session) -> EmailService:
     """Factory function to get email service instance"""
-    return EmailService(workspace_id, db)
\ No newline at end of file
+    return EmailService(workspace_id, db)
@@ -0,0 +1,116 @@
+"""
+Scheduler Leader Election for CareOps
+One process across all workers and instances runs the scheduled jobs, chosen with a Postgres advisory lock
+"""
+
+import threading
+import zlib
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+
+
+class LeaderElection:
+    """
+    Leadership held as a session-level pg_try_advisory_lock.
+
+    The lock lives on a connection of its own, outside the app's pool,
+    that the leader keeps open. Postgres releases the lock when that
+    session ends, so a leader that exits or crashes hands over on the
+    next refresh() in another process. TCP keepalives make the server
+    notice a leader that dropped off the network too.
+
+    refresh() confirms the lock is still held, or tries to take it, and
+    is called before each leader-only job as well as on an interval.
+    With leader election disabled, or on a database other than
+    Postgres, every process leads (single-process setups).
+    """
+
+    def __init__(
+        self,
+        name: str = "careops:scheduler",
+        database_url: str = settings.DATABASE_URL,
+        enabled: bool = settings.SCHEDULER_LEADER_ELECTION
+    ):
+        self.name = name
+        self.key = zlib.crc32(name.encode())  # advisory lock id, the same in every process
+        self.enabled = enabled
+        connect_args = {"sslmode": "require"} if "neon.tech" in database_url else {}
+        if database_url.startswith("postgresql"):
+            connect_args.update(keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3)
+        self._engine = create_engine(database_url, poolclass=NullPool, connect_args=connect_args)
+        self._conn: Optional[Connection] = None
+        self._lock = threading.Lock()
+        self.times_elected = 0
+
+    @property
+    def is_leader(self) -> bool:
+        if not self.enabled or self._engine.dialect.name != "postgresql":
+            return True
+        return self._conn is not None
+
+    def _drop(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def refresh(self) -> bool:
+        """Check the lock is still ours or try to take it; returns whether this process leads"""
+        if not self.enabled or self._engine.dialect.name != "postgresql":
+            return True
+
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute(text("SELECT 1"))
+                    return True
+                except Exception as e:
+                    print(f"⚠️ Lost scheduler leadership ({self.name}): {str(e)}")
+                    self._drop()
+
+            try:
+                conn = self._engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+                acquired = conn.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+                ).scalar()
+            except Exception as e:
+                print(f"⚠️ Leader election failed ({self.name}): {str(e)}")
+                return False
+
+            if not acquired:
+                conn.close()
+                return False
+
+            self._conn = conn
+            self.times_elected += 1
+            print(f"👑 This process is now the leader for {self.name}")
+            return True
+
+    def release(self):
+        """Give up leadership (on shutdown) so another process takes over without waiting"""
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            except Exception:
+                pass
+            self._drop()
+            print(f"👋 Released leadership for {self.name}")
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "enabled": self.enabled,
+            "leader": self.is_leader,
+            "times_elected": self.times_elected,
+        }
+
+
+scheduler_leader = LeaderElection()
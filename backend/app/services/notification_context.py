@@ -0,0 +1,96 @@
+"""
+Notification Context Builder for CareOps
+Loads everything a batch of notifications renders from in a few IN-queries
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.channel_identity import telegram_chat_ids
+from app.services.template_service import booking_context, form_context
+
+
+class NotificationContext(NamedTuple):
+    """Rows a notification is about, plus the template variables built from them"""
+    workspace: models.Workspace
+    contact: models.Contact
+    variables: dict
+    telegram_chat_id: Optional[str] = None
+
+
+def _by_id(db: Session, model, ids: Iterable) -> dict:
+    """One IN-query for all distinct, non-null ids"""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return {}
+    return {row.id: row for row in db.query(model).filter(model.id.in_(ids)).all()}
+
+
+def load_booking_contexts(db: Session, bookings: List[models.Booking]) -> Dict[object, NotificationContext]:
+    """
+    Contexts for booking notifications, keyed by booking id.
+
+    Four queries whatever the number of bookings. Bookings whose contact
+    or workspace no longer exists are left out.
+    """
+    workspaces = _by_id(db, models.Workspace, (b.workspace_id for b in bookings))
+    contacts = _by_id(db, models.Contact, (b.contact_id for b in bookings))
+    services = _by_id(db, models.ServiceType, (b.service_type_id for b in bookings))
+    chat_ids = telegram_chat_ids(db, contacts.values())
+
+    contexts = {}
+    for booking in bookings:
+        workspace = workspaces.get(booking.workspace_id)
+        contact = contacts.get(booking.contact_id)
+        if workspace is None or contact is None:
+            continue
+        service = services.get(booking.service_type_id)
+        contexts[booking.id] = NotificationContext(
+            workspace, contact, booking_context(workspace, contact, service, booking), chat_ids.get(contact.id)
+        )
+    return contexts
+
+
+def load_submission_contexts(
+    db: Session,
+    submissions: List[models.FormSubmission]
+) -> Dict[object, NotificationContext]:
+    """
+    Contexts for form reminders, keyed by submission id.
+
+    Five queries whatever the number of submissions. The workspace comes
+    from the submission's booking; submissions without one are left out.
+    """
+    bookings = _by_id(db, models.Booking, (s.booking_id for s in submissions))
+    workspaces = _by_id(db, models.Workspace, (b.workspace_id for b in bookings.values()))
+    contacts = _by_id(db, models.Contact, (s.contact_id for s in submissions))
+    forms = _by_id(db, models.PostBookingForm, (s.form_id for s in submissions))
+    chat_ids = telegram_chat_ids(db, contacts.values())
+
+    contexts = {}
+    for submission in submissions:
+        booking = bookings.get(submission.booking_id)
+        workspace = workspaces.get(booking.workspace_id) if booking else None
+        contact = contacts.get(submission.contact_id)
+        if workspace is None or contact is None:
+            continue
+        form = forms.get(submission.form_id)
+        contexts[submission.id] = NotificationContext(
+            workspace, contact, form_context(workspace, contact, form), chat_ids.get(contact.id)
+        )
+    return contexts
+
+
+def booking_notification_context(db: Session, booking: models.Booking) -> Optional[NotificationContext]:
+    """Context for a single booking (used when the caller has not preloaded one)"""
+    return load_booking_contexts(db, [booking]).get(booking.id)
+
+
+def submission_notification_context(
+    db: Session,
+    submission: models.FormSubmission
+) -> Optional[NotificationContext]:
+    """Context for a single form submission"""
+    return load_submission_contexts(db, [submission]).get(submission.id)
@@ -0,0 +1,439 @@
+"""
+Notification Outbox for CareOps
+Requests write outbox rows in their own transaction; a dispatcher delivers them
+"""
+
+import contextlib
+import random
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.services.channel_config import channel_config_cache
+from app.services.email_service import OutgoingEmail, get_email_service, is_demo_config
+from app.services.sms_service import get_sms_service
+from app.services.smtp_pool import SMTPConnectionPool
+from app.services.notification_context import booking_notification_context, submission_notification_context
+from app.services.telegram_dispatcher import TELEGRAM_BREAKER
+from app.utils.circuit_breaker import CircuitBreaker, circuit_breakers
+
+
+def enqueue_notification(
+    db: Session,
+    workspace_id,
+    channel: str,
+    kind: str,
+    **payload
+) -> models.NotificationOutbox:
+    """
+    Queue a notification in the caller's transaction.
+
+    Nothing is sent until the caller commits, and if it rolls back the
+    notification disappears with the business row. Emails are held for the
+    coalescing window, so others to the same address can join them.
+    """
+    row = models.NotificationOutbox(
+        workspace_id=workspace_id,
+        channel=channel,
+        kind=kind,
+        payload={key: str(value) for key, value in payload.items()}
+    )
+    if channel == "email" and settings.NOTIFICATION_COALESCE_WINDOW_SECONDS:
+        row.next_attempt_at = datetime.now(timezone.utc) + timedelta(
+            seconds=settings.NOTIFICATION_COALESCE_WINDOW_SECONDS
+        )
+    db.add(row)
+    return row
+
+
+# ============== HANDLERS ==============
+# Each handler returns True when delivered, False on a retryable failure,
+# or None when there is nothing to send (e.g. contact has no chat id).
+# Emails are rendered by a builder first (None = nothing to send), so the
+# dispatcher can merge the ones going to the same address.
+
+def _load(db: Session, model, entity_id):
+    return db.query(model).filter(model.id == entity_id).first()
+
+
+def _build_welcome(db: Session, workspace_id, payload: dict) -> Optional[OutgoingEmail]:
+    contact = _load(db, models.Contact, payload["contact_id"])
+    if not contact or not contact.email:
+        return None
+    return get_email_service(workspace_id, db).build_welcome_email(contact)
+
+
+def _build_booking_confirmation(db: Session, workspace_id, payload: dict) -> Optional[OutgoingEmail]:
+    booking = _load(db, models.Booking, payload["booking_id"])
+    if not booking:
+        return None
+    return get_email_service(workspace_id, db).build_booking_confirmation(booking)
+
+
+def _build_low_stock_alert(db: Session, workspace_id, payload: dict) -> Optional[OutgoingEmail]:
+    item = _load(db, models.InventoryItem, payload["item_id"])
+    if not item:
+        return None
+    return get_email_service(workspace_id, db).build_low_stock_alert(item)
+
+
+EMAIL_BUILDERS: Dict[str, Callable[[Session, object, dict], Optional[OutgoingEmail]]] = {
+    "welcome": _build_welcome,
+    "booking_confirmation": _build_booking_confirmation,
+    "low_stock_alert": _build_low_stock_alert,
+}
+
+
+def _email_handler(builder):
+    """Handler that renders one email and sends it on its own"""
+    def handler(db: Session, workspace_id, payload: dict) -> Optional[bool]:
+        email = builder(db, workspace_id, payload)
+        if email is None:
+            return None
+        return get_email_service(workspace_id, db).send_combined([email])
+    return handler
+
+
+def _sms_handler(kind: str, model, key: str, load_context):
+    """Handler that sends one Telegram notification (send_<kind>) about a booking or form submission"""
+    def handler(db: Session, workspace_id, payload: dict) -> Optional[bool]:
+        entity = _load(db, model, payload[key])
+        if not entity:
+            return None
+        context = load_context(db, entity)
+        if context is None or not context.telegram_chat_id:
+            return None
+        # No logging fallback: if Telegram is down the row is retried later
+        sms_service = get_sms_service(workspace_id, db, fallback=False)
+        return getattr(sms_service, f"send_{kind}")(entity, context)
+    return handler
+
+
+HANDLERS: Dict[Tuple[str, str], Callable[[Session, object, dict], Optional[bool]]] = {
+    **{("email", kind): _email_handler(builder) for kind, builder in EMAIL_BUILDERS.items()},
+    ("sms", "booking_confirmation"): _sms_handler(
+        "booking_confirmation", models.Booking, "booking_id", booking_notification_context
+    ),
+    # Reminders the scheduled run couldn't hand to Telegram (circuit open)
+    ("sms", "booking_reminder"): _sms_handler(
+        "booking_reminder", models.Booking, "booking_id", booking_notification_context
+    ),
+    ("sms", "form_reminder"): _sms_handler(
+        "form_reminder", models.FormSubmission, "submission_id", submission_notification_context
+    ),
+}
+
+
+def _provider_breaker(db: Session, row: models.NotificationOutbox) -> Optional[CircuitBreaker]:
+    """The circuit breaker of the provider the row goes out through (None in email demo mode)"""
+    if row.channel == "sms":
+        return circuit_breakers.get(TELEGRAM_BREAKER)
+    config = channel_config_cache.get(db, row.workspace_id).email
+    if is_demo_config(config):
+        return None
+    return circuit_breakers.get(SMTPConnectionPool.breaker_name(config))
+
+
+class RenderedEmail(NamedTuple):
+    """A claimed email row, rendered and waiting to be sent (possibly merged)"""
+    outbox_id: object
+    workspace_id: object
+    email: OutgoingEmail
+
+
+# ============== DISPATCHER ==============
+class OutboxDispatcher:
+    """
+    Drains the notification outbox.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED, so any number of
+    dispatchers (processes or threads) can run side by side without
+    delivering a row twice. Claimed rows are delivered concurrently on a
+    thread pool; failures are retried with exponential backoff and moved
+    to the 'dead' state after `max_attempts`. While a batch is in progress
+    its lease is renewed every `lease_seconds / 3`, so rows still waiting
+    (behind others in the batch, or in the Telegram send queue for up to
+    TELEGRAM_SEND_WAIT_SECONDS) are not reclaimed and sent twice; only a
+    dispatcher that died lets its lease run out.
+
+    With a `coalesce_window`, the emails in a batch are rendered first and
+    the ones going to the same address from the same workspace are sent
+    as one email; each row still gets its own outcome. enqueue_notification
+    holds new emails for the window so close neighbours share a batch.
+    `coalesced` counts the sends saved.
+
+    Rows whose provider's circuit breaker is open are not attempted: they
+    go back to pending until the breaker's next trial call, without using
+    up an attempt, so an outage longer than the retry schedule does not
+    kill them. `deferred` counts these.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.OUTBOX_BATCH_SIZE,
+        concurrency: int = settings.OUTBOX_CONCURRENCY,
+        max_attempts: int = settings.OUTBOX_MAX_ATTEMPTS,
+        retry_base_seconds: int = settings.OUTBOX_RETRY_BASE_SECONDS,
+        lease_seconds: int = settings.OUTBOX_LEASE_SECONDS,
+        coalesce_window: float = settings.NOTIFICATION_COALESCE_WINDOW_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.coalesce_window = coalesce_window
+        self.coalesced = 0
+        self.deferred = 0
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="outbox")
+
+    def _release_expired_leases(self, db: Session):
+        """Put back rows claimed by a dispatcher that died mid-delivery"""
+        db.execute(
+            text(
+                "UPDATE notification_outbox SET status = 'pending', locked_at = NULL "
+                "WHERE status = 'processing' AND locked_at < now() - make_interval(secs => :lease)"
+            ),
+            {"lease": self.lease_seconds}
+        )
+
+    @contextlib.contextmanager
+    def _renewing_lease(self, ids: List[str]):
+        """Keep the claimed rows' lease fresh until the block exits"""
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    with SessionLocal() as db:
+                        db.execute(
+                            text(
+                                "UPDATE notification_outbox SET locked_at = now() "
+                                "WHERE id = ANY(:ids) AND status = 'processing'"
+                            ),
+                            {"ids": ids}
+                        )
+                        db.commit()
+                except Exception as e:
+                    print(f"❌ Failed to renew outbox lease: {str(e)}")
+
+        renewer = threading.Thread(target=renew, name="outbox-lease", daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            done.set()
+            renewer.join()
+
+    def claim_batch(self) -> List[str]:
+        """Mark up to batch_size due rows as processing and return their ids"""
+        db = SessionLocal()
+        try:
+            self._release_expired_leases(db)
+            rows = db.execute(
+                text(
+                    "UPDATE notification_outbox SET status = 'processing', locked_at = now() "
+                    "WHERE id IN ("
+                    "  SELECT id FROM notification_outbox "
+                    "  WHERE status = 'pending' AND next_attempt_at <= now() "
+                    "  ORDER BY next_attempt_at "
+                    "  LIMIT :limit FOR UPDATE SKIP LOCKED"
+                    ") RETURNING id"
+                ),
+                {"limit": self.batch_size}
+            ).fetchall()
+            db.commit()
+            return [row[0] for row in rows]
+        finally:
+            db.close()
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = self.retry_base_seconds * (2 ** (attempts - 1))
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    @staticmethod
+    def _claimed(db: Session, outbox_id) -> Optional[models.NotificationOutbox]:
+        row = db.query(models.NotificationOutbox).filter(
+            models.NotificationOutbox.id == outbox_id
+        ).first()
+        return row if row and row.status == "processing" else None
+
+    @staticmethod
+    def _call(db: Session, row: models.NotificationOutbox, fn) -> Tuple[object, Optional[str]]:
+        """Run a handler or builder for the row; (False, error) if it raises"""
+        try:
+            if fn is None:
+                raise LookupError(f"No handler for {row.channel}/{row.kind}")
+            return fn(db, row.workspace_id, row.payload or {}), None
+        except Exception as e:
+            db.rollback()
+            traceback.print_exc()
+            return False, f"{type(e).__name__}: {e}"
+
+    def _record(self, row: models.NotificationOutbox, result: Optional[bool], error: Optional[str] = None):
+        """Apply a delivery outcome to the row (the caller commits)"""
+        now = datetime.now(timezone.utc)
+        row.attempts += 1
+        row.locked_at = None
+
+        if result is None:
+            row.status = "skipped"
+        elif result:
+            row.status = "sent"
+            row.sent_at = now
+            row.last_error = None
+        else:
+            row.last_error = error or "Delivery failed"
+            if row.attempts >= self.max_attempts:
+                row.status = "dead"
+                print(f"☠️ Outbox {row.id} ({row.channel}/{row.kind}) dead after {row.attempts} attempts")
+            else:
+                row.status = "pending"
+                row.next_attempt_at = now + self._backoff(row.attempts)
+
+    def _defer_if_unavailable(self, db: Session, row: models.NotificationOutbox) -> bool:
+        """Put the row back, attempts untouched, while its provider's breaker is open"""
+        breaker = _provider_breaker(db, row)
+        if breaker is None or breaker.available():
+            return False
+        row.status = "pending"
+        row.locked_at = None
+        row.last_error = f"{breaker.name} is unavailable (circuit open)"
+        # Spread the rows out so they don't all hit the trial call at once
+        row.next_attempt_at = datetime.now(timezone.utc) + timedelta(
+            seconds=breaker.retry_in() + random.uniform(0, self.retry_base_seconds)
+        )
+        db.commit()
+        self.deferred += 1
+        return True
+
+    def _deliver_row(self, db: Session, row: models.NotificationOutbox) -> str:
+        if self._defer_if_unavailable(db, row):
+            return row.status
+        result, error = self._call(db, row, HANDLERS.get((row.channel, row.kind)))
+        self._record(row, result, error)
+        db.commit()
+        return row.status
+
+    def deliver(self, outbox_id) -> str:
+        """Deliver one claimed row and record the outcome; returns the new status"""
+        db = SessionLocal()
+        try:
+            row = self._claimed(db, outbox_id)
+            if row is None:
+                return "gone"
+            return self._deliver_row(db, row)
+        finally:
+            db.close()
+
+    def render(self, outbox_id) -> Union[str, RenderedEmail]:
+        """
+        Render a claimed email row for deliver_emails(); the row stays claimed.
+
+        Rows with nothing to send or that fail to render are finished here,
+        rows whose SMTP account is unavailable are deferred, and rows that
+        are not emails are delivered as usual; for those the new status is
+        returned instead.
+        """
+        db = SessionLocal()
+        try:
+            row = self._claimed(db, outbox_id)
+            if row is None:
+                return "gone"
+            builder = EMAIL_BUILDERS.get(row.kind) if row.channel == "email" else None
+            if builder is None:
+                return self._deliver_row(db, row)
+            if self._defer_if_unavailable(db, row):
+                return row.status
+
+            email, error = self._call(db, row, builder)
+            if isinstance(email, OutgoingEmail):
+                return RenderedEmail(row.id, row.workspace_id, email)
+            self._record(row, None if email is None else False, error)
+            db.commit()
+            return row.status
+        finally:
+            db.close()
+
+    def deliver_emails(self, group: List[RenderedEmail]) -> Optional[bool]:
+        """Send rendered emails to one address as one email and record it on every row"""
+        db = SessionLocal()
+        try:
+            error = None
+            try:
+                result = get_email_service(group[0].workspace_id, db).send_combined(
+                    [rendered.email for rendered in group]
+                )
+            except Exception as e:
+                db.rollback()
+                result = False
+                error = f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+
+            rows = db.query(models.NotificationOutbox).filter(
+                models.NotificationOutbox.id.in_([rendered.outbox_id for rendered in group]),
+                models.NotificationOutbox.status == "processing"
+            ).all()
+            for row in rows:
+                self._record(row, result, error)
+            db.commit()
+            return result
+        finally:
+            db.close()
+
+    def drain_once(self) -> int:
+        """Claim one batch and deliver it concurrently; returns rows processed"""
+        ids = self.claim_batch()
+        if not ids:
+            return 0
+        with self._renewing_lease(ids):
+            self._drain_claimed(ids)
+        return len(ids)
+
+    def _drain_claimed(self, ids: List[str]):
+        if not self.coalesce_window:
+            list(self._executor.map(self.deliver, ids))
+            return
+
+        groups: Dict[Tuple[object, str, bool], List[RenderedEmail]] = {}
+        for rendered in self._executor.map(self.render, ids):
+            if isinstance(rendered, RenderedEmail):
+                key = (rendered.workspace_id, rendered.email.to_email.lower(), rendered.email.html)
+                groups.setdefault(key, []).append(rendered)
+        list(self._executor.map(self.deliver_emails, groups.values()))
+
+        merged = [group for group in groups.values() if len(group) > 1]
+        if merged:
+            saved = sum(len(group) - 1 for group in merged)
+            self.coalesced += saved
+            print(f"📬 Coalesced {saved + len(merged)} outbox emails into {len(merged)} sends")
+
+    def stats(self) -> dict:
+        return {"coalesce_window": self.coalesce_window, "coalesced": self.coalesced, "deferred": self.deferred}
+
+    def run_forever(self, stop_event: threading.Event, poll_interval: float = settings.OUTBOX_POLL_INTERVAL_SECONDS):
+        """Drain until stop_event is set, sleeping only when the outbox is empty"""
+        print(f"📬 Outbox dispatcher started (batch={self.batch_size}, concurrency={self.concurrency})")
+        while not stop_event.is_set():
+            try:
+                processed = self.drain_once()
+            except Exception as e:
+                print(f"❌ Outbox dispatcher error: {str(e)}")
+                processed = 0
+            if processed < self.batch_size:
+                stop_event.wait(poll_interval)
+        self._executor.shutdown(wait=True)
+        print("🛑 Outbox dispatcher stopped")
+
+
+def get_outbox_dispatcher() -> OutboxDispatcher:
+    """Factory function to get outbox dispatcher instance"""
+    return OutboxDispatcher()
@@ -4,12 +4,48 @@ Provides unlimited free SMS-like notifications via Telegram
 """
 
 import requests
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from typing import Optional, Dict, Any
 from datetime import datetime
 from sqlalchemy.orm import Session
 
 from app.config import settings
 from app import models
+from app.services.channel_config import channel_config_cache
+from app.services.telegram_http import telegram_http
+from app.services.telegram_dispatcher import TELEGRAM_BREAKER, telegram_dispatcher
+from app.services.delivery_log import delivery_log
+from app.services.suppression import suppression_list
+from app.services.channel_identity import telegram_chat_ids
+from app.services.notification_context import (
+    NotificationContext, booking_notification_context, submission_notification_context
+)
+from app.services.template_service import template_registry, item_context
+from app.utils.circuit_breaker import circuit_breakers
+
+
+def wait_for_telegram(future: Future) -> Dict[str, Any]:
+    """Wait for a queued Telegram send (see _queue_telegram_message) and log the outcome"""
+    try:
+        result = future.result(timeout=settings.TELEGRAM_SEND_WAIT_SECONDS)
+    except FutureTimeoutError:
+        future.cancel()
+        result = {"success": False, "error": "Timed out waiting in the Telegram send queue"}
+    
+    if result.get("demo_mode") or result.get("suppressed"):
+        return result
+    if result.get("success"):
+        print(f"✅ Telegram message sent to {future.chat_id}")
+    else:
+        print(f"❌ Telegram API error: {result.get('error')}")
+    return result
+
+
+def send_outcome(result: Dict[str, Any]) -> Optional[bool]:
+    """True if sent, False if it failed, None if deliberately not sent (opted out)"""
+    if result.get("suppressed"):
+        return None
+    return result.get("success", False)
 
 
 class TelegramSMSService:
@@ -28,26 +64,56 @@ class TelegramSMSService:
         self.workspace_id = workspace_id
         self.db = db
         self.bot_token = settings.TELEGRAM_BOT_TOKEN
-        self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
+        self.http = telegram_http
         self.workspace_chat_id = self._get_workspace_chat_id()
     
     def _get_workspace_chat_id(self) -> Optional[str]:
         """Get Telegram chat ID for workspace notifications"""
-        workspace = self.db.query(models.Workspace).filter(
-            models.Workspace.id == self.workspace_id
-        ).first()
+        return channel_config_cache.get(self.db, self.workspace_id).telegram_chat_id
+    
+    def _queue_telegram_message(
+        self,
+        chat_id: str,
+        message: str,
+        parse_mode: str = "HTML"
+    ) -> Future:
+        """
+        Hand a message to the rate-limited dispatcher without waiting for it
         
-        # Check if workspace has SMS integration configured
-        integration = self.db.query(models.Integration).filter(
-            models.Integration.workspace_id == self.workspace_id,
-            models.Integration.type == "sms",
-            models.Integration.is_active == True
-        ).first()
+        Opted-out chats are never sent to; their future resolves at once
+        with {"success": False, "suppressed": True}.
         
-        if integration and integration.config:
-            return integration.config.get('telegram_chat_id')
+        Returns:
+            Future resolving to the same dict _send_telegram_message returns,
+            with the recipient on future.chat_id
+        """
+        if suppression_list.is_suppressed(self.workspace_id, "sms", chat_id, self.db):
+            future: Future = Future()
+            future.set_result({
+                "success": False,
+                "suppressed": True,
+                "error": "Recipient opted out"
+            })
+        elif not self.bot_token:
+            print(f"📱 [DEMO MODE] Would send SMS via Telegram to {chat_id}")
+            print(f"   Message: {message[:100]}...")
+            delivery_log.record(self.workspace_id, "sms", chat_id, "demo")
+            future = Future()
+            future.set_result({
+                "success": True, 
+                "demo_mode": True,
+                "message": "Telegram bot token not configured"
+            })
+        else:
+            payload = {
+                "chat_id": chat_id,
+                "text": message,
+                "parse_mode": parse_mode
+            }
+            future = telegram_dispatcher.submit(self.bot_token, chat_id, payload, self.workspace_id)
         
-        return None
+        future.chat_id = chat_id
+        return future
     
     def _send_telegram_message(
         self, 
@@ -58,6 +124,9 @@ class TelegramSMSService:
         """
         Send message via Telegram Bot API
         
+        Goes through the dispatcher so Telegram's rate limits are respected;
+        blocks until the message is delivered (or finally fails).
+        
         Args:
             chat_id: Telegram chat ID (can be user ID or group ID)
             message: Message text (supports HTML formatting)
@@ -66,174 +135,86 @@ class TelegramSMSService:
         Returns:
             API response dict
         """
-        if not self.bot_token:
-            print(f"📱 [DEMO MODE] Would send SMS via Telegram to {chat_id}")
-            print(f"   Message: {message[:100]}...")
-            return {
-                "success": True, 
-                "demo_mode": True,
-                "message": "Telegram bot token not configured"
-            }
-        
-        try:
-            url = f"{self.base_url}/sendMessage"
-            payload = {
-                "chat_id": chat_id,
-                "text": message,
-                "parse_mode": parse_mode
-            }
-            
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if result.get("ok"):
-                print(f"✅ Telegram message sent to {chat_id}")
-                return {"success": True, "data": result}
-            else:
-                print(f"❌ Telegram API error: {result.get('description')}")
-                return {"success": False, "error": result.get('description')}
-        
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Failed to send Telegram message: {str(e)}")
-            return {"success": False, "error": str(e)}
+        return wait_for_telegram(self._queue_telegram_message(chat_id, message, parse_mode))
+    
+    def _render(self, name: str, context: dict) -> str:
+        """Render the Telegram part of a notification template"""
+        return template_registry.render(self.db, self.workspace_id, name, "telegram", context)
     
     def _get_contact_chat_id(self, contact: models.Contact) -> Optional[str]:
-        """
-        Get Telegram chat ID for a contact
-        Can be stored in contact metadata or phone field
-        """
+        """Get Telegram chat ID for a contact from its channel identity"""
         if not contact:
             return None
-        
-        # Check if chat_id is in contact metadata
-        if contact.custom_custom_metadata:
-            telegram_id = contact.custom_custom_metadata.get('telegram_chat_id')
-            if telegram_id:
-                return str(telegram_id)
-        
-        # Check if phone field contains telegram chat ID
-        # Format: telegram:123456789 or just the ID if it starts with digits
-        if contact.phone:
-            phone = contact.phone.strip()
-            if phone.startswith('telegram:'):
-                return phone.replace('telegram:', '')
-            # If it's numeric and long (Telegram IDs are typically 9-10 digits)
-            elif phone.isdigit() and len(phone) >= 9:
-                return phone
-        
-        return None
+        return telegram_chat_ids(self.db, [contact]).get(contact.id)
     
-    def send_booking_confirmation(self, booking: models.Booking) -> bool:
-        """Send booking confirmation SMS"""
-        workspace = self.db.query(models.Workspace).filter(
-            models.Workspace.id == self.workspace_id
-        ).first()
-        
-        contact = self.db.query(models.Contact).filter(
-            models.Contact.id == booking.contact_id
-        ).first()
-        
-        service = self.db.query(models.ServiceType).filter(
-            models.ServiceType.id == booking.service_type_id
-        ).first()
+    def _queue_to_contact(self, name: str, context: Optional[NotificationContext]) -> Optional[Future]:
+        """Render a template for the context's contact and queue it for their chat"""
+        if context is None:
+            return None
         
-        chat_id = self._get_contact_chat_id(contact)
+        chat_id = context.telegram_chat_id
         
         if not chat_id:
-            print(f"⚠️ No Telegram chat ID for contact {contact.email}")
-            return False
+            print(f"⚠️ No Telegram chat ID for contact {context.contact.email}")
+            return None
         
-        message = f"""
-<b>✅ Booking Confirmed - {workspace.business_name}</b>
-
-Hi {contact.name}! Your appointment is confirmed:
-
-<b>Service:</b> {service.name if service else 'N/A'}
-<b>Date:</b> {booking.scheduled_at.strftime('%A, %B %d, %Y')}
-<b>Time:</b> {booking.scheduled_at.strftime('%I:%M %p')}
-<b>Duration:</b> {service.duration_minutes if service else 'N/A'} minutes
-
-{f'<b>Location:</b> {booking.location}' if booking.location else ''}
-
-{f'<b>Notes:</b> {booking.notes}' if booking.notes else ''}
-
-Please arrive 10 minutes early.
-
-Reply STOP to unsubscribe.
-        """.strip()
+        message = self._render(name, context.variables)
         
-        result = self._send_telegram_message(chat_id, message)
-        return result.get("success", False)
+        return self._queue_telegram_message(chat_id, message)
     
-    def send_booking_reminder(self, booking: models.Booking) -> bool:
-        """Send appointment reminder SMS"""
-        contact = self.db.query(models.Contact).filter(
-            models.Contact.id == booking.contact_id
-        ).first()
-        
-        service = self.db.query(models.ServiceType).filter(
-            models.ServiceType.id == booking.service_type_id
-        ).first()
-        
-        chat_id = self._get_contact_chat_id(contact)
-        
-        if not chat_id:
-            print(f"⚠️ No Telegram chat ID for contact {contact.email}")
+    def _send_to_contact(self, name: str, context: Optional[NotificationContext]) -> Optional[bool]:
+        """Render a template for the context's contact and send it to their chat"""
+        future = self._queue_to_contact(name, context)
+        if future is None:
             return False
-        
-        message = f"""
-<b>🔔 Appointment Reminder</b>
-
-Hi {contact.name}, reminder for your appointment tomorrow:
-
-<b>Service:</b> {service.name if service else 'N/A'}
-<b>Date:</b> {booking.scheduled_at.strftime('%A, %B %d')}
-<b>Time:</b> {booking.scheduled_at.strftime('%I:%M %p')}
-
-{f'<b>Location:</b> {booking.location}' if booking.location else ''}
-
-See you soon!
-
-Reply STOP to unsubscribe.
-        """.strip()
-        
-        result = self._send_telegram_message(chat_id, message)
-        return result.get("success", False)
+        return send_outcome(wait_for_telegram(future))
+    
+    def send_booking_confirmation(
+        self,
+        booking: models.Booking,
+        context: Optional[NotificationContext] = None
+    ) -> Optional[bool]:
+        """Send booking confirmation SMS"""
+        context = context or booking_notification_context(self.db, booking)
+        return self._send_to_contact("booking_confirmation", context)
     
-    def send_form_reminder(self, submission: models.FormSubmission) -> bool:
+    def send_booking_reminder(
+        self,
+        booking: models.Booking,
+        context: Optional[NotificationContext] = None
+    ) -> Optional[bool]:
+        """Send appointment reminder SMS"""
+        context = context or booking_notification_context(self.db, booking)
+        return self._send_to_contact("booking_reminder", context)
+    
+    def queue_booking_reminder(
+        self,
+        booking: models.Booking,
+        context: Optional[NotificationContext] = None
+    ) -> Optional[Future]:
+        """Queue an appointment reminder SMS; None if the contact has no chat"""
+        context = context or booking_notification_context(self.db, booking)
+        return self._queue_to_contact("booking_reminder", context)
+    
+    def send_form_reminder(
+        self,
+        submission: models.FormSubmission,
+        context: Optional[NotificationContext] = None
+    ) -> Optional[bool]:
         """Send form completion reminder SMS"""
-        contact = self.db.query(models.Contact).filter(
-            models.Contact.id == submission.contact_id
-        ).first()
-        
-        form = self.db.query(models.PostBookingForm).filter(
-            models.PostBookingForm.id == submission.form_id
-        ).first()
-        
-        chat_id = self._get_contact_chat_id(contact)
-        
-        if not chat_id:
-            print(f"⚠️ No Telegram chat ID for contact {contact.email}")
-            return False
-        
-        message = f"""
-<b>📋 Action Required: Complete Your Form</b>
-
-Hi {contact.name}, please complete your <b>{form.name if form else 'intake form'}</b>.
-
-This helps us prepare for your appointment.
-
-Complete the form at your earliest convenience.
-
-Reply STOP to unsubscribe.
-        """.strip()
-        
-        result = self._send_telegram_message(chat_id, message)
-        return result.get("success", False)
+        context = context or submission_notification_context(self.db, submission)
+        return self._send_to_contact("form_reminder", context)
     
-    def send_low_stock_alert(self, item: models.InventoryItem) -> bool:
+    def queue_form_reminder(
+        self,
+        submission: models.FormSubmission,
+        context: Optional[NotificationContext] = None
+    ) -> Optional[Future]:
+        """Queue a form completion reminder SMS; None if the contact has no chat"""
+        context = context or submission_notification_context(self.db, submission)
+        return self._queue_to_contact("form_reminder", context)
+    
+    def send_low_stock_alert(self, item: models.InventoryItem) -> Optional[bool]:
         """Send low stock alert to workspace admin"""
         workspace = self.db.query(models.Workspace).filter(
             models.Workspace.id == self.workspace_id
@@ -244,29 +225,17 @@ Reply STOP to unsubscribe.
             print(f"⚠️ No workspace Telegram chat ID configured")
             return False
         
-        message = f"""
-<b>⚠️ LOW STOCK ALERT</b>
-
-<b>Item:</b> {item.name}
-<b>Current Stock:</b> {item.quantity} {item.unit}
-<b>Threshold:</b> {item.low_stock_threshold} {item.unit}
-
-{f'<b>Description:</b> {item.description}' if item.description else ''}
-
-Please reorder soon to avoid running out.
-
-<i>CareOps Inventory Alert - {workspace.business_name}</i>
-        """.strip()
+        message = self._render("low_stock_alert", item_context(workspace, item))
         
         result = self._send_telegram_message(self.workspace_chat_id, message)
-        return result.get("success", False)
+        return send_outcome(result)
     
     def send_staff_notification(
         self, 
         user_id: str, 
         title: str, 
         message: str
-    ) -> bool:
+    ) -> Optional[bool]:
         """Send notification to staff member"""
         user = self.db.query(models.User).filter(
             models.User.id == user_id
@@ -290,12 +259,12 @@ Please reorder soon to avoid running out.
         """.strip()
         
         result = self._send_telegram_message(self.workspace_chat_id, formatted_message)
-        return result.get("success", False)
+        return send_outcome(result)
     
-    def send_custom_sms(self, chat_id: str, message: str) -> bool:
+    def send_custom_sms(self, chat_id: str, message: str) -> Optional[bool]:
         """Send custom SMS message"""
         result = self._send_telegram_message(chat_id, message)
-        return result.get("success", False)
+        return send_outcome(result)
     
     def get_bot_info(self) -> Dict[str, Any]:
         """Get information about the Telegram bot"""
@@ -303,8 +272,7 @@ Please reorder soon to avoid running out.
             return {"error": "Bot token not configured"}
         
         try:
-            url = f"{self.base_url}/getMe"
-            response = requests.get(url, timeout=10)
+            response = self.http.get(self.bot_token, "getMe")
             response.raise_for_status()
             
             result = response.json()
@@ -333,8 +301,17 @@ Please reorder soon to avoid running out.
         return None
 
 
-def get_sms_service(workspace_id: str, db: Session) -> TelegramSMSService:
-    """Factory function to get SMS service instance"""
+def get_sms_service(workspace_id: str, db: Session, fallback: bool = True) -> "TelegramSMSService | FallbackSMSService":
+    """
+    Factory function to get SMS service instance
+    
+    While Telegram's circuit breaker is open this is the logging
+    FallbackSMSService, so callers don't queue sends that would only fail.
+    Pass fallback=False to get the Telegram failure instead (callers that
+    retry later, like the outbox).
+    """
+    if fallback and not circuit_breakers.get(TELEGRAM_BREAKER).available():
+        return FallbackSMSService(workspace_id, db)
     return TelegramSMSService(workspace_id, db)
 
 
@@ -342,7 +319,7 @@ def get_sms_service(workspace_id: str, db: Session) -> TelegramSMSService:
 class FallbackSMSService:
     """
     Fallback SMS service that logs messages instead of sending
-    Used when no SMS provider is configured
+    Used when no SMS provider is available (Telegram's circuit breaker is open)
     """
     
     def __init__(self, workspace_id: str, db: Session):
@@ -355,26 +332,46 @@ class FallbackSMSService:
         print(f"   Message: {message[:100]}...")
         print(f"   Timestamp: {datetime.now().isoformat()}")
     
-    def send_booking_confirmation(self, booking: models.Booking) -> bool:
-        contact = self.db.query(models.Contact).filter(
-            models.Contact.id == booking.contact_id
+    def _contact(self, contact_id, context: Optional[NotificationContext]):
+        if context is not None:
+            return context.contact
+        return self.db.query(models.Contact).filter(
+            models.Contact.id == contact_id
         ).first()
-        self._log_sms(contact.phone or contact.email, "Booking confirmation")
-        return True
     
-    def send_booking_reminder(self, booking: models.Booking) -> bool:
-        contact = self.db.query(models.Contact).filter(
-            models.Contact.id == booking.contact_id
-        ).first()
-        self._log_sms(contact.phone or contact.email, "Appointment reminder")
+    def _log_to_contact(self, contact_id, context: Optional[NotificationContext], message: str) -> Optional[bool]:
+        """Log a message for a contact; None if they opted out, False if the contact is gone"""
+        contact = self._contact(contact_id, context)
+        if contact is None:
+            print(f"⚠️ No contact {contact_id} to send '{message}' to")
+            return False
+        
+        chat_id = context.telegram_chat_id if context is not None else self._chat_id(contact)
+        if suppression_list.is_suppressed(self.workspace_id, "sms", chat_id, self.db):
+            return None
+        
+        self._log_sms(contact.phone or contact.email, message)
         return True
     
-    def send_form_reminder(self, submission: models.FormSubmission) -> bool:
-        contact = self.db.query(models.Contact).filter(
-            models.Contact.id == submission.contact_id
-        ).first()
-        self._log_sms(contact.phone or contact.email, "Form completion reminder")
-        return True
+    def _chat_id(self, contact: models.Contact) -> Optional[str]:
+        return telegram_chat_ids(self.db, [contact]).get(contact.id)
+    
+    def send_booking_confirmation(self, booking: models.Booking, context: Optional[NotificationContext] = None) -> Optional[bool]:
+        return self._log_to_contact(booking.contact_id, context, "Booking confirmation")
+    
+    def send_booking_reminder(self, booking: models.Booking, context: Optional[NotificationContext] = None) -> Optional[bool]:
+        return self._log_to_contact(booking.contact_id, context, "Appointment reminder")
+    
+    def queue_booking_reminder(self, booking: models.Booking, context: Optional[NotificationContext] = None) -> Optional[Future]:
+        self.send_booking_reminder(booking, context)
+        return None
+    
+    def send_form_reminder(self, submission: models.FormSubmission, context: Optional[NotificationContext] = None) -> Optional[bool]:
+        return self._log_to_contact(submission.contact_id, context, "Form completion reminder")
+    
+    def queue_form_reminder(self, submission: models.FormSubmission, context: Optional[NotificationContext] = None) -> Optional[Future]:
+        self.send_form_reminder(submission, context)
+        return None
     
     def send_low_stock_alert(self, item: models.InventoryItem) -> bool:
         self._log_sms("admin", f"Low stock alert: {item.name}")
@@ -384,6 +381,8 @@ class FallbackSMSService:
         self._log_sms("staff", f"{title}: {message}")
         return True
     
-    def send_custom_sms(self, recipient: str, message: str) -> bool:
+    def send_custom_sms(self, recipient: str, message: str) -> Optional[bool]:
+        if suppression_list.is_suppressed(self.workspace_id, "sms", recipient, self.db):
+            return None
         self._log_sms(recipient, message)
         return True
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""
+SMTP Connection Pool for CareOps
+Keeps authenticated SMTP sessions alive between emails
+"""
+
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.circuit_breaker import circuit_breakers
+
+
+PoolKey = Tuple[str, int, str]
+
+
+class SMTPPoolExhausted(Exception):
+    """No pooled connection came free in time: local saturation, not a provider failure"""
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """True if the connection itself is unusable (vs. a rejected message)"""
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    # SMTPException subclasses OSError, so exclude protocol-level replies
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def is_provider_error(exc: BaseException) -> bool:
+    """True if the SMTP account is failing (vs. one message); counts against its breaker"""
+    if is_connection_error(exc) or isinstance(exc, smtplib.SMTPAuthenticationError):
+        return True
+    # 421: service not available, the server is shutting the session down
+    return isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code == 421
+
+
+class _PooledConnection:
+    __slots__ = ("smtp", "last_used", "messages_sent")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.messages_sent = 0
+
+
+class SMTPConnectionPool:
+    """
+    Pool of logged-in SMTP connections keyed by (host, port, user).
+
+    - connections are reused across sends, so STARTTLS and AUTH happen
+      once per connection instead of once per email
+    - at most `max_per_host` connections are open per key; extra senders
+      wait for one to be returned
+    - idle connections are closed after `idle_timeout` seconds, by a
+      background reaper so a quiet process does not hold sessions open,
+      and connections are recycled after `max_messages` sends
+    - a send that fails on a dead connection reconnects and retries once
+    - each account has a circuit breaker (see breaker_name); while it is
+      open, send_message raises CircuitOpenError at once instead of
+      waiting on a connect that will time out
+    - waiting longer than `timeout` for a connection raises
+      SMTPPoolExhausted, which is neither retried nor held against the
+      account's breaker
+    """
+
+    def __init__(
+        self,
+        max_per_host: int,
+        idle_timeout: float,
+        max_messages: int,
+        timeout: float
+    ):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._idle: Dict[PoolKey, List[_PooledConnection]] = {}
+        self._open: Dict[PoolKey, int] = {}
+        self._cond = threading.Condition()
+        self._reaper: Optional[threading.Thread] = None
+
+    @staticmethod
+    def pool_key(config: dict) -> PoolKey:
+        return (config["smtp_host"], int(config["smtp_port"]), config.get("smtp_user") or "")
+
+    @classmethod
+    def breaker_name(cls, config: dict) -> str:
+        """Name of the account's breaker in circuit_breakers (shared with the async sender)"""
+        host, port, user = cls.pool_key(config)
+        return f"smtp:{host}:{port}/{user}"
+
+    def _connect(self, config: dict) -> _PooledConnection:
+        smtp = smtplib.SMTP(config["smtp_host"], int(config["smtp_port"]), timeout=self.timeout)
+        try:
+            if config.get("smtp_starttls", True):
+                smtp.starttls()
+            if config.get("smtp_password"):
+                smtp.login(config["smtp_user"], config["smtp_password"])
+        except Exception:
+            self._quit(smtp)
+            raise
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    def _quit(smtp: smtplib.SMTP):
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def _reap_idle(self, now: float) -> List[_PooledConnection]:
+        """Remove idle-expired connections; caller closes them outside the lock"""
+        expired = []
+        for key, idle in self._idle.items():
+            keep = []
+            for conn in idle:
+                if now - conn.last_used >= self.idle_timeout:
+                    expired.append(conn)
+                    self._open[key] -= 1
+                else:
+                    keep.append(conn)
+            self._idle[key] = keep
+        return expired
+
+    def reap_idle(self) -> int:
+        """Close connections idle for `idle_timeout`; returns how many"""
+        with self._cond:
+            expired = self._reap_idle(time.monotonic())
+            if expired:
+                self._cond.notify_all()
+        for conn in expired:
+            self._quit(conn.smtp)
+        return len(expired)
+
+    def _run_reaper(self):
+        # Each connection is closed within 1.5 x idle_timeout of its last use
+        while True:
+            time.sleep(max(self.idle_timeout / 2, 1))
+            self.reap_idle()
+
+    def _acquire(self, config: dict, key: PoolKey) -> _PooledConnection:
+        deadline = time.monotonic() + self.timeout
+
+        with self._cond:
+            while True:
+                expired = self._reap_idle(time.monotonic())
+                if expired:
+                    self._cond.notify_all()
+
+                idle = self._idle.get(key)
+                if idle:
+                    conn = idle.pop()  # most recently used is least likely to be stale
+                    break
+
+                if self._open.get(key, 0) < self.max_per_host:
+                    self._open[key] = self._open.get(key, 0) + 1
+                    conn = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SMTPPoolExhausted(f"No SMTP connection available for {key[0]}:{key[1]}")
+                self._cond.wait(remaining)
+
+        for stale in expired:
+            self._quit(stale.smtp)
+
+        if conn is None:
+            try:
+                conn = self._connect(config)
+            except Exception:
+                self._discard(key, None)
+                raise
+
+        return conn
+
+    def _release(self, key: PoolKey, conn: _PooledConnection):
+        if conn.messages_sent >= self.max_messages:
+            self._discard(key, conn)
+            return
+
+        conn.last_used = time.monotonic()
+        with self._cond:
+            self._idle.setdefault(key, []).append(conn)
+            self._cond.notify()
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._run_reaper, name="smtp-pool-reaper", daemon=True)
+                self._reaper.start()
+
+    def _discard(self, key: PoolKey, conn):
+        with self._cond:
+            self._open[key] = max(0, self._open.get(key, 0) - 1)
+            self._cond.notify()
+        if conn is not None:
+            self._quit(conn.smtp)
+
+    def _flush_idle(self, key: PoolKey):
+        """Close idle connections for a key, e.g. after the server dropped one"""
+        with self._cond:
+            idle = self._idle.pop(key, [])
+            self._open[key] = max(0, self._open.get(key, 0) - len(idle))
+            self._cond.notify_all()
+        for conn in idle:
+            self._quit(conn.smtp)
+
+    @contextmanager
+    def connection(self, config: dict):
+        """Borrow a connection; broken connections are dropped instead of returned"""
+        key = self.pool_key(config)
+        conn = self._acquire(config, key)
+        try:
+            yield conn
+        except Exception as e:
+            if is_connection_error(e):
+                # Siblings opened at the same time are likely dead too
+                self._discard(key, conn)
+                self._flush_idle(key)
+                raise
+            # Message-level rejection: reset the session and keep it
+            try:
+                conn.smtp.rset()
+            except Exception:
+                self._discard(key, conn)
+                raise e
+            self._release(key, conn)
+            raise
+        else:
+            self._release(key, conn)
+
+    def send_message(self, config: dict, msg):
+        """Send a message over a pooled connection, reconnecting once on failure"""
+        breaker = circuit_breakers.get(self.breaker_name(config))
+        breaker.check()
+        for attempt in range(2):
+            try:
+                with self.connection(config) as conn:
+                    conn.smtp.send_message(msg)
+                    conn.messages_sent += 1
+                breaker.record_success()
+                return
+            except SMTPPoolExhausted:
+                if attempt == 0:
+                    breaker.cancel()
+                else:
+                    breaker.record_failure()  # for the connection error that led to the retry
+                raise
+            except Exception as e:
+                if attempt == 1 or not is_connection_error(e):
+                    breaker.record(not is_provider_error(e))
+                    raise
+
+    def close_all(self):
+        """Close every idle connection (called on shutdown)"""
+        with self._cond:
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            for key, conns in self._idle.items():
+                self._open[key] -= len(conns)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._quit(conn.smtp)
+
+    def stats(self) -> Dict[str, dict]:
+        with self._cond:
+            return {
+                f"{host}:{port}/{user}": {
+                    "open": self._open.get((host, port, user), 0),
+                    "idle": len(self._idle.get((host, port, user), [])),
+                }
+                for host, port, user in self._open
+            }
+
+
+smtp_pool = SMTPConnectionPool(
+    max_per_host=settings.SMTP_POOL_MAX_PER_HOST,
+    idle_timeout=settings.SMTP_POOL_IDLE_TIMEOUT_SECONDS,
+    max_messages=settings.SMTP_POOL_MAX_MESSAGES_PER_CONNECTION,
+    timeout=settings.SMTP_TIMEOUT_SECONDS
+)
@@ -0,0 +1,169 @@
+"""
+Suppression List for CareOps
+Remembers who opted out (STOP, unsubscribes) and answers "may we send?" from memory
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import FrozenSet, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+
+CHANNELS = ("email", "sms")
+
+
+def normalize_address(channel: str, address) -> str:
+    """Emails compare case-insensitively; chat ids as trimmed strings"""
+    address = str(address).strip()
+    return address.lower() if channel == "email" else address
+
+
+def _workspace_uuid(workspace_id) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(str(workspace_id))
+    except ValueError:
+        # e.g. the webhook's "demo" service: only global opt-outs apply
+        return None
+
+
+class SuppressionList:
+    """
+    Process-wide cache of opted-out recipients.
+
+    Each workspace maps to a frozenset of (channel, address) pairs that
+    already includes the global (workspace-less) opt-outs, so a pre-send
+    check is one set lookup. A miss loads the workspace in one query.
+    suppress()/unsuppress() refresh the affected sets straight away;
+    other processes pick changes up within `ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        max_size: int = settings.SUPPRESSION_CACHE_SIZE,
+        ttl_seconds: int = settings.SUPPRESSION_CACHE_TTL_SECONDS
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, FrozenSet[Tuple[str, str]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.blocked = 0
+
+    def _load(self, db: Session, workspace_id: Optional[uuid.UUID]) -> FrozenSet[Tuple[str, str]]:
+        scope = models.Suppression.workspace_id.is_(None)
+        if workspace_id is not None:
+            scope = or_(scope, models.Suppression.workspace_id == workspace_id)
+        rows = db.query(models.Suppression.channel, models.Suppression.address).filter(scope).all()
+        return frozenset((channel, address) for channel, address in rows)
+
+    def entries(self, workspace_id, db: Optional[Session] = None) -> FrozenSet[Tuple[str, str]]:
+        """(channel, address) pairs nobody in this workspace may message"""
+        workspace_uuid = _workspace_uuid(workspace_id)
+        key = str(workspace_uuid)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        if db is None:
+            # Callers without a session (batch email engine) only need one on a miss
+            with SessionLocal() as session:
+                suppressed = self._load(session, workspace_uuid)
+        else:
+            suppressed = self._load(db, workspace_uuid)
+
+        with self._lock:
+            self._entries[key] = (now, suppressed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return suppressed
+
+    def is_suppressed(self, workspace_id, channel: str, address, db: Optional[Session] = None) -> bool:
+        """Pre-send check; True means do not contact this recipient"""
+        if not address:
+            return False
+        suppressed = (channel, normalize_address(channel, address)) in self.entries(workspace_id, db)
+        if suppressed:
+            self.blocked += 1
+            print(f"🚫 Not sending {channel} to {address}: recipient opted out")
+        return suppressed
+
+    def invalidate(self, workspace_id=None):
+        """Drop one workspace's set, or every set when a global opt-out changed"""
+        with self._lock:
+            if workspace_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(_workspace_uuid(workspace_id)), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workspaces_cached": len(self._entries), "blocked": self.blocked}
+
+
+suppression_list = SuppressionList()
+
+
+def _scope(query, workspace_id):
+    if workspace_id is None:
+        return query.filter(models.Suppression.workspace_id.is_(None))
+    return query.filter(models.Suppression.workspace_id == workspace_id)
+
+
+def suppress(
+    db: Session,
+    workspace_id,
+    channel: str,
+    address,
+    reason: str = "manual"
+) -> models.Suppression:
+    """
+    Record an opt-out (idempotent) and commit.
+
+    workspace_id=None suppresses the recipient for every workspace.
+    """
+    address = normalize_address(channel, address)
+    query = _scope(db.query(models.Suppression), workspace_id).filter(
+        models.Suppression.channel == channel,
+        models.Suppression.address == address
+    )
+    existing = query.first()
+    if existing:
+        return existing
+
+    row = models.Suppression(workspace_id=workspace_id, channel=channel, address=address, reason=reason)
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Recorded concurrently (e.g. STOP delivered twice)
+        db.rollback()
+        return query.first()
+
+    suppression_list.invalidate(workspace_id)
+    return row
+
+
+def unsuppress(db: Session, workspace_id, channel: str, address) -> bool:
+    """Remove an opt-out and commit; False if there was none"""
+    deleted = _scope(db.query(models.Suppression), workspace_id).filter(
+        models.Suppression.channel == channel,
+        models.Suppression.address == normalize_address(channel, address)
+    ).delete(synchronize_session=False)
+    db.commit()
+
+    if deleted:
+        suppression_list.invalidate(workspace_id)
+    return bool(deleted)
@@ -0,0 +1,419 @@
+"""
+Telegram Send Dispatcher for CareOps
+Paces Bot API sends to Telegram's global and per-chat limits and retries 429s
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import requests
+
+from app.config import settings
+from app.services.delivery_log import delivery_log, elapsed_ms
+from app.services.telegram_http import TelegramHTTPClient, telegram_http
+from app.utils.circuit_breaker import CircuitBreaker, circuit_breakers
+
+
+# Name of the Bot API's breaker in circuit_breakers
+TELEGRAM_BREAKER = "telegram"
+
+
+class TokenBucket:
+    """Classic token bucket; callers hold the dispatcher lock"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+# Bot API limit on sendMessage text; merged messages stay below it
+MAX_MESSAGE_LENGTH = 4096
+MERGED_MESSAGE_SEPARATOR = "\n\n"
+
+
+class _Job:
+    __slots__ = ("bot_token", "payload", "future", "workspace_id", "queued_at", "attempts", "started", "parts")
+
+    def __init__(self, bot_token: str, payload: Dict[str, Any], future: Optional[Future], workspace_id=None):
+        self.bot_token = bot_token
+        self.payload = payload
+        self.future = future
+        self.workspace_id = workspace_id
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+        self.started = False
+        self.parts: Tuple["_Job", ...] = (self,)  # the submitted jobs this send delivers
+
+    @classmethod
+    def merge(cls, parts: List["_Job"]) -> "_Job":
+        """One send carrying the text of several jobs for the same chat"""
+        first = parts[0]
+        text = MERGED_MESSAGE_SEPARATOR.join(part.payload["text"] for part in parts)
+        job = cls(first.bot_token, {**first.payload, "text": text}, None, first.workspace_id)
+        job.queued_at = first.queued_at
+        job.parts = tuple(parts)
+        return job
+
+    def can_absorb(self, other: "_Job", length: int) -> bool:
+        """Could `other` ride along in this job's send, with `length` chars of text so far?"""
+        return (
+            other.bot_token == self.bot_token
+            and other.workspace_id == self.workspace_id
+            and isinstance(other.payload.get("text"), str)
+            and {**other.payload, "text": None} == {**self.payload, "text": None}
+            and length + len(MERGED_MESSAGE_SEPARATOR) + len(other.payload["text"]) <= MAX_MESSAGE_LENGTH
+        )
+
+
+class _ChatQueue:
+    __slots__ = ("jobs", "bucket", "blocked_until", "in_flight", "in_ring")
+
+    def __init__(self, rate: float):
+        self.jobs: Deque[_Job] = deque()
+        self.bucket = TokenBucket(rate, 1)
+        self.blocked_until = 0.0
+        self.in_flight = False
+        self.in_ring = False
+
+
+class TelegramDispatcher:
+    """
+    Queues sendMessage calls and delivers them at Telegram's limits.
+
+    Every chat has its own FIFO queue and token bucket (about 1 msg/s),
+    and a global bucket caps the bot as a whole (about 30 msgs/s). Worker
+    threads take chats round-robin, so one busy chat cannot starve the
+    others, and keep at most one request in flight per chat so messages
+    arrive in order. A 429 puts the job back at the front of its chat
+    queue and pauses that chat for `parameters.retry_after` seconds.
+
+    With a `coalesce_window`, a chat's next message is held that long
+    after it was queued, and messages queued behind it for the same chat
+    (same workspace, same options) go out with it as one message, up to
+    Telegram's 4096-character limit. A confirmation, a form reminder and
+    a staff note fired together cost one send and one unit of rate
+    limit instead of three; `coalesced` counts the sends saved.
+
+    Calls go through the "telegram" circuit breaker: timeouts, connection
+    errors and 5xx answers count against it (429s and 4xx do not, Telegram
+    answered). While it is open, submit() and queued jobs fail at once with
+    {"success": False, "circuit_open": True, ...} instead of each waiting
+    out the HTTP timeout.
+
+    submit() returns a Future that resolves to the same result dict
+    TelegramSMSService has always returned ({"success": ..., ...}).
+    """
+
+    def __init__(
+        self,
+        http: TelegramHTTPClient = telegram_http,
+        global_rate: float = settings.TELEGRAM_GLOBAL_RATE_PER_SECOND,
+        per_chat_rate: float = settings.TELEGRAM_PER_CHAT_RATE_PER_SECOND,
+        workers: int = settings.TELEGRAM_DISPATCH_WORKERS,
+        max_retries: int = settings.TELEGRAM_MAX_RETRIES,
+        coalesce_window: float = settings.NOTIFICATION_COALESCE_WINDOW_SECONDS,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.http = http
+        self.breaker = breaker or circuit_breakers.get(TELEGRAM_BREAKER)
+        self.per_chat_rate = per_chat_rate
+        self.workers = workers
+        self.max_retries = max_retries
+        self.coalesce_window = coalesce_window
+        self._global = TokenBucket(global_rate, 1)
+        self._chats: Dict[str, _ChatQueue] = {}
+        self._ring: Deque[str] = deque()  # chats with queued jobs, in round-robin order
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._closing = False
+        self._generation = 0  # bumped by close() so stragglers exit
+        self._submits = 0
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.coalesced = 0
+
+    # ---------- producer side ----------
+
+    def submit(self, bot_token: str, chat_id: str, payload: Dict[str, Any], workspace_id=None) -> Future:
+        """Queue a sendMessage call; the outcome is also written to the delivery log under workspace_id"""
+        future: Future = Future()
+        chat_id = str(chat_id)
+
+        with self._cond:
+            if self._closing:
+                future.set_result({"success": False, "error": "Telegram dispatcher is shutting down"})
+                return future
+            if not self.breaker.available():
+                result = self._circuit_open_result()
+                self.failed += 1
+                delivery_log.record(workspace_id, "sms", chat_id, "failed", error=result["error"])
+                future.set_result(result)
+                return future
+
+            self._start_workers()
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                chat = self._chats[chat_id] = _ChatQueue(self.per_chat_rate)
+            chat.jobs.append(_Job(bot_token, payload, future, workspace_id))
+            self._enqueue_chat(chat_id, chat)
+
+            self._submits += 1
+            if self._submits % 1000 == 0:
+                self._purge_idle(time.monotonic())
+
+            self._cond.notify()
+
+        return future
+
+    def _enqueue_chat(self, chat_id: str, chat: _ChatQueue):
+        if not chat.in_ring:
+            chat.in_ring = True
+            self._ring.append(chat_id)
+
+    def _purge_idle(self, now: float):
+        """Forget chats with nothing queued whose bucket has refilled"""
+        idle_after = 1 / self.per_chat_rate
+        for chat_id in [
+            chat_id for chat_id, chat in self._chats.items()
+            if not chat.jobs and not chat.in_flight
+            and now - chat.bucket.updated > idle_after and now > chat.blocked_until
+        ]:
+            del self._chats[chat_id]
+
+    # ---------- worker side ----------
+
+    def _start_workers(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, args=(self._generation,), name=f"telegram-send-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_job(self) -> Tuple[Optional[Tuple[str, _ChatQueue, _Job]], Optional[float]]:
+        """Pick the next sendable job round-robin; else how long to wait (None = until notified)"""
+        if not self._ring:
+            return None, None
+
+        now = time.monotonic()
+        global_wait = self._global.wait_time(now)
+        if global_wait > 0:
+            return None, global_wait
+
+        min_wait = None
+        for _ in range(len(self._ring)):
+            if not self._ring:
+                break
+            chat_id = self._ring[0]
+            self._ring.rotate(-1)
+            chat = self._chats[chat_id]
+            if chat.in_flight:
+                continue
+
+            wait = max(chat.blocked_until - now, chat.bucket.wait_time(now), self._hold_time(chat, now))
+            if wait <= 0:
+                job = self._take_job(chat)
+                if not chat.jobs:
+                    self._ring.pop()  # the chat just rotated to the end
+                    chat.in_ring = False
+                if job is None:
+                    continue
+                chat.bucket.take(now)
+                self._global.take(now)
+                chat.in_flight = True
+                return (chat_id, chat, job), 0.0
+
+            min_wait = wait if min_wait is None else min(min_wait, wait)
+
+        return None, min_wait
+
+    def _hold_time(self, chat: _ChatQueue, now: float) -> float:
+        """How much longer the chat's next message waits for others to merge with"""
+        head = chat.jobs[0]
+        if head.started or not self.coalesce_window:
+            return 0.0
+        return head.queued_at + self.coalesce_window - now
+
+    def _take_job(self, chat: _ChatQueue) -> Optional[_Job]:
+        """
+        Pop the chat's next send; None if every caller gave up waiting.
+
+        Callers are marked running here, and with coalescing on the
+        compatible jobs queued behind the first are merged into its send.
+        A 429 retry was merged when first taken and goes out unchanged.
+        """
+        if chat.jobs[0].started:
+            return chat.jobs.popleft()
+
+        parts: List[_Job] = []
+        length = 0
+        while chat.jobs:
+            candidate = chat.jobs[0]
+            if parts and not (self.coalesce_window and parts[0].can_absorb(candidate, length)):
+                break
+            chat.jobs.popleft()
+            if not candidate.future.set_running_or_notify_cancel():
+                continue  # caller gave up waiting before we got to it
+            if parts:
+                length += len(MERGED_MESSAGE_SEPARATOR)
+            length += len(candidate.payload.get("text") or "")
+            parts.append(candidate)
+
+        if not parts:
+            return None
+        job = parts[0] if len(parts) == 1 else _Job.merge(parts)
+        job.started = True
+        self.coalesced += len(parts) - 1
+        return job
+
+    def _run(self, generation: int):
+        while True:
+            with self._cond:
+                while True:
+                    if generation != self._generation or (self._closing and not self._ring):
+                        return
+                    picked, wait = self._next_job()
+                    if picked:
+                        break
+                    self._cond.wait(timeout=wait)
+
+            chat_id, chat, job = picked
+            result, retry_after = self._deliver(job)
+
+            with self._cond:
+                chat.in_flight = False
+                requeue = retry_after is not None and job.attempts < self.max_retries and not self._closing
+                if requeue:
+                    job.attempts += 1
+                    self.rate_limited += 1
+                    chat.blocked_until = time.monotonic() + retry_after
+                    chat.jobs.appendleft(job)
+                    self._enqueue_chat(chat_id, chat)
+                elif result.get("success"):
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                self._cond.notify_all()
+
+            if requeue:
+                print(f"⏳ Telegram 429 for chat {chat_id}, retrying in {retry_after:.0f}s")
+                continue
+
+            message_id = ((result.get("data") or {}).get("result") or {}).get("message_id")
+            for part in job.parts:
+                delivery_log.record(
+                    part.workspace_id, "sms", chat_id, "sent" if result.get("success") else "failed",
+                    latency_ms=elapsed_ms(part.queued_at), provider_message_id=message_id,
+                    error=result.get("error")
+                )
+                part.future.set_result(result)
+
+    def _circuit_open_result(self) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "circuit_open": True,
+            "error": f"Telegram is unavailable (circuit open, retry in {self.breaker.retry_in():.0f}s)"
+        }
+
+    def _deliver(self, job: _Job) -> Tuple[Dict[str, Any], Optional[float]]:
+        """One Bot API call; returns (result, retry_after or None)"""
+        if not self.breaker.allow():
+            return self._circuit_open_result(), None
+        try:
+            response = self.http.post(job.bot_token, "sendMessage", job.payload)
+        except requests.exceptions.RequestException as e:
+            self.breaker.record_failure()
+            return {"success": False, "error": str(e)}, None
+        self.breaker.record(response.status_code < 500)
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+
+        if response.status_code == 429:
+            retry_after = (data.get("parameters") or {}).get("retry_after") \
+                or response.headers.get("Retry-After") or 1
+            error = data.get("description") or "Too Many Requests"
+            return {"success": False, "error": error, "retry_after": float(retry_after)}, float(retry_after)
+
+        if data.get("ok"):
+            return {"success": True, "data": data}, None
+
+        return {"success": False, "error": data.get("description") or f"HTTP {response.status_code}"}, None
+
+    # ---------- reporting / lifecycle ----------
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Queued (not yet sent) messages per chat"""
+        with self._cond:
+            return {chat_id: len(chat.jobs) for chat_id, chat in self._chats.items() if chat.jobs}
+
+    def stats(self, top: int = 10) -> dict:
+        with self._cond:
+            depths = sorted(
+                ((chat_id, len(chat.jobs)) for chat_id, chat in self._chats.items() if chat.jobs),
+                key=lambda item: item[1],
+                reverse=True
+            )
+            now = time.monotonic()
+            return {
+                "queued": sum(depth for _, depth in depths),
+                "in_flight": sum(1 for chat in self._chats.values() if chat.in_flight),
+                "chats_waiting": len(depths),
+                "chats_rate_limited": sum(1 for chat in self._chats.values() if chat.blocked_until > now),
+                "sent": self.sent,
+                "failed": self.failed,
+                "rate_limited": self.rate_limited,
+                "coalesced": self.coalesced,
+                "deepest_chats": [{"chat_id": chat_id, "queued": depth} for chat_id, depth in depths[:top]],
+            }
+
+    def close(self, timeout: float = 10):
+        """Drain for up to `timeout` seconds, then fail whatever is left"""
+        with self._cond:
+            if not self._threads:
+                return
+            self._closing = True
+            threads, self._threads = self._threads, []
+            self._cond.notify_all()
+
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+        with self._cond:
+            self._generation += 1
+            for chat in self._chats.values():
+                while chat.jobs:
+                    for part in chat.jobs.popleft().parts:
+                        if not part.future.done():
+                            part.future.set_result({"success": False, "error": "Telegram dispatcher shut down"})
+                chat.in_ring = False
+            self._ring.clear()
+            self._closing = False
+            self._cond.notify_all()
+
+
+telegram_dispatcher = TelegramDispatcher()
@@ -0,0 +1,65 @@
+"""
+Telegram HTTP Client for CareOps
+One keep-alive connection pool to the Bot API, shared by every TelegramSMSService
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import settings
+
+
+class TelegramHTTPClient:
+    """
+    Pooled requests.Session for Bot API calls.
+
+    Module-level requests.post/get open a new TCP + TLS connection per
+    call. This keeps up to `pool_size` connections alive and reuses them
+    across threads. The session is created lazily and can be closed on
+    shutdown; the next call after close() opens a fresh one.
+    """
+
+    def __init__(
+        self,
+        base_url: str = settings.TELEGRAM_API_BASE_URL,
+        pool_size: int = settings.TELEGRAM_HTTP_POOL_SIZE,
+        connect_timeout: float = settings.TELEGRAM_HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = settings.TELEGRAM_HTTP_TIMEOUT
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+
+    def _get_session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def method_url(self, bot_token: str, method: str) -> str:
+        return f"{self.base_url}/bot{bot_token}/{method}"
+
+    def post(self, bot_token: str, method: str, payload: Dict[str, Any]) -> requests.Response:
+        return self._get_session().post(self.method_url(bot_token, method), json=payload, timeout=self.timeout)
+
+    def get(self, bot_token: str, method: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+        return self._get_session().get(self.method_url(bot_token, method), params=params, timeout=self.timeout)
+
+    def close(self):
+        """Close pooled connections (called on shutdown)"""
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+telegram_http = TelegramHTTPClient()
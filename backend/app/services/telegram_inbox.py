@@ -0,0 +1,160 @@
+"""
+Telegram Inbox for CareOps
+Stores inbound Telegram messages on the sender's conversation, in batches
+"""
+
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.services.channel_identity import TELEGRAM, resolve_external_ids
+from app.utils.batch_writer import BatchWriter
+
+
+class InboundMessage(NamedTuple):
+    """A text message a contact sent to the bot"""
+    chat_id: str
+    text: str
+    sent_at: datetime
+    message_id: Optional[int] = None
+    update_id: Optional[int] = None
+
+
+def _pick_conversations(db: Session, matches: Dict[str, List[Tuple[object, object]]]) -> Dict[str, models.Conversation]:
+    """
+    The conversation each chat's messages belong on.
+
+    When a chat is a contact in several workspaces, its messages go to the
+    conversation that was active most recently, i.e. the workspace the
+    contact is most likely replying to. Contacts without a conversation
+    get a new one.
+    """
+    contact_ids = {contact_id for pairs in matches.values() for _, contact_id in pairs}
+    latest: Dict[object, models.Conversation] = {}
+    rows = db.query(models.Conversation).filter(
+        models.Conversation.contact_id.in_(contact_ids)
+    ).order_by(models.Conversation.last_message_at).all()
+    for conversation in rows:
+        latest[conversation.contact_id] = conversation
+
+    never = datetime.min.replace(tzinfo=timezone.utc)
+    chosen = {}
+    for chat_id, pairs in matches.items():
+        existing = [latest[contact_id] for _, contact_id in pairs if contact_id in latest]
+        if existing:
+            chosen[chat_id] = max(existing, key=lambda c: c.last_message_at or never)
+            continue
+        workspace_id, contact_id = pairs[0]
+        conversation = models.Conversation(
+            id=uuid.uuid4(), workspace_id=workspace_id, contact_id=contact_id, status="open"
+        )
+        db.add(conversation)
+        chosen[chat_id] = conversation
+    return chosen
+
+
+def ingest_messages(db: Session, messages: List[InboundMessage]) -> int:
+    """
+    Store a batch of inbound messages and commit; returns how many were stored.
+
+    The chats are resolved to contacts with one indexed lookup on
+    channel_identities and the messages go in as one multi-row INSERT.
+    Each touched conversation is reopened and its last_message_at moved
+    on. Messages from chats that are not a known contact are skipped.
+    """
+    matches = resolve_external_ids(db, TELEGRAM, (m.chat_id for m in messages))
+    if not matches:
+        return 0
+    conversations = _pick_conversations(db, matches)
+
+    rows = []
+    touched: Dict[object, datetime] = {}
+    for message in messages:
+        conversation = conversations.get(message.chat_id)
+        if conversation is None:
+            continue
+        rows.append({
+            "id": uuid.uuid4(),
+            "conversation_id": conversation.id,
+            "sender_type": "contact",
+            "sender_id": conversation.contact_id,
+            "content": message.text,
+            "channel": "sms",
+            "is_automated": False,
+            "custom_custom_metadata": {
+                "telegram_chat_id": message.chat_id,
+                "telegram_message_id": message.message_id,
+                "telegram_update_id": message.update_id,
+            },
+            "sent_at": message.sent_at,
+        })
+        # Never move last_message_at backwards (staff may have replied since)
+        previous = touched.get(conversation.id, conversation.last_message_at)
+        touched[conversation.id] = max(previous, message.sent_at) if previous else message.sent_at
+
+    if rows:
+        db.flush()  # new conversations first
+        db.execute(insert(models.Message), rows)
+        db.execute(update(models.Conversation), [
+            {"id": conversation_id, "status": "open", "last_message_at": last_message_at}
+            for conversation_id, last_message_at in touched.items()
+        ])
+    db.commit()
+    return len(rows)
+
+
+class TelegramInbox(BatchWriter):
+    """
+    Write-behind buffer between webhook processing and the messages table.
+
+    During a burst the updates pile up in the buffer and are stored
+    `batch_size` at a time, so a thousand inbound messages cost a handful
+    of round trips rather than several per message.
+    """
+
+    name = "telegram-inbox"
+    label = "inbound Telegram messages"
+
+    def __init__(
+        self,
+        batch_size: int = settings.TELEGRAM_INBOX_BATCH_SIZE,
+        flush_interval: float = settings.TELEGRAM_INBOX_FLUSH_INTERVAL_SECONDS,
+        max_buffer: int = settings.TELEGRAM_INBOX_MAX_BUFFER
+    ):
+        super().__init__(batch_size, flush_interval, max_buffer)
+        self.unmatched = 0
+
+    def receive(self, update: dict):
+        """Buffer the text message in a Telegram update (anything else is ignored)"""
+        message = update.get("message") or {}
+        chat_id = (message.get("chat") or {}).get("id")
+        text = message.get("text")
+        if not chat_id or not text:
+            return
+
+        sent_at = (
+            datetime.fromtimestamp(message["date"], timezone.utc)
+            if message.get("date") else datetime.now(timezone.utc)
+        )
+        self.add(InboundMessage(
+            str(chat_id), text, sent_at, message.get("message_id"), update.get("update_id")
+        ))
+
+    def write_batch(self, batch: List[InboundMessage]):
+        with SessionLocal() as db:
+            stored = ingest_messages(db, batch)
+        if stored < len(batch):
+            self.unmatched += len(batch) - stored
+            print(f"⚠️ {len(batch) - stored} inbound Telegram messages from chats with no contact")
+
+    def stats(self) -> dict:
+        return {**super().stats(), "unmatched": self.unmatched}
+
+
+telegram_inbox = TelegramInbox()
@@ -0,0 +1,384 @@
+"""
+Telegram Update Processing for CareOps
+Handles incoming bot updates off the request path, on a small pool of async workers
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from starlette.concurrency import run_in_threadpool
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.services.sms_service import TelegramSMSService
+from app.services.suppression import suppress, unsuppress
+from app.services.telegram_inbox import telegram_inbox
+
+
+START_REPLY = (
+    "👋 Welcome to CareOps SMS Bot!\n\n"
+    "Your Chat ID is: {chat_id}\n\n"
+    "Use this ID in your workspace settings to receive notifications."
+)
+
+HELP_REPLY = (
+    "🤖 CareOps SMS Bot Commands:\n\n"
+    "/start - Get your Chat ID\n"
+    "/help - Show this help message\n"
+    "STOP - Unsubscribe from notifications\n"
+    "START - Subscribe again"
+)
+
+STOP_REPLY = "✅ You've been unsubscribed from notifications."
+
+RESUBSCRIBE_REPLY = "✅ You're subscribed to notifications again."
+
+# Telegram picks the next update_id at random after a week without updates
+MARK_EXPIRES_AFTER_SECONDS = 7 * 24 * 3600
+
+# Telegram stops redelivering an update after 24 hours; older claims are pruned hourly
+CLAIM_RETENTION_SECONDS = 24 * 3600
+CLAIM_PRUNE_INTERVAL_SECONDS = 3600
+
+
+def _log_reply(future: Future):
+    result = future.result()
+    if not result.get("success"):
+        print(f"❌ Telegram reply to {future.chat_id} failed: {result.get('error')}")
+
+
+def process_update(update: Dict[str, Any]):
+    """
+    Act on one Telegram update (blocking; run it off the event loop)
+
+    Replies are queued on the Telegram dispatcher rather than waited for,
+    so a slow Bot API never holds up the next update. Anything that is not
+    a bot command goes to the inbox, to be stored on the contact's
+    conversation.
+    """
+    print(f"📱 Received Telegram webhook update: {update}")
+
+    message = update.get("message") or {}
+    chat_id = (message.get("chat") or {}).get("id")
+    text = message.get("text") or ""
+
+    if not chat_id or not text:
+        return
+
+    command = text.strip().lower()
+    if command not in ("/start", "/help", "stop", "start"):
+        telegram_inbox.receive(update)
+        return
+
+    chat_id = str(chat_id)
+    db = SessionLocal()
+    try:
+        sms_service = TelegramSMSService(workspace_id="demo", db=db)
+
+        def reply(message: str):
+            sms_service._queue_telegram_message(chat_id, message).add_done_callback(_log_reply)
+
+        # The bot is shared by every workspace, so its opt-outs are global
+        if command == "stop":
+            # Confirm first: once suppressed, the chat gets nothing from us
+            reply(STOP_REPLY)
+            suppress(db, None, "sms", chat_id, reason="stop")
+        elif command == "start":
+            unsuppress(db, None, "sms", chat_id)
+            reply(RESUBSCRIBE_REPLY)
+        elif command == "/start":
+            # (Re)starting the bot is an explicit request to hear from it
+            unsuppress(db, None, "sms", chat_id)
+            reply(START_REPLY.format(chat_id=chat_id))
+        else:
+            reply(HELP_REPLY)
+    finally:
+        db.close()
+
+
+def bot_id_from_token(token: str) -> str:
+    """The numeric bot id a token starts with ('default' without a token)"""
+    return token.split(":", 1)[0] if token else "default"
+
+
+class UpdateDeduplicator:
+    """
+    Replay window over Telegram update_ids.
+
+    Telegram numbers a bot's updates in sequence. The deduplicator keeps
+    the highest id accepted (the high-water mark) and a ring of the last
+    `window` ids, indexed by id % window, so accept() is O(1) and does no
+    DB or HTTP work: an id already in its slot is a redelivery, and one
+    at or below mark - window is too old to be new. Ids inside the window
+    that were never accepted (e.g. refused with a 503) still get through,
+    so out-of-order delivery is fine.
+
+    The mark is saved per bot in telegram_bot_state, at most every
+    `persist_interval` seconds, with GREATEST so concurrent processes never
+    move it backwards; each save reads back the shared mark. After a
+    restart, redeliveries older than the window are dropped straight away.
+
+    The ring only knows the updates its own process was sent, so a
+    redelivery that lands on another webhook worker gets through it;
+    claim() settles that across processes in the database before an
+    update is processed.
+    """
+
+    def __init__(
+        self,
+        window: int = settings.TELEGRAM_UPDATE_DEDUP_WINDOW,
+        persist_interval: float = settings.TELEGRAM_UPDATE_MARK_PERSIST_SECONDS,
+        bot_id: Optional[str] = None
+    ):
+        self.window = window
+        self.persist_interval = persist_interval
+        self.bot_id = bot_id or bot_id_from_token(settings.TELEGRAM_BOT_TOKEN)
+        self._slots: List[Optional[int]] = [None] * window
+        self._mark: Optional[int] = None
+        self._saved_mark: Optional[int] = None
+        self._last_update_at = 0.0
+        self._last_persist = 0.0
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.stale = 0
+
+    @property
+    def high_water_mark(self) -> Optional[int]:
+        return self._mark
+
+    def _reset(self):
+        self._slots = [None] * self.window
+        self._mark = None
+
+    def accept(self, update_id: int) -> bool:
+        """Record an update; False if it was seen before (or is older than the window)"""
+        with self._lock:
+            now = time.time()
+            if self._mark is not None and now - self._last_update_at > MARK_EXPIRES_AFTER_SECONDS:
+                self._reset()
+            self._last_update_at = now
+
+            if self._mark is not None and update_id <= self._mark - self.window:
+                self.stale += 1
+                return False
+            slot = update_id % self.window
+            if self._slots[slot] == update_id:
+                self.duplicates += 1
+                return False
+
+            self._slots[slot] = update_id
+            if self._mark is None or update_id > self._mark:
+                self._mark = update_id
+            return True
+
+    def forget(self, update_id: int):
+        """Undo accept() for an update that was not processed, so its redelivery gets through"""
+        with self._lock:
+            slot = update_id % self.window
+            if self._slots[slot] == update_id:
+                self._slots[slot] = None
+
+    def claim(self, update_id: int) -> bool:
+        """
+        Take an update on for this process; False if another process (or an
+        earlier delivery) already has it (blocking; run it off the event loop)
+
+        One INSERT ... ON CONFLICT DO NOTHING into telegram_update_claims. If
+        the claim cannot be made the update is processed anyway, as it would
+        have been without one.
+        """
+        claims = models.TelegramUpdateClaim.__table__
+        stmt = insert(claims).values(bot_id=self.bot_id, update_id=update_id)
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[claims.c.bot_id, claims.c.update_id]
+        ).returning(claims.c.update_id)
+        try:
+            with SessionLocal() as db:
+                claimed = db.execute(stmt).first() is not None
+                db.commit()
+        except Exception as e:
+            print(f"❌ Failed to claim Telegram update {update_id}: {str(e)}")
+            return True
+
+        if not claimed:
+            with self._lock:
+                self.duplicates += 1
+        return claimed
+
+    def load(self):
+        """Start from the saved mark, unless Telegram will have restarted its numbering"""
+        with SessionLocal() as db:
+            state = db.get(models.TelegramBotState, self.bot_id)
+        if state is None or state.updated_at is None:
+            return
+        saved_at = state.updated_at.timestamp()
+        if time.time() - saved_at > MARK_EXPIRES_AFTER_SECONDS:
+            return
+        with self._lock:
+            if self._mark is None or state.last_update_id > self._mark:
+                self._mark = state.last_update_id
+            self._saved_mark = state.last_update_id
+            self._last_update_at = max(self._last_update_at, saved_at)
+
+    def persist_due(self) -> bool:
+        return (
+            self._mark is not None
+            and self._mark != self._saved_mark
+            and time.monotonic() - self._last_persist >= self.persist_interval
+        )
+
+    def persist(self, mark: Optional[int] = None):
+        """
+        Save the mark (never lowering the shared one) and adopt the shared mark.
+
+        `mark` saves a lower id than the highest accepted, for a caller (the
+        poller) that has not finished with every update it accepted.
+        """
+        with self._lock:
+            if mark is None:
+                mark = self._mark
+            self._last_persist = time.monotonic()
+        if mark is None:
+            return
+
+        state = models.TelegramBotState.__table__
+        stmt = insert(state).values(bot_id=self.bot_id, last_update_id=mark)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[state.c.bot_id],
+            set_={
+                "last_update_id": func.greatest(state.c.last_update_id, stmt.excluded.last_update_id),
+                "updated_at": func.now(),
+            }
+        ).returning(state.c.last_update_id)
+        try:
+            with SessionLocal() as db:
+                shared = db.execute(stmt).scalar_one()
+                if time.monotonic() - self._last_prune >= CLAIM_PRUNE_INTERVAL_SECONDS:
+                    self._last_prune = time.monotonic()
+                    claims = models.TelegramUpdateClaim
+                    db.execute(delete(claims).where(
+                        claims.bot_id == self.bot_id,
+                        claims.claimed_at < datetime.now(timezone.utc) - timedelta(seconds=CLAIM_RETENTION_SECONDS)
+                    ))
+                db.commit()
+        except Exception as e:
+            print(f"❌ Failed to save Telegram update mark: {str(e)}")
+            return
+
+        with self._lock:
+            self._saved_mark = shared
+            if self._mark is None or shared > self._mark:
+                self._mark = shared
+
+    def stats(self) -> dict:
+        return {"high_water_mark": self._mark, "duplicates": self.duplicates, "stale": self.stale}
+
+
+update_dedup = UpdateDeduplicator()
+
+
+class TelegramUpdateQueue:
+    """
+    Bounded in-process queue between the webhook endpoint and update processing.
+
+    The webhook only has to put the update on the queue, so Telegram gets
+    its 200 straight away. A few worker tasks take updates off the queue
+    and run process_update in the threadpool. When the queue is full the
+    webhook refuses the update and Telegram delivers it again later.
+    Redelivered updates are acknowledged and dropped before they are
+    queued, or by the worker if another process already claimed them
+    (see UpdateDeduplicator).
+    """
+
+    def __init__(
+        self,
+        max_size: int = settings.TELEGRAM_WEBHOOK_QUEUE_SIZE,
+        workers: int = settings.TELEGRAM_WEBHOOK_WORKERS
+    ):
+        self.max_size = max_size
+        self.workers = workers
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """Create the queue and workers on the running event loop (idempotent)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._work(self._queue)) for _ in range(self.workers)]
+
+    def offer(self, update: Dict[str, Any]) -> bool:
+        """Queue an update without waiting; False if the queue is full"""
+        self.start()
+        update_id = update.get("update_id")
+        if isinstance(update_id, int) and not update_dedup.accept(update_id):
+            # Already queued or processed: acknowledge so Telegram stops resending
+            return True
+        try:
+            self._queue.put_nowait(update)
+            return True
+        except asyncio.QueueFull:
+            if isinstance(update_id, int):
+                update_dedup.forget(update_id)
+            self.rejected += 1
+            return False
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            update = await queue.get()
+            try:
+                update_id = update.get("update_id")
+                if isinstance(update_id, int) and not await run_in_threadpool(update_dedup.claim, update_id):
+                    continue
+                await run_in_threadpool(process_update, update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"❌ Webhook update {update.get('update_id')} failed: {str(e)}")
+            finally:
+                queue.task_done()
+            if update_dedup.persist_due():
+                await run_in_threadpool(update_dedup.persist)
+
+    async def stop(self, timeout: float = 10):
+        """Finish queued updates for up to `timeout` seconds, then stop the workers"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Dropping {self._queue.qsize()} unprocessed Telegram updates on shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await run_in_threadpool(update_dedup.persist)
+        self._tasks = []
+        self._queue = None
+        self._loop = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "workers": len(self._tasks),
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            **update_dedup.stats(),
+        }
+
+
+telegram_update_queue = TelegramUpdateQueue()
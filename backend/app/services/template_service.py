@@ -0,0 +1,333 @@
+"""
+Notification Templates for CareOps
+Loads, compiles and caches the email and Telegram templates, with per-workspace overrides
+"""
+
+import html
+import os
+import threading
+import time
+from collections import OrderedDict
+from string import Formatter
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "notifications")
+
+# Template part -> file suffix. Subjects are plain text; email and Telegram
+# bodies are HTML, so variables rendered into them are escaped.
+PARTS = {
+    "subject": ".subject.txt",
+    "email": ".email.html",
+    "telegram": ".telegram.html",
+}
+
+_WORKSPACE_VARS = {"business_name", "workspace_email", "workspace_phone"}
+_CONTACT_VARS = {"contact_name", "contact_email", "contact_phone"}
+_BOOKING_VARS = {
+    "service_name", "service_duration", "date_full", "date_short",
+    "weekday_date", "time", "location", "notes",
+}
+
+# Variables each template can use; the context builders below provide them
+TEMPLATE_VARIABLES: Dict[str, Set[str]] = {
+    "welcome": _WORKSPACE_VARS | _CONTACT_VARS,
+    "booking_confirmation": _WORKSPACE_VARS | _CONTACT_VARS | _BOOKING_VARS,
+    "booking_reminder": _WORKSPACE_VARS | _CONTACT_VARS | _BOOKING_VARS,
+    "form_reminder": _WORKSPACE_VARS | _CONTACT_VARS | {"form_name"},
+    "low_stock_alert": _WORKSPACE_VARS | {
+        "item_name", "item_quantity", "item_unit", "item_threshold", "item_description",
+    },
+}
+
+
+class TemplateError(ValueError):
+    """Template source that cannot be compiled"""
+
+
+class TemplateNotFound(LookupError):
+    """No template (default or override) for a name/part"""
+
+
+# ============== COMPILER ==============
+# Syntax is str.format's: {variable} substitutes, {{ and }} are literal
+# braces. Optional blocks are written {?variable}...{/variable} and render
+# only when the variable is non-empty.
+
+_VAR = 0
+_SECTION = 1
+
+
+class CompiledTemplate:
+    """A parsed template; render() only walks the node list"""
+
+    __slots__ = ("nodes", "escape", "strip", "variables")
+
+    def __init__(self, nodes: list, escape: bool, strip: bool, variables: Set[str]):
+        self.nodes = nodes
+        self.escape = escape
+        self.strip = strip
+        self.variables = variables
+
+    def _render(self, nodes: list, context: dict, out: List[str]):
+        for node in nodes:
+            if node.__class__ is str:
+                out.append(node)
+            elif node[0] == _VAR:
+                value = context.get(node[1])
+                if value is None:
+                    continue
+                value = format(str(value), node[2]) if node[2] else str(value)
+                out.append(html.escape(value) if self.escape else value)
+            elif context.get(node[1]):
+                self._render(node[2], context, out)
+
+    def render(self, context: dict) -> str:
+        out: List[str] = []
+        self._render(self.nodes, context, out)
+        text = "".join(out)
+        return text.strip() if self.strip else text
+
+
+def compile_template(source: str, part: str) -> CompiledTemplate:
+    """Parse template source for one part ('subject', 'email' or 'telegram')"""
+    if part not in PARTS:
+        raise TemplateError(f"Unknown template part '{part}'")
+
+    root: list = []
+    stack: List[Tuple[Optional[str], list]] = [(None, root)]
+    variables: Set[str] = set()
+
+    try:
+        parsed = list(Formatter().parse(source))
+    except ValueError as e:
+        raise TemplateError(str(e))
+
+    for literal, field, spec, conversion in parsed:
+        nodes = stack[-1][1]
+        if literal:
+            nodes.append(literal)
+        if field is None:
+            continue
+        if conversion:
+            raise TemplateError(f"Conversions are not supported: {{{field}!{conversion}}}")
+
+        if field.startswith("?"):
+            name = field[1:]
+            section: list = []
+            nodes.append((_SECTION, name, section))
+            stack.append((name, section))
+        elif field.startswith("/"):
+            name = field[1:]
+            if stack[-1][0] != name:
+                raise TemplateError(f"Unexpected {{/{name}}}")
+            stack.pop()
+            continue
+        else:
+            name = field
+            if spec:
+                try:
+                    format("", spec)
+                except ValueError as e:
+                    raise TemplateError(f"Invalid format spec in {{{field}:{spec}}}: {str(e)}")
+            nodes.append((_VAR, name, spec))
+
+        if not name.isidentifier():
+            raise TemplateError(f"Invalid variable name '{name}'")
+        variables.add(name)
+
+    if len(stack) > 1:
+        raise TemplateError(f"Unclosed {{?{stack[-1][0]}}}")
+
+    return CompiledTemplate(root, escape=part != "subject", strip=part != "email", variables=variables)
+
+
+def validate_template(name: str, part: str, source: str) -> CompiledTemplate:
+    """Compile an override and check it only uses variables the template provides"""
+    if name not in TEMPLATE_VARIABLES:
+        raise TemplateNotFound(name)
+    template = compile_template(source, part)
+    unknown = template.variables - TEMPLATE_VARIABLES[name]
+    if unknown:
+        raise TemplateError(
+            f"Unknown variables for '{name}': {', '.join(sorted(unknown))}. "
+            f"Available: {', '.join(sorted(TEMPLATE_VARIABLES[name]))}"
+        )
+    return template
+
+
+# ============== LOADER + CACHE ==============
+class TemplateRegistry:
+    """
+    Compiled templates keyed by (workspace, template name).
+
+    Defaults are read from TEMPLATE_DIR and compiled once per process.
+    A workspace's set merges its overrides over the defaults and is kept in
+    an LRU cache. Entries expire after `ttl_seconds`, so an override saved
+    through another process shows up here without a restart. invalidate()
+    drops them immediately in the process that saved the change.
+    """
+
+    def __init__(
+        self,
+        template_dir: str = TEMPLATE_DIR,
+        cache_size: int = settings.TEMPLATE_CACHE_SIZE,
+        ttl_seconds: int = settings.TEMPLATE_CACHE_TTL_SECONDS
+    ):
+        self.template_dir = template_dir
+        self.cache_size = cache_size
+        self.ttl_seconds = ttl_seconds
+        self._defaults: Dict[Tuple[str, str], Optional[CompiledTemplate]] = {}
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def default_source(self, name: str, part: str) -> Optional[str]:
+        """Source of the shipped template, or None if this part has none"""
+        path = os.path.join(self.template_dir, name + PARTS[part])
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def _default(self, name: str, part: str) -> Optional[CompiledTemplate]:
+        key = (name, part)
+        if key not in self._defaults:
+            source = self.default_source(name, part)
+            self._defaults[key] = compile_template(source, part) if source is not None else None
+        return self._defaults[key]
+
+    def _load(self, db: Session, workspace_id, name: str) -> Dict[str, Optional[CompiledTemplate]]:
+        templates = {part: self._default(name, part) for part in PARTS}
+
+        overrides = db.query(models.NotificationTemplate.part, models.NotificationTemplate.body).filter(
+            models.NotificationTemplate.workspace_id == workspace_id,
+            models.NotificationTemplate.name == name
+        ).all()
+
+        for part, body in overrides:
+            try:
+                templates[part] = compile_template(body, part)
+            except TemplateError as e:
+                print(f"⚠️ Ignoring broken {name}/{part} template for workspace {workspace_id}: {str(e)}")
+
+        return templates
+
+    def get(self, db: Session, workspace_id, name: str) -> Dict[str, Optional[CompiledTemplate]]:
+        """Compiled parts of one template for a workspace"""
+        if name not in TEMPLATE_VARIABLES:
+            raise TemplateNotFound(name)
+
+        key = (str(workspace_id), name)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        templates = self._load(db, workspace_id, name)
+
+        with self._lock:
+            self._cache[key] = (now, templates)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return templates
+
+    def render(self, db: Session, workspace_id, name: str, part: str, context: dict) -> str:
+        """Render one part of a template with a prepared context"""
+        template = self.get(db, workspace_id, name).get(part)
+        if template is None:
+            raise TemplateNotFound(f"{name}/{part}")
+        return template.render(context)
+
+    def invalidate(self, workspace_id, name: Optional[str] = None):
+        """Forget cached templates for a workspace (all, or one name)"""
+        workspace_id = str(workspace_id)
+        with self._lock:
+            for key in list(self._cache):
+                if key[0] == workspace_id and (name is None or key[1] == name):
+                    del self._cache[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+template_registry = TemplateRegistry()
+
+
+# ============== CONTEXT ==============
+# Contexts are plain dicts of display strings, built once per notification
+# and shared by the subject, email and Telegram parts.
+
+def workspace_context(workspace: models.Workspace) -> dict:
+    return {
+        "business_name": workspace.business_name,
+        "workspace_email": workspace.contact_email or "",
+        "workspace_phone": workspace.contact_phone or "",
+    }
+
+
+def contact_context(workspace: models.Workspace, contact: models.Contact) -> dict:
+    context = workspace_context(workspace)
+    context.update({
+        "contact_name": contact.name,
+        "contact_email": contact.email or "",
+        "contact_phone": contact.phone or "",
+    })
+    return context
+
+
+def booking_context(
+    workspace: models.Workspace,
+    contact: models.Contact,
+    service: Optional[models.ServiceType],
+    booking: models.Booking
+) -> dict:
+    context = contact_context(workspace, contact)
+    scheduled_at = booking.scheduled_at
+    context.update({
+        "service_name": service.name if service else "N/A",
+        "service_duration": str(service.duration_minutes) if service else "N/A",
+        "date_full": scheduled_at.strftime('%A, %B %d, %Y'),
+        "date_short": scheduled_at.strftime('%B %d, %Y'),
+        "weekday_date": scheduled_at.strftime('%A, %B %d'),
+        "time": scheduled_at.strftime('%I:%M %p'),
+        "location": booking.location or "",
+        "notes": booking.notes or "",
+    })
+    return context
+
+
+def form_context(
+    workspace: models.Workspace,
+    contact: models.Contact,
+    form: Optional[models.PostBookingForm]
+) -> dict:
+    context = contact_context(workspace, contact)
+    context["form_name"] = form.name if form else "intake form"
+    return context
+
+
+def item_context(workspace: models.Workspace, item: models.InventoryItem) -> dict:
+    context = workspace_context(workspace)
+    context.update({
+        "item_name": item.name,
+        "item_quantity": str(item.quantity),
+        "item_unit": item.unit or "",
+        "item_threshold": str(item.low_stock_threshold),
+        "item_description": item.description or "",
+    })
+    return context
@@ -0,0 +1,71 @@
+"""
+Worker Heartbeats for CareOps
+Background workers record that they are alive; the API's /health reports on them
+"""
+
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+
+
+class WorkerHeartbeat:
+    """
+    One row per worker process (hostname:pid), upserted every beat with
+    its status, whether it leads the scheduler and a few counters. Rows
+    of workers gone for a day are deleted by the next beat of any worker.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.started_at = datetime.now(timezone.utc)
+
+    def beat(self, status: str = "running", is_leader: bool = False, stats: Optional[dict] = None):
+        heartbeats = models.WorkerHeartbeat.__table__
+        values = {"status": status, "is_leader": is_leader, "stats": stats, "last_seen_at": func.now()}
+        stmt = insert(heartbeats).values(id=self.worker_id, started_at=self.started_at, **values)
+        stmt = stmt.on_conflict_do_update(index_elements=[heartbeats.c.id], set_=values)
+        try:
+            with SessionLocal() as db:
+                db.execute(stmt)
+                db.query(models.WorkerHeartbeat).filter(
+                    models.WorkerHeartbeat.last_seen_at < func.now() - timedelta(days=1)
+                ).delete(synchronize_session=False)
+                db.commit()
+        except Exception as e:
+            print(f"❌ Failed to record worker heartbeat: {str(e)}")
+
+
+def worker_health(db: Session) -> dict:
+    """Workers seen within WORKER_HEARTBEAT_STALE_SECONDS, and whether one of them runs the scheduler"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.WORKER_HEARTBEAT_STALE_SECONDS)
+    workers = db.query(models.WorkerHeartbeat).filter(
+        models.WorkerHeartbeat.last_seen_at >= cutoff,
+        models.WorkerHeartbeat.status != "stopped"
+    ).order_by(models.WorkerHeartbeat.started_at).all()
+    last_seen = db.query(func.max(models.WorkerHeartbeat.last_seen_at)).scalar()
+
+    return {
+        "alive": len(workers),
+        "scheduler_leader": next((w.id for w in workers if w.is_leader), None),
+        "last_heartbeat": last_seen.isoformat() if last_seen else None,
+        "workers": [
+            {
+                "id": w.id,
+                "status": w.status,
+                "leader": w.is_leader,
+                "started_at": w.started_at.isoformat(),
+                "last_seen_at": w.last_seen_at.isoformat(),
+                "stats": w.stats,
+            }
+            for w in workers
+        ],
+    }
@@ -0,0 +1,208 @@
+"""
+Telegram Long-Polling Worker for CareOps
+Run with: python -m app.telegram_poller (instead of a webhook, e.g. without a public URL)
+"""
+
+import signal
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+import requests
+
+from app.config import settings
+from app.database import Base, engine
+from app.services.delivery_log import delivery_log
+from app.services.telegram_dispatcher import telegram_dispatcher
+from app.services.telegram_http import TelegramHTTPClient, telegram_http
+from app.services.telegram_inbox import telegram_inbox
+from app.services.telegram_updates import process_update, update_dedup
+
+
+class TelegramPoller:
+    """
+    Pulls updates with getUpdates and runs them through process_update,
+    the same pipeline the webhook workers use.
+
+    Each call long-polls for up to `poll_timeout` seconds and returns at
+    most `limit` updates. A batch is processed on `workers` threads, one
+    chat per task so a chat's updates keep their order. The offset is
+    only moved past updates that are done, their messages stored included:
+    Telegram drops updates below the offset of the next call, and the
+    offset is saved as the bot's update mark, so a crash mid-batch or a
+    failed update means it is fetched again (at-least-once) rather than
+    lost. An update that fails `max_attempts` times is skipped so it
+    cannot hold up the bot for good. Telegram serves one getUpdates
+    consumer per bot, so unlike the webhook workers the poller needs no
+    claims across processes: the saved offset is the shared record.
+    """
+
+    def __init__(
+        self,
+        bot_token: str = settings.TELEGRAM_BOT_TOKEN,
+        poll_timeout: int = settings.TELEGRAM_POLL_TIMEOUT_SECONDS,
+        limit: int = settings.TELEGRAM_POLL_LIMIT,
+        workers: int = settings.TELEGRAM_WEBHOOK_WORKERS,
+        max_attempts: int = settings.TELEGRAM_POLL_MAX_ATTEMPTS,
+        http: Optional[TelegramHTTPClient] = None
+    ):
+        self.bot_token = bot_token
+        self.poll_timeout = poll_timeout
+        self.limit = limit
+        self.workers = workers
+        self.max_attempts = max_attempts
+        # Its own connection: a long poll must not hold one the senders need
+        self.http = http or TelegramHTTPClient(
+            base_url=telegram_http.base_url, pool_size=1, read_timeout=poll_timeout + 10
+        )
+        self.offset: Optional[int] = None
+        self._attempts: Dict[int, int] = {}  # update_id -> failed tries, for updates fetched again
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def fetch(self) -> List[Dict[str, Any]]:
+        """One getUpdates call; confirms everything below self.offset"""
+        payload = {"timeout": self.poll_timeout, "limit": self.limit, "allowed_updates": ["message"]}
+        if self.offset is not None:
+            payload["offset"] = self.offset
+        response = self.http.post(self.bot_token, "getUpdates", payload)
+        if response.status_code == 409:
+            raise RuntimeError("a webhook is set for this bot; remove it (deleteWebhook) to use polling")
+        result = response.json()
+        if not result.get("ok"):
+            raise RuntimeError(result.get("description") or f"HTTP {response.status_code}")
+        return result["result"]
+
+    @staticmethod
+    def _process_chat(updates: List[Dict[str, Any]]) -> Set[int]:
+        """
+        Process one chat's updates in order; returns the ids of those not
+        done: the first that failed and, to keep the chat's order, the rest
+        """
+        for i, update in enumerate(updates):
+            try:
+                process_update(update)
+            except Exception as e:
+                print(f"❌ Telegram update {update.get('update_id')} failed: {str(e)}")
+                return {later["update_id"] for later in updates[i:]}
+        return set()
+
+    def process(self, updates: List[Dict[str, Any]], executor: ThreadPoolExecutor) -> Set[int]:
+        """Process a batch and wait for all of it; returns the ids of the updates not done"""
+        by_chat = defaultdict(list)
+        for update in updates:
+            if update_dedup.accept(update["update_id"]):
+                chat_id = ((update.get("message") or {}).get("chat") or {}).get("id")
+                by_chat[chat_id].append(update)
+        futures = [executor.submit(self._process_chat, chat_updates) for chat_updates in by_chat.values()]
+        results = [future.result() for future in futures]
+        not_done = set().union(*results)
+        self.processed += sum(len(chat_updates) for chat_updates in by_chat.values()) - len(not_done)
+        self.failed += sum(1 for result in results if result)
+        return not_done
+
+    def commit(self, updates: List[Dict[str, Any]], not_done: Set[int], inbox_failures: int) -> bool:
+        """
+        Move the offset past the done part of a batch and save it; returns
+        whether the whole batch was committed.
+
+        The offset stops at the first update not done, which is fetched
+        again along with the ones after it, unless it has now failed
+        `max_attempts` times. Nothing is committed if the inbox lost a batch
+        of messages since `inbox_failures` (its count before processing).
+        Updates to be fetched again are forgotten by the deduplicator so
+        they get through; the ones already done are still turned away.
+        """
+        update_ids = sorted(update["update_id"] for update in updates)
+
+        # Inbound messages are only processed once they are stored
+        if not telegram_inbox.flush() or telegram_inbox.failures != inbox_failures:
+            print(f"❌ Messages in Telegram updates {update_ids[0]}-{update_ids[-1]} were not stored")
+            for update_id in update_ids:
+                update_dedup.forget(update_id)
+            return False
+
+        offset = update_ids[-1] + 1
+        for update_id in update_ids:
+            if update_id not in not_done:
+                continue
+            attempts = self._attempts.pop(update_id, 0) + 1
+            if attempts < self.max_attempts:
+                self._attempts[update_id] = attempts
+                offset = update_id
+                break
+            self.skipped += 1
+            print(f"❌ Skipping Telegram update {update_id} after {attempts} failed attempts")
+
+        for update_id in not_done:
+            if update_id >= offset:
+                update_dedup.forget(update_id)
+        self.offset = offset
+        update_dedup.persist(offset - 1)
+        return offset > update_ids[-1]
+
+    def run_forever(self, stop_event: threading.Event):
+        update_dedup.load()
+        if update_dedup.high_water_mark is not None:
+            self.offset = update_dedup.high_water_mark + 1
+        print(f"📡 Polling Telegram for updates (offset {self.offset})")
+
+        backoff = retry = 1
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="telegram-poller") as executor:
+            while not stop_event.is_set():
+                try:
+                    updates = self.fetch()
+                except (requests.exceptions.RequestException, RuntimeError, ValueError) as e:
+                    print(f"❌ getUpdates failed: {str(e)}; retrying in {backoff}s")
+                    stop_event.wait(backoff)
+                    backoff = min(backoff * 2, 60)
+                    continue
+                backoff = 1
+
+                if updates:
+                    inbox_failures = telegram_inbox.failures
+                    not_done = self.process(updates, executor)
+                    if not self.commit(updates, not_done, inbox_failures):
+                        print(f"⚠️ Fetching the uncommitted Telegram updates again in {retry}s")
+                        stop_event.wait(retry)
+                        retry = min(retry * 2, 60)
+                        continue
+                retry = 1
+
+        print(f"🛑 Telegram poller stopped after {self.processed} updates "
+              f"({self.failed} failed, {self.skipped} skipped)")
+
+    def close(self):
+        self.http.close()
+
+
+def main():
+    if not settings.TELEGRAM_BOT_TOKEN:
+        raise SystemExit("TELEGRAM_BOT_TOKEN is not set")
+
+    Base.metadata.create_all(bind=engine)
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        print(f"🛑 Received signal {signum}, finishing current batch...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    poller = TelegramPoller()
+    try:
+        poller.run_forever(stop_event)
+    finally:
+        poller.close()
+        telegram_inbox.close()
+        telegram_dispatcher.close()
+        telegram_http.close()
+        delivery_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Write-behind batching for CareOps
+Buffers rows in memory and writes them from a background thread in batches
+"""
+
+import threading
+from collections import deque
+from typing import Any, Deque, List, Optional
+
+
+class BatchWriter:
+    """
+    Base class for write-behind buffers.
+
+    add() only appends to an in-memory buffer; a background thread hands
+    the buffer to write_batch() every `flush_interval` seconds, or as soon
+    as `batch_size` items are waiting, so callers never wait on the
+    database. If a batch fails it is dropped (and counted) rather than
+    retried, and the buffer never holds more than `max_buffer` items.
+    flush() reports whether everything up to that point was written, for
+    callers that must not move on past a lost batch. Subclasses implement
+    write_batch().
+    """
+
+    name = "batch-writer"  # background thread name
+    label = "records"      # what the error message calls a batch's items
+
+    def __init__(self, batch_size: int, flush_interval: float, max_buffer: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: Deque[Any] = deque(maxlen=max_buffer)
+        lock = threading.Lock()
+        self._cond = threading.Condition(lock)  # items waiting (wakes the background thread)
+        self._idle = threading.Condition(lock)  # a background batch finished (wakes flush())
+        self._in_flight = 0
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0  # batches that could not be written
+
+    def write_batch(self, batch: List[Any]):
+        raise NotImplementedError
+
+    def add(self, item: Any):
+        """Buffer one item; never blocks on the database"""
+        with self._cond:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(item)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def _take_batch(self) -> List[Any]:
+        count = min(len(self._buffer), self.batch_size)
+        return [self._buffer.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if len(self._buffer) < self.batch_size and not self._closing:
+                    self._cond.wait(timeout=self.flush_interval)
+                if self._closing:
+                    return
+                batch = self._take_batch()
+                if batch:
+                    self._in_flight += 1
+            if batch:
+                self._write(batch)
+                with self._idle:
+                    self._in_flight -= 1
+                    self._idle.notify_all()
+
+    def _write(self, batch: List[Any]) -> bool:
+        try:
+            self.write_batch(batch)
+            self.written += len(batch)
+            return True
+        except Exception as e:
+            self.dropped += len(batch)
+            self.failures += 1
+            print(f"❌ Failed to write {len(batch)} {self.label}: {str(e)}")
+            return False
+
+    def flush(self) -> bool:
+        """
+        Write everything buffered so far from the calling thread and wait for
+        the batch the background thread is writing, if any; returns False if
+        a batch failed in the meantime
+        """
+        failures = self.failures
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch:
+                break
+            self._write(batch)
+        with self._idle:
+            while self._in_flight:
+                self._idle.wait()
+        return self.failures == failures
+
+    def close(self):
+        """Stop the background thread and write what is left"""
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._closing = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+        self.flush()
+        with self._cond:
+            self._closing = False
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "buffered": len(self._buffer),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed_batches": self.failures,
+            }
@@ -0,0 +1,212 @@
+"""
+Circuit breakers for CareOps
+Stop calling a provider (Telegram, an SMTP host) that keeps failing, and fail fast until it recovers
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List
+
+from app.config import settings
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker driven by the error rate.
+
+    - closed: calls go through and their outcomes are counted in one-second
+      buckets over the last `window_seconds`; once at least `min_calls`
+      were made and `failure_rate` of them failed, the breaker opens
+    - open: calls fail fast for `open_seconds`
+    - half-open: up to `half_open_calls` trial calls go through; if they all
+      succeed the breaker closes, and any failure opens it again
+
+    Callers ask allow() (or check()) before calling the provider and then
+    report the outcome with record(). Only provider failures should count:
+    a timeout or a 5xx is one, a rejected recipient is not.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = settings.CIRCUIT_BREAKER_FAILURE_RATE,
+        min_calls: int = settings.CIRCUIT_BREAKER_MIN_CALLS,
+        window_seconds: int = settings.CIRCUIT_BREAKER_WINDOW_SECONDS,
+        open_seconds: float = settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+        half_open_calls: int = settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self._buckets: Deque[List[int]] = deque()  # [second, calls, failures]
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0  # half-open calls let through
+        self._trial_successes = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    # ---------- state ----------
+
+    def _current_state(self, now: float) -> str:
+        """The state, moving open -> half-open once open_seconds have passed; call with the lock held"""
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._trials = 0
+            self._trial_successes = 0
+        return self._state
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._buckets.clear()
+        self.times_opened += 1
+        print(f"🔌 Circuit breaker '{self.name}' opened; failing fast for {self.open_seconds:g}s")
+
+    def _close(self):
+        self._state = CLOSED
+        self._buckets.clear()
+        print(f"✅ Circuit breaker '{self.name}' closed; provider recovered")
+
+    def _window_totals(self, now: float):
+        horizon = int(now) - self.window_seconds
+        while self._buckets and self._buckets[0][0] <= horizon:
+            self._buckets.popleft()
+        return sum(b[1] for b in self._buckets), sum(b[2] for b in self._buckets)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a trial call through (0 if not open)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._current_state(now) != OPEN:
+                return 0.0
+            return self._opened_at + self.open_seconds - now
+
+    # ---------- calls ----------
+
+    def available(self) -> bool:
+        """False while open; unlike allow() this does not use up a half-open trial"""
+        with self._lock:
+            return self._current_state(time.monotonic()) != OPEN
+
+    def allow(self) -> bool:
+        """May a call go to the provider now? A True must be followed by record()"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN:
+                if self._trials >= self.half_open_calls and now - self._opened_at >= 2 * self.open_seconds:
+                    self._trials = self._trial_successes  # trials never reported back count as lost
+                if self._trials < self.half_open_calls:
+                    self._trials += 1
+                    return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        """allow(), raising CircuitOpenError when the call may not go through"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def record(self, success: bool):
+        """Report the outcome of a call allow() let through"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+
+            if state == HALF_OPEN:
+                if not success:
+                    self._open(now)
+                    return
+                self._trial_successes += 1
+                if self._trial_successes >= self.half_open_calls:
+                    self._close()
+                return
+
+            if state == OPEN:
+                return  # a call that started before the breaker opened
+
+            second = int(now)
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0])
+            self._buckets[-1][1] += 1
+            if not success:
+                self._buckets[-1][2] += 1
+                calls, failures = self._window_totals(now)
+                if calls >= self.min_calls and failures >= self.failure_rate * calls:
+                    self._open(now)
+
+    def cancel(self):
+        """Hand back a call allow() let through that never reached the provider"""
+        with self._lock:
+            if self._current_state(time.monotonic()) == HALF_OPEN and self._trials > self._trial_successes:
+                self._trials -= 1
+
+    def record_success(self):
+        self.record(True)
+
+    def record_failure(self):
+        self.record(False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            calls, failures = self._window_totals(now)
+            return {
+                "state": state,
+                "calls": calls,
+                "failures": failures,
+                "retry_in": round(self._opened_at + self.open_seconds - now, 1) if state == OPEN else 0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class CircuitBreakerRegistry:
+    """One breaker per provider name, created on first use with the default settings"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name))
+        return breaker
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            breakers = sorted(self._breakers.items())
+        return {name: breaker.stats() for name, breaker in breakers}
+
+
+circuit_breakers = CircuitBreakerRegistry()
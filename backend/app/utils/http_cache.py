@@ -0,0 +1,88 @@
+"""
+HTTP caching helpers for CareOps public catalog endpoints
+Cache-Control / ETag / Last-Modified derived from a per-workspace catalog version
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import models
+
+
+def bump_catalog_version(workspace: models.Workspace):
+    """Invalidate cached public catalog responses for the workspace (applied on flush)"""
+    workspace.catalog_version = models.Workspace.catalog_version + 1
+
+
+def catalog_etag(workspace: models.Workspace, route: str) -> str:
+    return f'W/"{workspace.id}-{route}-{workspace.catalog_version or 0}"'
+
+
+def cache_control(s_maxage: int, stale_while_revalidate: int) -> str:
+    # Browsers revalidate every time (cheap 304s); shared caches/CDNs hold
+    # the response for s-maxage and may serve it stale while refetching
+    return (
+        f"public, max-age=0, s-maxage={s_maxage}, "
+        f"stale-while-revalidate={stale_while_revalidate}"
+    )
+
+
+def _last_modified(workspace: models.Workspace) -> Optional[datetime]:
+    modified = workspace.updated_at or workspace.created_at
+    if modified is None:
+        return None
+    if modified.tzinfo is None:
+        modified = modified.replace(tzinfo=timezone.utc)
+    return modified.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def cached_catalog_response(
+    request: Request,
+    workspace: models.Workspace,
+    route: str,
+    s_maxage: int,
+    stale_while_revalidate: int,
+    build: Callable[[], Any]
+) -> Response:
+    """
+    Serve a public catalog payload with validators.
+
+    `build` is only called when the client's copy is stale, so a
+    revalidation costs the workspace lookup and nothing else.
+    """
+    etag = catalog_etag(workspace, route)
+    last_modified = _last_modified(workspace)
+
+    headers = {
+        "Cache-Control": cache_control(s_maxage, stale_while_revalidate),
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    return JSONResponse(content=jsonable_encoder(build()), headers=headers)
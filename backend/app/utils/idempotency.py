@@ -0,0 +1,167 @@
+"""
+Idempotency-Key support for CareOps public POST endpoints
+Replays stored responses for retried requests and coalesces concurrent duplicates
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+# Client errors that replaying is right for: the same request fails the same way
+# (an overlapping booking). Others, such as a 404 for a workspace that is not
+# active yet, may pass on a retry.
+STORED_ERROR_STATUSES = (409,)
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Stable hash of a request payload, used to detect key reuse"""
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class _Entry:
+    """One idempotency key: in flight until `done` is set"""
+
+    __slots__ = ("fingerprint", "done", "result", "error", "released", "expires_at")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[HTTPException] = None
+        self.released = False
+        self.expires_at: Optional[float] = None
+
+    def replay(self):
+        if self.error is not None:
+            raise HTTPException(status_code=self.error.status_code, detail=self.error.detail)
+        return self.result
+
+
+class IdempotencyStore:
+    """
+    In-process idempotency store with TTL expiry and a size cap.
+
+    The first request for a key runs the handler; duplicates that arrive
+    while it is running wait for its result instead of racing it, and
+    later retries get the stored response without running the handler.
+    Conflicts (409) are stored and replayed too; other errors release the
+    key so the client can retry.
+    """
+
+    def __init__(self, ttl_seconds: int, max_keys: int, wait_timeout: float = 30.0):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self.wait_timeout = wait_timeout
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        """Drop expired keys, then the oldest finished keys above the cap"""
+        # Finished keys are kept in expiry order; in-flight ones (no expiry yet)
+        # are skipped so a slow handler doesn't hold back the expired keys behind it
+        expired = []
+        for key, entry in self._entries.items():
+            if entry.expires_at is None:
+                continue
+            if entry.expires_at > now:
+                break
+            expired.append(key)
+        for key in expired:
+            del self._entries[key]
+
+        if len(self._entries) > self.max_keys:
+            for key in list(self._entries):
+                if len(self._entries) <= self.max_keys:
+                    break
+                if self._entries[key].done.is_set():
+                    del self._entries[key]
+
+    def _claim(self, key: str, fingerprint: str):
+        """Return (entry, is_owner) for the key"""
+        with self._lock:
+            now = time.monotonic()
+            self._evict(now)
+
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                entry = _Entry(fingerprint)
+                self._entries[key] = entry
+                return entry, True
+
+            return entry, False
+
+    def _finish(self, key: str, entry: _Entry, release: bool = False):
+        with self._lock:
+            if release:
+                entry.released = True
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            else:
+                entry.expires_at = time.monotonic() + self.ttl_seconds
+                # Keep the dict ordered by expiry for cheap eviction
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+        entry.done.set()
+
+    def run(self, key: Optional[str], fingerprint: str, handler: Callable[[], Any]):
+        """Run `handler` once per key, replaying its result for duplicates"""
+        if not key:
+            return handler()
+
+        while True:
+            entry, is_owner = self._claim(key, fingerprint)
+            if is_owner:
+                break
+
+            if entry.fingerprint != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used with a different request"
+                )
+
+            if not entry.done.wait(self.wait_timeout):
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is still in progress"
+                )
+
+            if entry.released:
+                # The original attempt failed; let this one take over
+                continue
+
+            return entry.replay()
+
+        try:
+            result = handler()
+        except HTTPException as e:
+            if e.status_code in STORED_ERROR_STATUSES:
+                entry.error = e
+                self._finish(key, entry)
+            else:
+                self._finish(key, entry, release=True)
+            raise
+        except BaseException:
+            self._finish(key, entry, release=True)
+            raise
+
+        entry.result = result
+        self._finish(key, entry)
+        return result
+
+
+idempotency_store = IdempotencyStore(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+    max_keys=settings.IDEMPOTENCY_MAX_KEYS
+)
@@ -0,0 +1,142 @@
+"""
+Rate limiting for CareOps public endpoints
+Sliding-window limiter keyed by client IP and workspace slug
+"""
+
+import importlib
+import math
+import threading
+import time
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.config import settings
+
+
+class RateLimitBackend:
+    """
+    Storage interface for the limiter.
+
+    Shared backends for multi-worker deployments (Redis, memcached, ...)
+    implement `hit` and are selected with RATE_LIMIT_BACKEND set to
+    "package.module:ClassName"; the class is constructed without arguments.
+    """
+
+    def hit(self, key: str, limit: int, window_seconds: int) -> Tuple[bool, float]:
+        """Record one request; return (allowed, retry_after_seconds)"""
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Per-process sliding-window counter.
+
+    Each key holds only (window_index, current, previous, window): the
+    previous window's count is weighted by how much of it still overlaps
+    the sliding window, which approximates a true sliding log in O(1)
+    memory per key.
+    """
+
+    PURGE_EVERY = 1000  # hits between sweeps of idle keys
+
+    def __init__(self):
+        self._counters: Dict[str, Tuple[int, int, int, int]] = {}
+        self._lock = threading.Lock()
+        self._hits_since_purge = 0
+
+    def _purge(self, now: float):
+        stale = [
+            key for key, (index, _, _, window) in self._counters.items()
+            if now // window - index >= 2
+        ]
+        for key in stale:
+            del self._counters[key]
+
+    def hit(self, key: str, limit: int, window_seconds: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        window_index = int(now // window_seconds)
+        elapsed_fraction = now / window_seconds - window_index
+
+        with self._lock:
+            self._hits_since_purge += 1
+            if self._hits_since_purge >= self.PURGE_EVERY:
+                self._hits_since_purge = 0
+                self._purge(now)
+
+            index, current, previous, _ = self._counters.get(
+                key, (window_index, 0, 0, window_seconds)
+            )
+            if index != window_index:
+                # Rolled into a new window; the old current becomes previous
+                # only if it was the immediately preceding window
+                previous = current if window_index - index == 1 else 0
+                current = 0
+                index = window_index
+
+            estimated = previous * (1 - elapsed_fraction) + current
+
+            if estimated + 1 > limit:
+                self._counters[key] = (index, current, previous, window_seconds)
+                remaining = (1 - elapsed_fraction) * window_seconds
+                if previous:
+                    # Time until the weighted previous window decays enough
+                    needed = (estimated + 1 - limit) / previous * window_seconds
+                    retry_after = min(needed, remaining)
+                else:
+                    retry_after = remaining
+                return False, max(retry_after, 0.0)
+
+            self._counters[key] = (index, current + 1, previous, window_seconds)
+            return True, 0.0
+
+
+def _load_backend(spec: str) -> RateLimitBackend:
+    if spec == "memory":
+        return InMemoryRateLimitBackend()
+
+    module_name, _, class_name = spec.partition(":")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    return backend_class()
+
+
+rate_limit_backend = _load_backend(settings.RATE_LIMIT_BACKEND)
+
+
+def client_ip(request: Request) -> str:
+    """Client address, looking through RATE_LIMIT_TRUSTED_PROXY_HOPS proxies"""
+    hops = settings.RATE_LIMIT_TRUSTED_PROXY_HOPS
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if hops > 0 and forwarded_for:
+        # Each trusted proxy appends the address it saw, so the client is
+        # `hops` entries from the right; anything further left is spoofable
+        addresses = [address.strip() for address in forwarded_for.split(",")]
+        if len(addresses) >= hops:
+            return addresses[-hops]
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit(route: str, limit: int, window_seconds: int):
+    """
+    Build a route dependency that sheds requests over `limit` per window.
+
+    Use it in the route decorator's `dependencies=[...]` so it runs before
+    any other dependency and before the handler touches the database.
+    """
+
+    def dependency(request: Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        slug = request.path_params.get("slug", "")
+        key = f"{route}:{slug}:{client_ip(request)}"
+        allowed, retry_after = rate_limit_backend.hit(key, limit, window_seconds)
+
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please try again later",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+            )
+
+    return dependency
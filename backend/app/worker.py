@@ -0,0 +1,68 @@
+"""
+Background Worker for CareOps
+Run with: python -m app.worker (scheduled jobs and the notification outbox, outside the API processes)
+"""
+
+import signal
+import threading
+
+from app.config import settings
+from app.database import Base, engine
+from app.scheduler import start_scheduler, stop_scheduler
+from app.services.leader_election import scheduler_leader
+from app.services.outbox_service import get_outbox_dispatcher
+from app.services.smtp_pool import smtp_pool
+from app.services.telegram_dispatcher import telegram_dispatcher
+from app.services.worker_heartbeat import WorkerHeartbeat
+from app.utils.circuit_breaker import circuit_breakers
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        print(f"🛑 Received signal {signum}, draining...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    heartbeat = WorkerHeartbeat()
+    outbox = get_outbox_dispatcher()
+
+    def beat(status: str = "running"):
+        telegram = telegram_dispatcher.stats(top=0)
+        telegram.pop("deepest_chats")
+        heartbeat.beat(status, scheduler_leader.is_leader, {
+            "outbox": outbox.stats(),
+            "telegram": telegram,
+            "circuit_breakers": circuit_breakers.stats(),
+            "smtp_pool": smtp_pool.stats(),
+        })
+
+    # The outbox is drained continuously here rather than on the scheduler's poll interval
+    start_scheduler(dispatch_outbox=False)
+    outbox_thread = threading.Thread(target=outbox.run_forever, args=(stop_event,), name="outbox-dispatcher")
+    outbox_thread.start()
+    print(f"⚙️ Worker {heartbeat.worker_id} started")
+
+    try:
+        beat()
+        while not stop_event.wait(settings.WORKER_HEARTBEAT_SECONDS):
+            beat()
+    finally:
+        # Drain: the outbox finishes its batch, the scheduler its running jobs
+        # (then leadership passes on) and queued Telegram sends go out
+        stop_event.set()
+        beat("draining")
+        outbox_thread.join()
+        stop_scheduler()
+        smtp_pool.close_all()
+        beat("stopped")
+        print("👋 Worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Booking Reminder Benchmark for CareOps
+Queries and wall time of a reminder run: per-booking lookups and commits vs. the batched pipeline
+
+Needs a reachable DATABASE_URL; it creates throwaway workspaces with one contact
+(with a Telegram chat) per booking, all due tomorrow, and deletes them at the end.
+Email and Telegram run in demo mode, so the numbers are the database work alone:
+
+    cd backend && python tests/bench_booking_reminders.py --bookings 10000 --workspaces 20
+"""
+
+import sys
+import os
+import contextlib
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ["SMTP_USER"] = ""  # demo mode: nothing leaves the machine
+os.environ["SMTP_PASSWORD"] = ""
+os.environ["TELEGRAM_BOT_TOKEN"] = ""
+os.environ["DELIVERY_LOG_ENABLED"] = "false"  # its background writes would skew the query count
+
+from sqlalchemy import event, insert
+
+from app import models
+from app.database import Base, SessionLocal, engine
+from app.services.automation_service import get_automation_service
+from app.services.channel_config import channel_config_cache
+from app.services.channel_identity import TELEGRAM
+from app.services.email_service import get_email_service
+from app.services.sms_service import get_sms_service
+from app.services.notification_context import booking_notification_context
+from app.services.suppression import suppression_list
+from app.services.template_service import template_registry
+
+
+class QueryCounter:
+    """Counts statements sent to the database while active"""
+
+    def __init__(self):
+        self.count = 0
+        self.active = False
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        if self.active:
+            self.count += 1
+
+    @contextlib.contextmanager
+    def measure(self):
+        self.count = 0
+        self.active = True
+        try:
+            yield
+        finally:
+            self.active = False
+
+
+def create_workspaces(bookings: int, workspaces: int):
+    """Workspaces with one service each and `bookings` due bookings spread across them"""
+    Base.metadata.create_all(bind=engine)
+    scheduled_at = datetime.now(timezone.utc) + timedelta(days=1, hours=2)
+    db = SessionLocal()
+    try:
+        workspace_ids, contacts, identities, rows = [], [], [], []
+        for w in range(workspaces):
+            workspace = models.Workspace(slug=f"bench-{uuid.uuid4().hex[:12]}", business_name=f"Reminder Bench {w}")
+            db.add(workspace)
+            db.flush()
+            service = models.ServiceType(workspace_id=workspace.id, name="Consultation", duration_minutes=60)
+            db.add(service)
+            db.flush()
+            workspace_ids.append(workspace.id)
+
+            for i in range(w, bookings, workspaces):
+                contact_id = uuid.uuid4()
+                contacts.append({
+                    "id": contact_id, "workspace_id": workspace.id, "name": f"Client {i}",
+                    "email": f"client{i}@example.com", "phone": f"telegram:{200_000_000 + i}",
+                })
+                identities.append({
+                    "workspace_id": workspace.id, "contact_id": contact_id,
+                    "channel": TELEGRAM, "external_id": str(200_000_000 + i),
+                })
+                rows.append({
+                    "id": uuid.uuid4(), "workspace_id": workspace.id, "contact_id": contact_id,
+                    "service_type_id": service.id, "scheduled_at": scheduled_at,
+                    "end_time": scheduled_at + timedelta(hours=1), "status": "pending", "reminder_sent": False,
+                })
+
+        db.execute(insert(models.Contact), contacts)
+        db.execute(insert(models.ChannelIdentity), identities)
+        db.execute(insert(models.Booking), rows)
+        db.commit()
+        return workspace_ids
+    finally:
+        db.close()
+
+
+def reset_reminders(workspace_ids):
+    """Make every booking due again and start from cold caches"""
+    channel_config_cache.clear()
+    suppression_list.invalidate()
+    for workspace_id in workspace_ids:
+        template_registry.invalidate(workspace_id)
+    db = SessionLocal()
+    try:
+        db.query(models.Booking).filter(models.Booking.workspace_id.in_(workspace_ids)).update(
+            {"reminder_sent": False}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def drop_workspaces(workspace_ids):
+    db = SessionLocal()
+    try:
+        db.query(models.Workspace).filter(models.Workspace.id.in_(workspace_ids)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def remind_per_booking(workspace_ids) -> int:
+    """The shape the reminder job used to have: fresh services, lookups and a commit per booking"""
+    tomorrow = datetime.now() + timedelta(days=1)
+    db = SessionLocal()
+    try:
+        bookings = db.query(models.Booking).filter(
+            models.Booking.scheduled_at >= tomorrow,
+            models.Booking.scheduled_at < tomorrow + timedelta(days=1),
+            models.Booking.status == "pending",
+            models.Booking.reminder_sent == False,
+            models.Booking.workspace_id.in_(workspace_ids)
+        ).all()
+        for booking in bookings:
+            email_service = get_email_service(booking.workspace_id, db)
+            sms_service = get_sms_service(booking.workspace_id, db)
+            email_service.send_booking_reminder(booking, booking_notification_context(db, booking))
+            sms_service.send_booking_reminder(booking, booking_notification_context(db, booking))
+            booking.reminder_sent = True
+            db.commit()
+        return len(bookings)
+    finally:
+        db.close()
+
+
+def remind_batched(chunk_size: int) -> int:
+    db = SessionLocal()
+    try:
+        return get_automation_service(db).send_booking_reminders(chunk_size=chunk_size)
+    finally:
+        db.close()
+
+
+def run_benchmark(bookings: int, workspaces: int, chunk_size: int, skip_per_booking: bool):
+    counter = QueryCounter()
+    print(f"\n⏰ Reminder run for {bookings} due bookings across {workspaces} workspaces\n")
+    workspace_ids = create_workspaces(bookings, workspaces)
+    try:
+        scenarios = [] if skip_per_booking else [("per booking (before)", lambda: remind_per_booking(workspace_ids))]
+        scenarios.append((f"batched, chunks of {chunk_size}", lambda: remind_batched(chunk_size)))
+
+        results = []
+        for label, fn in scenarios:
+            reset_reminders(workspace_ids)
+            started = time.perf_counter()
+            # Demo-mode senders print every message; keep the output to the results table
+            with counter.measure(), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                reminded = fn()
+            elapsed = time.perf_counter() - started
+            results.append(elapsed)
+            print(f"  {label:<28} {elapsed:7.2f}s  {counter.count:7d} queries  "
+                  f"{counter.count / max(reminded, 1):6.2f} per booking  ({reminded} reminded)")
+
+        if len(results) == 2:
+            print(f"\n📊 {results[0] / results[1]:.0f}x faster")
+    finally:
+        drop_workspaces(workspace_ids)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the booking reminder job")
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--workspaces", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--skip-per-booking", action="store_true", help="Only run the batched pipeline")
+    args = parser.parse_args()
+
+    run_benchmark(args.bookings, args.workspaces, args.chunk_size, args.skip_per_booking)
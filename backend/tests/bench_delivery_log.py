@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Delivery Log Benchmark for CareOps
+Per-send INSERT+COMMIT vs the write-behind buffer, and OFFSET vs keyset paging
+
+Needs a reachable DATABASE_URL; it creates a throwaway workspace and deletes it
+(with its log rows) at the end:
+
+    cd backend && python tests/bench_delivery_log.py --records 5000 --seed-rows 200000
+"""
+
+import sys
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("SMTP_USER", "")
+os.environ.setdefault("SMTP_PASSWORD", "")
+
+from sqlalchemy import insert
+
+from app import models
+from app.database import Base, SessionLocal, engine
+from app.services.delivery_log import DeliveryLogWriter, query_delivery_logs
+
+
+def create_workspace() -> uuid.UUID:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        workspace = models.Workspace(slug=f"bench-{uuid.uuid4().hex[:12]}", business_name="Delivery Log Bench")
+        db.add(workspace)
+        db.commit()
+        return workspace.id
+    finally:
+        db.close()
+
+
+def drop_workspace(workspace_id: uuid.UUID):
+    db = SessionLocal()
+    try:
+        db.query(models.DeliveryLog).filter(models.DeliveryLog.workspace_id == workspace_id).delete()
+        db.query(models.Workspace).filter(models.Workspace.id == workspace_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def write_inline(workspace_id, records: int):
+    """The obvious alternative: an INSERT and COMMIT on the send path for every message"""
+    db = SessionLocal()
+    try:
+        for i in range(records):
+            db.add(models.DeliveryLog(
+                workspace_id=workspace_id, channel="sms", recipient=str(100_000 + i),
+                status="sent", latency_ms=40, provider_message_id=str(i)
+            ))
+            db.commit()
+    finally:
+        db.close()
+
+
+def write_behind(workspace_id, records: int) -> float:
+    """Returns the time callers spent in record(); the total includes the final flush"""
+    writer = DeliveryLogWriter(batch_size=500, flush_interval=0.2)
+    started = time.perf_counter()
+    for i in range(records):
+        writer.record(workspace_id, "sms", str(100_000 + i), "sent", latency_ms=40, provider_message_id=str(i))
+    caller_time = time.perf_counter() - started
+    writer.close()
+    assert writer.written == records, writer.stats()
+    return caller_time
+
+
+def seed(workspace_id, rows: int):
+    """Bulk-load history so paging has something to page through"""
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    step = timedelta(days=30) / rows
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            batch.append({
+                "id": uuid.uuid4(), "workspace_id": workspace_id, "channel": "sms",
+                "recipient": str(200_000 + i % 5000), "status": "failed" if i % 50 == 0 else "sent",
+                "latency_ms": 40, "provider_message_id": str(i), "error": None,
+                "created_at": start + step * i,
+            })
+            if len(batch) == 5000:
+                conn.execute(insert(models.DeliveryLog), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(models.DeliveryLog), batch)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE delivery_log")
+
+
+def page_with_offset(db, workspace_id, page: int, limit: int, status=None):
+    log = models.DeliveryLog
+    query = db.query(log).filter(log.workspace_id == workspace_id, log.channel == "sms")
+    if status:
+        query = query.filter(log.status == status)
+    return query.order_by(log.created_at.desc(), log.id.desc()).offset(page * limit).limit(limit).all()
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_benchmark(records: int, seed_rows: int, limit: int, pages: int):
+    workspace_id = create_workspace()
+    try:
+        print(f"\n🗄️  Writing {records} delivery records\n")
+
+        started = time.perf_counter()
+        write_inline(workspace_id, records)
+        inline = time.perf_counter() - started
+        print(f"  {'INSERT + COMMIT per send':<32} {inline:7.2f}s  {inline / records * 1e6:8.0f} µs on the send path")
+
+        started = time.perf_counter()
+        caller_time = write_behind(workspace_id, records)
+        behind = time.perf_counter() - started
+        print(f"  {'write-behind, batches of 500':<32} {behind:7.2f}s  {caller_time / records * 1e6:8.1f} µs on the send path")
+
+        print(f"\n📊 {inline / behind:.0f}x less total write time, "
+              f"{inline / caller_time:.0f}x less time on the send path")
+
+        seed(workspace_id, seed_rows)
+        print(f"\n📖 Paging {seed_rows + 2 * records} rows, {limit} per page (best of 5)\n")
+
+        db = SessionLocal()
+        try:
+            for status in (None, "failed"):
+                # Failures are 1 in 50 of the seeded rows; page as deep as they go
+                depth = pages if status is None else min(pages, seed_rows // 50 // limit - 1)
+                cursor = None
+                for _ in range(depth):
+                    _, cursor = query_delivery_logs(db, workspace_id, "sms", status=status,
+                                                    cursor=cursor, limit=limit)
+                offset_rows = page_with_offset(db, workspace_id, depth, limit, status)
+                # Same page either way
+                next_rows, _ = query_delivery_logs(db, workspace_id, "sms", status=status, cursor=cursor, limit=limit)
+                assert [r.id for r in next_rows] == [r.id for r in offset_rows]
+
+                first_offset = timed(lambda: page_with_offset(db, workspace_id, 0, limit, status))
+                first_keyset = timed(lambda: query_delivery_logs(db, workspace_id, "sms", status=status, limit=limit))
+                deep_offset = timed(lambda: page_with_offset(db, workspace_id, depth, limit, status))
+                deep_keyset = timed(lambda: query_delivery_logs(db, workspace_id, "sms", status=status,
+                                                                cursor=cursor, limit=limit))
+                label = f"status={status}" if status else "all statuses"
+                print(f"  {label:<14} page 1:      OFFSET {first_offset * 1000:7.2f} ms   keyset {first_keyset * 1000:7.2f} ms")
+                print(f"  {'':<14} page {depth + 1:<6} OFFSET {deep_offset * 1000:7.2f} ms   keyset {deep_keyset * 1000:7.2f} ms")
+        finally:
+            db.close()
+    finally:
+        drop_workspace(workspace_id)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark delivery log writes and paging")
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--seed-rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=1000, help="Depth of the deep page")
+    args = parser.parse_args()
+
+    run_benchmark(args.records, args.seed_rows, args.limit, args.pages)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Reminder Delivery Benchmark for CareOps
+Wall-clock time for a reminder run, serial smtplib vs. the async delivery engine
+
+    cd backend && python tests/bench_reminder_delivery.py --reminders 5000
+"""
+
+import sys
+import os
+import asyncio
+import smtplib
+import socket
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Rendering and delivery need settings but never open a DB connection
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/careops_bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("SMTP_USER", "")
+os.environ.setdefault("SMTP_PASSWORD", "")
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    print("❌ aiosmtpd is required for this benchmark: pip install -r requirements-dev.txt")
+    sys.exit(1)
+
+from app.services.email_service import OutgoingEmail, build_mime_message
+from app.services.email_delivery import AsyncEmailDelivery, EmailJob
+from app.services.smtp_pool import SMTPConnectionPool
+
+
+class SlowSink:
+    """aiosmtpd handler that acknowledges each message after a fixed delay"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.received += 1
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_reminders(count: int):
+    return [
+        OutgoingEmail(
+            f"client{i}@example.com",
+            "Reminder: Appointment Tomorrow - Consultation",
+            f"<html><body><h2>🔔 Appointment Reminder</h2><p>Hi Client {i},</p></body></html>"
+        )
+        for i in range(count)
+    ]
+
+
+def run_serial_unpooled(config: dict, reminders):
+    for email in reminders:
+        with smtplib.SMTP(config["smtp_host"], config["smtp_port"]) as server:
+            server.send_message(build_mime_message(config["smtp_user"], email))
+
+
+def run_serial_pooled(config: dict, reminders):
+    pool = SMTPConnectionPool(max_per_host=1, idle_timeout=60, max_messages=100_000, timeout=30)
+    for email in reminders:
+        pool.send_message(config, build_mime_message(config["smtp_user"], email))
+    pool.close_all()
+
+
+def run_concurrent(config: dict, reminders, per_host: int):
+    engine = AsyncEmailDelivery(per_host_limit=per_host, timeout=30)
+    results = engine.deliver_batch([EmailJob(config, email) for email in reminders])
+    assert all(results), f"{results.count(False)} sends failed"
+
+
+def timed(label: str, count: int, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<40} {elapsed:8.2f}s  {count / elapsed:8.0f} emails/s")
+    return elapsed
+
+
+def run_benchmark(reminders: int, latency_ms: float, per_host: int, skip_unpooled: bool):
+    sink = SlowSink(latency_ms / 1000)
+    controller = Controller(sink, hostname="127.0.0.1", port=free_port())
+    controller.start()
+
+    config = {
+        "smtp_host": "127.0.0.1",
+        "smtp_port": controller.port,
+        "smtp_user": "reminders@careops.local",
+        "smtp_password": "",
+        "smtp_starttls": False,
+    }
+    emails = build_reminders(reminders)
+
+    print(f"\n🔔 {reminders} reminders, sink latency {latency_ms:.0f} ms/message\n")
+
+    timings = {}
+    try:
+        if not skip_unpooled:
+            timings["unpooled"] = timed("serial, connection per email", reminders,
+                                        lambda: run_serial_unpooled(config, emails))
+        timings["pooled"] = timed("serial, pooled connection", reminders,
+                                  lambda: run_serial_pooled(config, emails))
+        timings["async"] = timed(f"async engine, {per_host} per host", reminders,
+                                 lambda: run_concurrent(config, emails, per_host))
+    finally:
+        controller.stop()
+
+    baseline = timings.get("unpooled", timings["pooled"])
+    print(f"\n📊 Concurrent run is {baseline / timings['async']:.1f}x faster than serial")
+    print(f"   Sink received {sink.received} messages")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark serial vs concurrent reminder delivery")
+    parser.add_argument("--reminders", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=5, help="Simulated server time per message")
+    parser.add_argument("--per-host", type=int, default=8, help="Concurrent connections per SMTP host")
+    parser.add_argument("--skip-unpooled", action="store_true", help="Skip the slowest baseline")
+    args = parser.parse_args()
+
+    run_benchmark(args.reminders, args.latency_ms, args.per_host, args.skip_unpooled)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Reminder Fairness Benchmark for CareOps
+When each workspace's reminders are done, workspace-ordered chunks vs. round-robin chunks
+
+One large workspace and many small ones, each with its own SMTP account on a
+local aiosmtpd sink, delivered in reminder-sized chunks through the async engine:
+
+    cd backend && python tests/bench_reminder_fairness.py --large 5000 --small 19x50
+"""
+
+import sys
+import os
+import asyncio
+import socket
+import statistics
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Needs a reachable DATABASE_URL: each send checks the suppression list
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/careops_bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("SMTP_USER", "")
+os.environ.setdefault("SMTP_PASSWORD", "")
+os.environ["DELIVERY_LOG_ENABLED"] = "false"
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    print("❌ aiosmtpd is required for this benchmark: pip install -r requirements-dev.txt")
+    sys.exit(1)
+
+from app.services.delivery_progress import DeliveryProgress
+from app.services.email_service import OutgoingEmail
+from app.services.email_delivery import AsyncEmailDelivery, EmailJob, round_robin
+
+
+class SlowSink:
+    """aiosmtpd handler that acknowledges each message after a fixed delay"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.received += 1
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_jobs(port: int, sizes):
+    """Reminders for each workspace, in workspace order (the large one first)"""
+    jobs = []
+    for w, size in enumerate(sizes):
+        config = {
+            "smtp_host": "127.0.0.1",
+            "smtp_port": port,
+            "smtp_user": f"workspace{w}@careops.local",  # one SMTP account per workspace
+            "smtp_password": "",
+            "smtp_starttls": False,
+        }
+        for i in range(size):
+            email = OutgoingEmail(f"client{w}-{i}@example.com", "Reminder: Appointment Tomorrow", "<p>See you</p>")
+            jobs.append(EmailJob(config, email, f"workspace-{w}"))
+    return jobs
+
+
+def run_chunked(jobs, chunk_size: int, per_host: int, workers: int) -> DeliveryProgress:
+    """Deliver `jobs` a chunk at a time, as send_booking_reminders does"""
+    engine = AsyncEmailDelivery(per_host_limit=per_host, timeout=30, max_concurrency=workers)
+    progress = DeliveryProgress("bench")
+    for job in jobs:
+        progress.queued(job.workspace_id)
+    for start in range(0, len(jobs), chunk_size):
+        results = engine.deliver_batch(jobs[start:start + chunk_size], progress)
+        assert all(results), f"{results.count(False)} sends failed"
+    progress.finish()
+    return progress
+
+
+def report(label: str, progress: DeliveryProgress):
+    stats = progress.stats()
+    large = stats["workspaces"]["workspace-0"]["finished_after"]
+    small = sorted(
+        counts["finished_after"] for key, counts in stats["workspaces"].items() if key != "workspace-0"
+    )
+    print(f"  {label:<34} {stats['elapsed_seconds']:7.2f}s  "
+          f"small done: median {statistics.median(small):6.2f}s, last {small[-1]:6.2f}s  "
+          f"large done {large:6.2f}s")
+
+
+def run_benchmark(large: int, small_count: int, small_size: int, chunk_size: int,
+                  per_host: int, workers_list, latency_ms: float):
+    sink = SlowSink(latency_ms / 1000)
+    controller = Controller(sink, hostname="127.0.0.1", port=free_port())
+    controller.start()
+
+    sizes = [large] + [small_size] * small_count
+    jobs = build_jobs(controller.port, sizes)
+    fair_jobs = [job for _, job in round_robin(list(enumerate(jobs)))]
+
+    print(f"\n⚖️  {len(jobs)} reminders: one workspace with {large}, {small_count} with {small_size}; "
+          f"chunks of {chunk_size}, {per_host} per SMTP account, sink latency {latency_ms:.0f} ms\n")
+    try:
+        workers = workers_list[-1]
+        report(f"workspace order, {workers} in flight", run_chunked(jobs, chunk_size, per_host, workers))
+        for workers in workers_list:
+            report(f"round-robin, {workers} in flight", run_chunked(fair_jobs, chunk_size, per_host, workers))
+    finally:
+        controller.stop()
+
+    print(f"\n📊 Sink received {sink.received} messages")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark per-workspace fairness of reminder delivery")
+    parser.add_argument("--large", type=int, default=5000, help="Reminders for the large workspace")
+    parser.add_argument("--small", default="19x50", help="COUNTxSIZE small workspaces")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--per-host", type=int, default=8, help="Concurrent connections per SMTP account")
+    parser.add_argument("--workers", default="8,16,32", help="Global in-flight caps to compare")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Simulated server time per message")
+    args = parser.parse_args()
+
+    small_count, small_size = (int(n) for n in args.small.split("x"))
+    run_benchmark(args.large, small_count, small_size, args.chunk_size, args.per_host,
+                  [int(w) for w in args.workers.split(",")], args.latency_ms)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+SMS Throughput Benchmark for CareOps
+Sustained Telegram sends per second through TelegramSMSService, the dispatcher and the pooled client
+
+Runs against tests/fake_telegram_api.py, which applies Telegram's flood control by
+default (30 msgs/s, 1 per chat per second), so the result shows how close the real
+send path gets to the Bot API's limits. Needs a reachable DATABASE_URL (opt-out checks):
+
+    cd backend && python tests/bench_sms_throughput.py --messages 600 --chats 200 --latency-ms 50
+
+The dispatcher's own pacing comes from Settings, e.g. TELEGRAM_GLOBAL_RATE_PER_SECOND=100.
+--coalesce-window 0 turns off merging of messages queued for the same chat.
+"""
+
+import sys
+import os
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fake_telegram_api import FakeTelegramAPI, free_port
+
+# Point the app's Bot API client at the fake before it is imported
+FAKE_PORT = free_port()
+os.environ["TELEGRAM_API_BASE_URL"] = f"http://127.0.0.1:{FAKE_PORT}"
+os.environ["TELEGRAM_BOT_TOKEN"] = "bench-token"
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("SMTP_USER", "")
+os.environ.setdefault("SMTP_PASSWORD", "")
+
+from app.database import SessionLocal
+from app.services.sms_service import TelegramSMSService, wait_for_telegram
+from app.services.telegram_dispatcher import telegram_dispatcher
+from app.services.telegram_http import telegram_http
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return f"p50 {pick(0.5):6.2f}s  p95 {pick(0.95):6.2f}s"
+
+
+def reminder_run(service: TelegramSMSService, messages: int, chats: int):
+    """Queue everything up front, as the reminder jobs do, then wait for every send"""
+    latencies = []
+    lock = threading.Lock()
+
+    def done(future, queued_at=None):
+        with lock:
+            latencies.append(time.perf_counter() - queued_at)
+
+    futures = []
+    for i in range(messages):
+        future = service._queue_telegram_message(str(1000 + i % chats), f"Reminder {i}")
+        queued_at = time.perf_counter()
+        future.add_done_callback(lambda f, queued_at=queued_at: done(f, queued_at))
+        futures.append(future)
+    delivered = sum(1 for future in futures if wait_for_telegram(future).get("success"))
+    return delivered, latencies
+
+
+def request_path(service: TelegramSMSService, messages: int, chats: int, threads: int):
+    """`threads` callers each sending one message at a time and waiting for it (send_custom_sms)"""
+    latencies = []
+
+    def send(i):
+        started = time.perf_counter()
+        ok = service.send_custom_sms(str(5000 + i % chats), f"Update {i}")
+        latencies.append(time.perf_counter() - started)
+        return bool(ok)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        delivered = sum(executor.map(send, range(messages)))
+    return delivered, latencies
+
+
+def run_scenario(api: FakeTelegramAPI, label: str, messages: int, fn):
+    api.reset()
+    coalesced = telegram_dispatcher.coalesced
+    started = time.perf_counter()
+    # The service logs every send (and the dispatcher every 429); keep the output to the results table
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        delivered, latencies = fn()
+    elapsed = time.perf_counter() - started
+    stats = api.stats()
+    print(f"  {label:<26} {elapsed:6.1f}s  delivered {delivered:5d}/{messages}  "
+          f"{api.sent_per_second():6.1f} sends/s  429s {stats['rate_limited']:4d}  "
+          f"errors {stats['errors']:3d}  merged {telegram_dispatcher.coalesced - coalesced:4d}  "
+          f"{percentiles(latencies)}")
+
+
+def run_benchmark(messages: int, chats: int, threads: int, latency_ms: float,
+                  global_rate: float, per_chat_rate: float, error_rate: float, coalesce_window: float):
+    api = FakeTelegramAPI(
+        port=FAKE_PORT, latency_ms=latency_ms, jitter_ms=latency_ms / 2,
+        global_rate=global_rate, per_chat_rate=per_chat_rate, error_rate=error_rate
+    )
+    telegram_dispatcher.coalesce_window = coalesce_window
+    db = SessionLocal()
+    with api:
+        service = TelegramSMSService(workspace_id="bench", db=db)
+        print(f"\n📱 {messages} messages to {chats} chats via {api.url}: {latency_ms:.0f}±{latency_ms / 2:.0f} ms/call, "
+              f"limits {global_rate:g}/s global, {per_chat_rate:g}/s per chat, {error_rate:.0%} errors, "
+              f"coalescing window {coalesce_window:g}s\n")
+        try:
+            run_scenario(api, "reminder run (queued)", messages,
+                         lambda: reminder_run(service, messages, chats))
+            run_scenario(api, f"request path, {threads} callers", messages,
+                         lambda: request_path(service, messages, chats, threads))
+        finally:
+            telegram_dispatcher.close()
+            telegram_http.close()
+            db.close()
+
+    print(f"\n📊 The Bot API allows {global_rate:g} sends/s; latencies are from queueing to delivery; "
+          f"'merged' messages rode along in another send")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark sustained Telegram sends through TelegramSMSService")
+    parser.add_argument("--messages", type=int, default=600)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent callers on the request path")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Fake Bot API time per call")
+    parser.add_argument("--global-rate", type=float, default=30, help="Fake Bot API sends per second")
+    parser.add_argument("--per-chat-rate", type=float, default=1, help="Fake Bot API sends per chat per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of sends the fake fails with a 500")
+    parser.add_argument("--coalesce-window", type=float, default=0.5,
+                        help="Seconds a chat's message waits for others to merge with (0 = off)")
+    args = parser.parse_args()
+
+    run_benchmark(args.messages, args.chats, args.threads, args.latency_ms,
+                  args.global_rate, args.per_chat_rate, args.error_rate, args.coalesce_window)
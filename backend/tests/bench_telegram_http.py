@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Telegram HTTP Benchmark for CareOps
+Connection-per-call requests.post vs the pooled keep-alive client, against a local fake Bot API
+
+    cd backend && python tests/bench_telegram_http.py --messages 2000
+"""
+
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fake_telegram_api import FakeTelegramAPI
+
+# The client only needs settings
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/careops_bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("SMTP_USER", "")
+os.environ.setdefault("SMTP_PASSWORD", "")
+
+from app.services.telegram_http import TelegramHTTPClient
+
+
+def send_unpooled(base_url: str, messages: int):
+    """What TelegramSMSService used to do: module-level requests.post per message"""
+    for i in range(messages):
+        url = f"{base_url}/botbench-token/sendMessage"
+        requests.post(url, json={"chat_id": i, "text": "Reminder", "parse_mode": "HTML"}, timeout=10).raise_for_status()
+
+
+def send_pooled(http: TelegramHTTPClient, messages: int, threads: int):
+    """The shared client the dispatcher sends through (without its rate limiting)"""
+    def send(i):
+        response = http.post("bench-token", "sendMessage", {"chat_id": i, "text": "Reminder", "parse_mode": "HTML"})
+        assert response.json()["ok"]
+
+    if threads == 1:
+        for i in range(messages):
+            send(i)
+        return
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(send, range(messages)))
+
+
+def timed(api: FakeTelegramAPI, label: str, messages: int, fn):
+    before = api.connections
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    opened = api.connections - before
+    print(f"  {label:<36} {elapsed:7.2f}s  {messages / elapsed:8.0f} msgs/s  {opened:6d} connections")
+    return elapsed
+
+
+def run_benchmark(messages: int, threads: int, latency_ms: float, pool_size: int):
+    api = FakeTelegramAPI(latency_ms=latency_ms).start()
+    http = TelegramHTTPClient(base_url=api.url, pool_size=pool_size)
+
+    print(f"\n📱 Sending {messages} messages to a fake Bot API on {api.url} ({latency_ms:.0f} ms/call)\n")
+
+    try:
+        baseline = timed(api, "requests.post per message", messages, lambda: send_unpooled(api.url, messages))
+        pooled = timed(api, "pooled session, serial", messages, lambda: send_pooled(http, messages, 1))
+        concurrent = timed(api, f"pooled session, {threads} threads", messages,
+                           lambda: send_pooled(http, messages, threads))
+    finally:
+        http.close()
+        api.stop()
+
+    print(f"\n📊 Serial speedup: {baseline / pooled:.1f}x, concurrent speedup: {baseline / concurrent:.1f}x")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark pooled Telegram HTTP delivery")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated Bot API time per call")
+    parser.add_argument("--pool-size", type=int, default=16)
+    args = parser.parse_args()
+
+    run_benchmark(args.messages, args.threads, args.latency_ms, args.pool_size)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Telegram Inbox Benchmark for CareOps
+Stores a burst of inbound messages one at a time vs in the inbox's batches
+
+Needs a reachable DATABASE_URL; it creates a throwaway workspace with one
+contact per chat and deletes it (with its conversations) at the end:
+
+    cd backend && python tests/bench_telegram_inbox.py --messages 2000 --chats 500
+"""
+
+import sys
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("SMTP_USER", "")
+os.environ.setdefault("SMTP_PASSWORD", "")
+
+from app import models
+from app.database import Base, SessionLocal, engine
+from app.services.channel_identity import TELEGRAM, resolve_external_ids, telegram_chat_ids
+from app.services.telegram_inbox import InboundMessage, TelegramInbox, ingest_messages
+
+
+def create_workspace(chats: int):
+    """A workspace whose contacts are Telegram chats 100000000.. (one conversation each)"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        workspace = models.Workspace(slug=f"bench-{uuid.uuid4().hex[:12]}", business_name="Inbox Bench")
+        db.add(workspace)
+        db.flush()
+        for i in range(chats):
+            contact = models.Contact(
+                workspace_id=workspace.id, name=f"Contact {i}", email=f"contact{i}@example.com",
+                phone=f"telegram:{100_000_000 + i}"
+            )
+            db.add(contact)
+            db.flush()  # maps the chat in channel_identities
+            db.add(models.Conversation(workspace_id=workspace.id, contact_id=contact.id, status="open"))
+        db.commit()
+        return workspace.id
+    finally:
+        db.close()
+
+
+def drop_workspace(workspace_id):
+    db = SessionLocal()
+    try:
+        db.query(models.Workspace).filter(models.Workspace.id == workspace_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def burst(messages: int, chats: int, label: str):
+    now = datetime.now(timezone.utc)
+    return [
+        InboundMessage(str(100_000_000 + i % chats), f"{label} {i}", now, message_id=i, update_id=i)
+        for i in range(messages)
+    ]
+
+
+def store_one_by_one(messages):
+    """What ingesting each update as it arrives costs: lookups, INSERT and COMMIT per message"""
+    db = SessionLocal()
+    try:
+        return sum(ingest_messages(db, [message]) for message in messages)
+    finally:
+        db.close()
+
+
+def store_batched(messages) -> float:
+    """Returns the time callers spent in add(); the total includes the final flush"""
+    inbox = TelegramInbox(batch_size=200, flush_interval=0.2)
+    started = time.perf_counter()
+    for message in messages:
+        inbox.add(message)
+    caller_time = time.perf_counter() - started
+    inbox.close()
+    assert inbox.unmatched == 0 and inbox.written == len(messages), inbox.stats()
+    return caller_time
+
+
+def count_messages(workspace_id) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(models.Message).join(models.Conversation).filter(
+            models.Conversation.workspace_id == workspace_id
+        ).count()
+    finally:
+        db.close()
+
+
+def check_reassignment(workspace_id):
+    """A contact whose chat id changes, then goes, stops routing to and from the old chat"""
+    db = SessionLocal()
+    try:
+        contact = db.query(models.Contact).filter(
+            models.Contact.workspace_id == workspace_id, models.Contact.phone == "telegram:100000000"
+        ).one()
+
+        contact.phone = "telegram:199999999"
+        db.commit()
+        assert "100000000" not in resolve_external_ids(db, TELEGRAM, ["100000000"])
+        assert resolve_external_ids(db, TELEGRAM, ["199999999"])["199999999"] == [(workspace_id, contact.id)]
+        assert telegram_chat_ids(db, [contact]) == {contact.id: "199999999"}
+
+        contact.phone = "+1 555 0100"
+        db.commit()
+        assert not resolve_external_ids(db, TELEGRAM, ["199999999"])
+        assert telegram_chat_ids(db, [contact]) == {}
+    finally:
+        db.close()
+
+
+def run_benchmark(messages: int, chats: int):
+    workspace_id = create_workspace(chats)
+    try:
+        print(f"\n📥 Storing a burst of {messages} inbound messages from {chats} chats\n")
+
+        started = time.perf_counter()
+        stored = store_one_by_one(burst(messages, chats, "single"))
+        single = time.perf_counter() - started
+        assert stored == messages
+        print(f"  {'one message per transaction':<30} {single:7.2f}s  {messages / single:8.0f} msg/s")
+
+        started = time.perf_counter()
+        caller_time = store_batched(burst(messages, chats, "batched"))
+        batched = time.perf_counter() - started
+        print(f"  {'inbox, batches of 200':<30} {batched:7.2f}s  {messages / batched:8.0f} msg/s"
+              f"  ({caller_time / messages * 1e6:.1f} µs per update on the webhook worker)")
+
+        assert count_messages(workspace_id) == 2 * messages
+        print(f"\n📊 {single / batched:.0f}x faster to store the burst")
+
+        check_reassignment(workspace_id)
+        print("✅ A reassigned or removed chat id stops routing to the contact")
+    finally:
+        drop_workspace(workspace_id)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark inbound Telegram message ingestion")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=500)
+    args = parser.parse_args()
+
+    run_benchmark(args.messages, args.chats)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Template Rendering Benchmark for CareOps
+Renders booking reminders (subject, email and Telegram) with the inline f-strings vs compiled templates
+
+    cd backend && python tests/bench_templates.py --reminders 10000
+"""
+
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Rendering only needs settings; nothing here touches the database
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/careops_bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("SMTP_USER", "")
+os.environ.setdefault("SMTP_PASSWORD", "")
+
+from app import models
+from app.services.template_service import (
+    TemplateRegistry, PARTS, booking_context, compile_template
+)
+
+
+def build_rows(count: int):
+    workspace = models.Workspace(business_name="Sunrise Physio", contact_email="hi@sunrise.test")
+    service = models.ServiceType(name="Initial Consultation", duration_minutes=45)
+    start = datetime(2026, 3, 2, 9, 0)
+    rows = []
+    for i in range(count):
+        contact = models.Contact(name=f"Client {i}", email=f"client{i}@example.com")
+        booking = models.Booking(
+            scheduled_at=start + timedelta(minutes=30 * i),
+            location="Room 2" if i % 2 else None
+        )
+        rows.append((workspace, contact, service, booking))
+    return rows
+
+
+def render_inline(workspace, contact, service, booking):
+    """The f-strings EmailService/TelegramSMSService used to build per send"""
+    subject = f"Reminder: Appointment Tomorrow - {service.name}"
+    body = f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h2 style="color: #2563eb;">🔔 Appointment Reminder</h2>
+                <p>Hi {contact.name},</p>
+                <p>This is a friendly reminder about your upcoming appointment:</p>
+
+                <div style="background: #eff6ff; border-left: 4px solid #2563eb; padding: 15px; margin: 20px 0;">
+                    <p style="margin: 5px 0;"><strong>{service.name}</strong></p>
+                    <p style="margin: 5px 0;">📅 {booking.scheduled_at.strftime('%A, %B %d at %I:%M %p')}</p>
+                    {f'<p style="margin: 5px 0;">📍 {booking.location}</p>' if booking.location else ''}
+                </div>
+
+                <p>See you soon!</p>
+                <p style="color: #6b7280; font-size: 14px;">
+                    <strong>{workspace.business_name}</strong>
+                </p>
+            </div>
+        </body>
+        </html>
+        """
+    message = f"""
+<b>🔔 Appointment Reminder</b>
+
+Hi {contact.name}, reminder for your appointment tomorrow:
+
+<b>Service:</b> {service.name if service else 'N/A'}
+<b>Date:</b> {booking.scheduled_at.strftime('%A, %B %d')}
+<b>Time:</b> {booking.scheduled_at.strftime('%I:%M %p')}
+
+{f'<b>Location:</b> {booking.location}' if booking.location else ''}
+
+See you soon!
+
+Reply STOP to unsubscribe.
+        """.strip()
+    return subject, body, message
+
+
+def render_uncached(registry: TemplateRegistry, row):
+    """Read and compile the templates on every render (no cache)"""
+    context = booking_context(*row)
+    return tuple(
+        compile_template(registry.default_source("booking_reminder", part), part).render(context)
+        for part in PARTS
+    )
+
+
+def render_cached(templates: dict, row):
+    """Compiled once, one prepared context shared by all three parts"""
+    context = booking_context(*row)
+    return tuple(templates[part].render(context) for part in PARTS)
+
+
+def timed(label: str, count: int, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<36} {elapsed * 1000:9.1f}ms  {count / elapsed:10.0f} reminders/s")
+    return elapsed
+
+
+def run_benchmark(reminders: int):
+    rows = build_rows(reminders)
+    registry = TemplateRegistry()
+    templates = {part: registry._default("booking_reminder", part) for part in PARTS}
+
+    print(f"\n📝 Rendering {reminders} booking reminders (subject + email + Telegram)\n")
+
+    inline = timed("inline f-strings", reminders, lambda: [render_inline(*row) for row in rows])
+    uncached = timed("templates, compiled per render", reminders,
+                     lambda: [render_uncached(registry, row) for row in rows])
+    cached = timed("templates, compiled once", reminders,
+                   lambda: [render_cached(templates, row) for row in rows])
+
+    sample = render_cached(templates, rows[1])
+    print(f"\n📊 Cache saves {(uncached - cached) / reminders * 1e6:.1f}µs per reminder; "
+          f"cached render is {cached / inline:.2f}x the cost of inline f-strings")
+    print(f"   Sample subject: {sample[0]}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark notification template rendering")
+    parser.add_argument("--reminders", type=int, default=10000)
+    args = parser.parse_args()
+
+    run_benchmark(args.reminders)
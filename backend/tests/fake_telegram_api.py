@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Fake Telegram Bot API for CareOps
+Stands in for api.telegram.org in load tests and benchmarks: latency, flood control, errors, recorded traffic
+
+Start it in-process (benchmarks do this) and point the app at it before importing it:
+
+    with FakeTelegramAPI(latency_ms=50, global_rate=30) as api:
+        os.environ["TELEGRAM_API_BASE_URL"] = api.url
+
+or run it on its own and start a dev server against it:
+
+    cd backend && python tests/fake_telegram_api.py --port 8081 --latency-ms 100 --global-rate 30
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8081 uvicorn app.main:app
+"""
+
+import json
+import random
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+
+def free_port() -> int:
+    """A port nothing is listening on, for servers that must be addressed before they start"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Call(NamedTuple):
+    """One request the fake answered"""
+    method: str
+    params: Dict[str, Any]
+    status: int
+    at: float  # time.monotonic()
+
+
+class FakeTelegramAPI:
+    """
+    Local Bot API serving getMe, sendMessage and getUpdates.
+
+    - every call waits `latency_ms` (plus up to `jitter_ms`) before answering;
+    - with `global_rate` / `per_chat_rate` set, sendMessage enforces
+      Telegram's flood control and answers 429 with `retry_after`;
+    - `error_rate` of sendMessage calls fail with a 500, and chats in
+      `blocked_chats` get the 403 of a user who blocked the bot;
+    - every call is recorded in `calls` (see stats());
+    - push_update() queues updates for getUpdates, which long-polls and
+      honours offset/limit like the real one.
+
+    Keep-alive HTTP/1.1 with Content-Length, so pooled clients reuse
+    connections as they would against Telegram.
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        global_rate: Optional[float] = None,
+        per_chat_rate: Optional[float] = None,
+        retry_after: int = 1,
+        error_rate: float = 0.0,
+        blocked_chats: Iterable = (),
+        seed: int = 0
+    ):
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.global_rate = global_rate
+        self.per_chat_rate = per_chat_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.blocked_chats = {str(chat_id) for chat_id in blocked_chats}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._updates_ready = threading.Condition(self._lock)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.reset()
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> "FakeTelegramAPI":
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="fake-telegram-api", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeTelegramAPI":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def reset(self):
+        """Forget recorded calls, counters and flood-control state"""
+        with self._lock:
+            self.calls: List[Call] = []
+            self.connections = 0
+            self._recent = deque()  # accepted sendMessage calls in the last second
+            self._last_by_chat: Dict[str, float] = {}
+            self._message_id = 0
+            self._updates: List[Dict[str, Any]] = []
+
+    # ---------- test controls ----------
+
+    def push_update(self, update: Dict[str, Any]):
+        """Make an update available to getUpdates"""
+        with self._updates_ready:
+            self._updates.append(update)
+            self._updates_ready.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            sends = [call for call in self.calls if call.method == "sendMessage"]
+            return {
+                "requests": len(self.calls),
+                "connections": self.connections,
+                "sent": sum(1 for call in sends if call.status == 200),
+                "rate_limited": sum(1 for call in sends if call.status == 429),
+                "errors": sum(1 for call in sends if call.status not in (200, 429)),
+            }
+
+    def sent_per_second(self) -> float:
+        """Delivered sendMessage calls per second, first to last"""
+        with self._lock:
+            times = [call.at for call in self.calls if call.method == "sendMessage" and call.status == 200]
+        if len(times) < 2:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    # ---------- Bot API methods ----------
+
+    def _admit(self, chat_id: str, now: float) -> bool:
+        """Telegram's flood control; call with the lock held"""
+        while self._recent and now - self._recent[0] >= 1:
+            self._recent.popleft()
+        if self.global_rate and len(self._recent) >= self.global_rate:
+            return False
+        # 10% slack per chat for jitter between client and server clocks
+        if self.per_chat_rate and now - self._last_by_chat.get(chat_id, -1e9) < 0.9 / self.per_chat_rate:
+            return False
+        self._recent.append(now)
+        self._last_by_chat[chat_id] = now
+        return True
+
+    def send_message(self, params: Dict[str, Any]):
+        chat_id = str(params.get("chat_id"))
+        with self._lock:
+            if not self._admit(chat_id, time.monotonic()):
+                return 429, {
+                    "ok": False, "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+            if chat_id in self.blocked_chats:
+                return 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+            if self.error_rate and self._random.random() < self.error_rate:
+                return 500, {"ok": False, "error_code": 500, "description": "Internal Server Error"}
+            self._message_id += 1
+            message_id = self._message_id
+        return 200, {"ok": True, "result": {
+            "message_id": message_id, "date": int(time.time()),
+            "chat": {"id": params.get("chat_id")}, "text": params.get("text"),
+        }}
+
+    def get_me(self, params: Dict[str, Any]):
+        return 200, {"ok": True, "result": {
+            "id": 100000001, "is_bot": True, "first_name": "CareOps Fake", "username": "careops_fake_bot",
+        }}
+
+    def get_updates(self, params: Dict[str, Any]):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + float(params.get("timeout") or 0)
+        with self._updates_ready:
+            # Like Telegram: an offset confirms (drops) every earlier update
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._updates_ready.wait(deadline - time.monotonic())
+            return 200, {"ok": True, "result": self._updates[:limit]}
+
+    # ---------- HTTP ----------
+
+    def _handler(self):
+        api = self
+        methods = {"sendMessage": self.send_message, "getMe": self.get_me, "getUpdates": self.get_updates}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+            def setup(self):
+                super().setup()
+                with api._lock:
+                    api.connections += 1
+
+            def _params(self) -> Dict[str, Any]:
+                url = urlsplit(self.path)
+                params: Dict[str, Any] = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    body = self.rfile.read(length)
+                    if self.headers.get("Content-Type", "").startswith("application/json"):
+                        params.update(json.loads(body or b"{}"))
+                    else:
+                        params.update(parse_qsl(body.decode()))
+                return params
+
+            def _answer(self):
+                params = self._params()
+                method = urlsplit(self.path).path.rsplit("/", 1)[-1]
+                delay = api.latency_ms + (api._random.uniform(0, api.jitter_ms) if api.jitter_ms else 0)
+                if delay:
+                    time.sleep(delay / 1000)
+
+                handler = methods.get(method)
+                if handler is None:
+                    status, data = 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+                else:
+                    status, data = handler(params)
+                with api._lock:
+                    api.calls.append(Call(method, params, status, time.monotonic()))
+
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _answer
+            do_POST = _answer
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake Telegram Bot API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--global-rate", type=float, default=None, help="sendMessage calls per second before 429s")
+    parser.add_argument("--per-chat-rate", type=float, default=None, help="sendMessage calls per chat per second")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of sendMessage calls answered 500")
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI(
+        port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        global_rate=args.global_rate, per_chat_rate=args.per_chat_rate,
+        retry_after=args.retry_after, error_rate=args.error_rate
+    ).start()
+    print(f"🤖 Fake Telegram Bot API on {api.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"   {api.stats()}")
+    except KeyboardInterrupt:
+        api.stop()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Telegram Webhook Load Test for CareOps
+Fires bursts of webhook updates at a running API while timing an unrelated endpoint
+
+Needs a reachable DATABASE_URL (the app creates its tables on import). Replies go
+to a local fake Bot API with a configurable delay:
+
+    cd backend && python tests/load_telegram_webhook.py --bursts 10 --burst-size 50 --bot-latency-ms 300
+"""
+
+import sys
+import os
+import asyncio
+import statistics
+import subprocess
+import time
+
+import httpx
+
+from fake_telegram_api import FakeTelegramAPI, free_port
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return f"p50 {pick(0.5):7.1f} ms   p95 {pick(0.95):7.1f} ms   max {samples[-1] * 1000:7.1f} ms"
+
+
+def start_api(bot_api_url: str):
+    """Run the real app under uvicorn in a child process and wait until it answers"""
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "load-test")
+    env.setdefault("SMTP_USER", "")
+    env.setdefault("SMTP_PASSWORD", "")
+    env["TELEGRAM_BOT_TOKEN"] = "load-test-token"
+    env["TELEGRAM_API_BASE_URL"] = bot_api_url
+    env["OUTBOX_DISPATCH_IN_SCHEDULER"] = "false"
+
+    port = free_port()
+    # The app logs every update and reply; keep the output to the results
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if process.poll() is not None:
+            raise SystemExit("❌ API process exited; is DATABASE_URL reachable?")
+        try:
+            httpx.get(f"{base_url}/health", timeout=1)
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit("❌ API did not start within 30s")
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float):
+    """Time GET /health back to back until the burst is over"""
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def bursts(client: httpx.AsyncClient, count: int, size: int, interval: float, concurrency: int):
+    """`count` bursts of `size` /start updates from distinct chats, one burst every `interval` seconds"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    # Fresh update_ids every run: the API drops ids it has already seen
+    first_update_id = int(time.time() * 1000)
+
+    async def post(i):
+        update = {
+            "update_id": first_update_id + i,
+            "message": {"message_id": i, "chat": {"id": 500_000 + i, "type": "private"}, "text": "/start"},
+        }
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/api/sms/webhook/telegram", json=update)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+    for n in range(count):
+        burst_started = time.perf_counter()
+        await asyncio.gather(*(post(n * size + i) for i in range(size)))
+        await asyncio.sleep(max(0, interval - (time.perf_counter() - burst_started)))
+    return latencies
+
+
+async def run_load(base_url: str, count: int, size: int, interval: float, concurrency: int, probe_interval: float):
+    limits = httpx.Limits(max_connections=concurrency + 2)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=600) as client:
+        idle = await probe_once(client, 50)
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, stop, probe_interval))
+        started = time.perf_counter()
+        acks = await bursts(client, count, size, interval, concurrency)
+        acked_in = time.perf_counter() - started
+        stop.set()
+        busy = await probe_task
+
+    return idle, busy, acks, acked_in
+
+
+async def probe_once(client: httpx.AsyncClient, count: int):
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main(count: int, size: int, interval: float, concurrency: int, bot_latency_ms: float, probe_interval_ms: float):
+    updates = count * size
+    bot_api = FakeTelegramAPI(latency_ms=bot_latency_ms).start()
+    process, base_url = start_api(bot_api.url)
+
+    print(f"\n📱 {count} bursts of {size} webhook updates, every {interval:g}s, to {base_url}; "
+          f"Bot API replies take {bot_latency_ms:.0f} ms\n")
+
+    try:
+        started = time.perf_counter()
+        idle, busy, acks, acked_in = asyncio.run(
+            run_load(base_url, count, size, interval, concurrency, probe_interval_ms / 1000)
+        )
+        deadline = time.perf_counter() + 120
+        while bot_api.stats()["sent"] < updates and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        replied_in = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        bot_api.stop()
+
+    print(f"  /health, idle            {percentiles(idle)}")
+    print(f"  /health, during bursts   {percentiles(busy)}   ({len(busy)} probes)")
+    print(f"  webhook acknowledgement  {percentiles(acks)}")
+    print(f"\n📊 {updates} updates sent in {acked_in:.1f}s, "
+          f"mean /health slowdown {statistics.mean(busy) / statistics.mean(idle):.1f}x")
+    print(f"   {bot_api.stats()['sent']} replies reached the Bot API after {replied_in:.1f}s")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load test the Telegram webhook endpoint")
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--burst-size", type=int, default=50)
+    parser.add_argument("--burst-interval", type=float, default=2.0, help="Seconds between burst starts")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--bot-latency-ms", type=float, default=300)
+    parser.add_argument("--probe-interval-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    main(args.bursts, args.burst_size, args.burst_interval, args.concurrency, args.bot_latency_ms, args.probe_interval_ms)
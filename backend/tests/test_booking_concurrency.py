@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Double-Booking Load Test for CareOps
+Hammers a single booking slot from many threads and checks exactly one wins
+"""
+
+import sys
+import os
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    from app.database import SessionLocal
+    from app import models
+    from app.services.booking_service import reserve_booking, BookingConflictError
+except ImportError as e:
+    print(f"❌ Import error: {e}")
+    print("Make sure you're running from backend directory:")
+    print("  cd backend && python tests/test_booking_concurrency.py --workspace-id=YOUR_ID")
+    sys.exit(1)
+
+
+def attempt_booking(workspace_id, contact_id, service, scheduled_at, barrier, results):
+    """Worker: wait for the starting gun, then try to reserve the slot"""
+    # Nothing touches the pool before the barrier, so threads beyond the
+    # pool size simply queue for a connection instead of deadlocking
+    barrier.wait()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        try:
+            booking = reserve_booking(
+                db,
+                workspace_id=workspace_id,
+                contact_id=contact_id,
+                service=service,
+                scheduled_at=scheduled_at
+            )
+            db.commit()
+            results.append(("won", time.perf_counter() - started, booking.id))
+        except BookingConflictError:
+            db.rollback()
+            results.append(("conflict", time.perf_counter() - started, None))
+    except Exception as e:
+        db.rollback()
+        results.append(("error", 0.0, str(e)))
+    finally:
+        db.close()
+
+
+def run_slot_contention(workspace_id: str, threads: int, rounds: int) -> bool:
+    """Fire `threads` concurrent reservations at one slot, `rounds` times"""
+    db = SessionLocal()
+    service = models.ServiceType(
+        workspace_id=workspace_id,
+        name="Load Test Service",
+        duration_minutes=60
+    )
+    contact = models.Contact(
+        workspace_id=workspace_id,
+        name="Load Test",
+        email="load-test@example.com",
+        source="test"
+    )
+    db.add_all([service, contact])
+    db.commit()
+    db.refresh(service)
+    db.refresh(contact)
+
+    # Workers only read id/duration/location, so hand them a detached copy
+    detached_service = models.ServiceType(
+        id=service.id,
+        workspace_id=service.workspace_id,
+        name=service.name,
+        duration_minutes=service.duration_minutes,
+        location=service.location
+    )
+
+    ok = True
+    all_latencies = []
+    total_attempts = 0
+    total_elapsed = 0.0
+    base = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=30)
+
+    try:
+        for round_no in range(rounds):
+            scheduled_at = base + timedelta(hours=2 * round_no)
+            barrier = threading.Barrier(threads)
+            results = []
+            workers = [
+                threading.Thread(
+                    target=attempt_booking,
+                    args=(workspace_id, contact.id, detached_service, scheduled_at, barrier, results)
+                )
+                for _ in range(threads)
+            ]
+
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+
+            winners = [r for r in results if r[0] == "won"]
+            conflicts = [r for r in results if r[0] == "conflict"]
+            errors = [r for r in results if r[0] == "error"]
+
+            total_attempts += len(results)
+            total_elapsed += elapsed
+            all_latencies.extend(r[1] for r in winners + conflicts)
+
+            status = "✅" if len(winners) == 1 and not errors else "❌"
+            print(f"{status} Round {round_no + 1}: {len(winners)} won, "
+                  f"{len(conflicts)} conflicts, {len(errors)} errors in {elapsed * 1000:.0f} ms")
+            for _, _, error in errors[:3]:
+                print(f"   Error: {error}")
+
+            if len(winners) != 1 or errors:
+                ok = False
+
+        all_latencies.sort()
+        if all_latencies:
+            p50 = all_latencies[len(all_latencies) // 2]
+            p99 = all_latencies[min(len(all_latencies) - 1, int(len(all_latencies) * 0.99))]
+            print(f"\n📊 {total_attempts} attempts in {total_elapsed:.2f}s "
+                  f"({total_attempts / total_elapsed:.0f} attempts/s)")
+            print(f"   Latency p50: {p50 * 1000:.1f} ms, p99: {p99 * 1000:.1f} ms")
+    finally:
+        db.query(models.Booking).filter(
+            models.Booking.service_type_id == service.id
+        ).delete(synchronize_session=False)
+        db.delete(service)
+        db.delete(contact)
+        db.commit()
+        db.close()
+
+    return ok
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Concurrent double-booking test")
+    parser.add_argument("--workspace-id", required=True, help="Workspace ID to create test data in")
+    parser.add_argument("--threads", type=int, default=50, help="Concurrent requests per slot")
+    parser.add_argument("--rounds", type=int, default=10, help="Number of slots to contend on")
+
+    args = parser.parse_args()
+
+    success = run_slot_contention(args.workspace_id, args.threads, args.rounds)
+    print("\n✅ Exactly one winner per slot" if success else "\n❌ Double booking detected")
+    sys.exit(0 if success else 1)
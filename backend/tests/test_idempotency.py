@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Idempotency-Key Check for CareOps
+Which outcomes a retried request gets replayed, and which run the handler again
+
+    cd backend && python tests/test_idempotency.py
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/careops")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("SMTP_USER", "")
+os.environ.setdefault("SMTP_PASSWORD", "")
+
+from fastapi import HTTPException
+
+from app.utils.idempotency import IdempotencyStore
+
+
+class Handler:
+    """Raises or returns the queued outcomes in turn, counting calls"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def attempt(store: IdempotencyStore, handler: Handler, key: str = "booking:demo:key-1"):
+    """The status and body a client gets for one try"""
+    try:
+        return 200, store.run(key, "fingerprint", handler)
+    except HTTPException as e:
+        return e.status_code, e.detail
+
+
+def test_success_is_replayed():
+    store, handler = IdempotencyStore(ttl_seconds=60, max_keys=100), Handler({"booking_id": "b1"}, {"booking_id": "b2"})
+    assert attempt(store, handler) == (200, {"booking_id": "b1"})
+    assert attempt(store, handler) == (200, {"booking_id": "b1"})
+    assert handler.calls == 1
+
+
+def test_conflict_is_replayed():
+    store = IdempotencyStore(ttl_seconds=60, max_keys=100)
+    handler = Handler(HTTPException(status_code=409, detail="Slot already booked"), {"booking_id": "b1"})
+    assert attempt(store, handler) == (409, "Slot already booked")
+    assert attempt(store, handler) == (409, "Slot already booked")
+    assert handler.calls == 1
+
+
+def test_transient_client_error_is_retried():
+    # e.g. the workspace is activated between the first try and the retry
+    store = IdempotencyStore(ttl_seconds=60, max_keys=100)
+    handler = Handler(HTTPException(status_code=404, detail="Workspace not found"), {"booking_id": "b1"})
+    assert attempt(store, handler) == (404, "Workspace not found")
+    assert attempt(store, handler) == (200, {"booking_id": "b1"})
+    assert attempt(store, handler) == (200, {"booking_id": "b1"})
+    assert handler.calls == 2
+
+
+def test_server_error_is_retried():
+    store = IdempotencyStore(ttl_seconds=60, max_keys=100)
+    handler = Handler(HTTPException(status_code=503, detail="Unavailable"), {"booking_id": "b1"})
+    assert attempt(store, handler) == (503, "Unavailable")
+    assert attempt(store, handler) == (200, {"booking_id": "b1"})
+    assert handler.calls == 2
+
+
+if __name__ == "__main__":
+    checks = [test_success_is_replayed, test_conflict_is_replayed,
+              test_transient_client_error_is_retried, test_server_error_is_retried]
+    failed = 0
+    for check in checks:
+        try:
+            check()
+            print(f"✅ {check.__name__}")
+        except AssertionError:
+            failed += 1
+            print(f"❌ {check.__name__}")
+    sys.exit(1 if failed else 0)